@@ -0,0 +1,68 @@
+"""member_balances table
+
+Revision ID: 0002_member_balances
+Revises: 0001_init
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002_member_balances"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+# Backfill from the raw ledger using the same integer split rule as services.ledger:
+# share = amount_k // n, +1k to the first (amount_k % n) participants ordered by tg_user_id.
+BACKFILL_SQL = """
+INSERT INTO member_balances (member_id, chat_id, balance_k)
+SELECT m.id, m.chat_id, COALESCE(o.owed_k, 0) - COALESCE(p.paid_k, 0)
+FROM members m
+LEFT JOIN (
+    SELECT paid_by_member_id AS member_id, SUM(amount_k) AS paid_k
+    FROM transactions
+    GROUP BY paid_by_member_id
+) p ON p.member_id = m.id
+LEFT JOIN (
+    SELECT s.member_id, SUM(s.amount_k / s.n + CASE WHEN s.idx < s.amount_k % s.n THEN 1 ELSE 0 END) AS owed_k
+    FROM (
+        SELECT
+            tp.member_id,
+            t.amount_k,
+            row_number() OVER (PARTITION BY tp.transaction_id ORDER BY pm.tg_user_id) - 1 AS idx,
+            count(*) OVER (PARTITION BY tp.transaction_id) AS n
+        FROM transaction_participants tp
+        JOIN transactions t ON t.id = tp.transaction_id
+        JOIN members pm ON pm.id = tp.member_id
+    ) s
+    GROUP BY s.member_id
+) o ON o.member_id = m.id
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "member_balances",
+        sa.Column(
+            "member_id",
+            sa.BigInteger(),
+            sa.ForeignKey("members.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("chat_id", sa.BigInteger(), sa.ForeignKey("chats.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("balance_k", sa.BigInteger(), server_default=sa.text("0"), nullable=False),
+    )
+    op.create_index("ix_member_balances_chat_id", "member_balances", ["chat_id"])
+
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_member_balances_chat_id", table_name="member_balances")
+    op.drop_table("member_balances")
@@ -0,0 +1,57 @@
+"""ledger checkpoints
+
+Revision ID: 0003_ledger_checkpoints
+Revises: 0002_member_balances
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003_ledger_checkpoints"
+down_revision = "0002_member_balances"
+branch_labels = None
+depends_on = None
+
+
+UTC_NOW = sa.text("timezone('utc', now())")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ledger_checkpoints",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("chat_id", sa.BigInteger(), sa.ForeignKey("chats.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("upto_transaction_id", sa.BigInteger(), nullable=False),
+        sa.Column("room_total_k", sa.BigInteger(), server_default=sa.text("0"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=UTC_NOW, nullable=False),
+    )
+    op.create_index("ix_ledger_checkpoints_chat_upto", "ledger_checkpoints", ["chat_id", "upto_transaction_id"])
+
+    op.create_table(
+        "ledger_checkpoint_entries",
+        sa.Column(
+            "checkpoint_id",
+            sa.BigInteger(),
+            sa.ForeignKey("ledger_checkpoints.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "member_id",
+            sa.BigInteger(),
+            sa.ForeignKey("members.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("balance_k", sa.BigInteger(), nullable=False),
+        sa.Column("room_share_k", sa.BigInteger(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ledger_checkpoint_entries")
+    op.drop_index("ix_ledger_checkpoints_chat_upto", table_name="ledger_checkpoints")
+    op.drop_table("ledger_checkpoints")
@@ -0,0 +1,29 @@
+"""chats.ledger_version
+
+Revision ID: 0004_chat_ledger_version
+Revises: 0003_ledger_checkpoints
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_chat_ledger_version"
+down_revision = "0003_ledger_checkpoints"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "chats",
+        sa.Column("ledger_version", sa.BigInteger(), server_default=sa.text("0"), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("chats", "ledger_version")
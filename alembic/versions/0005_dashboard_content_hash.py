@@ -0,0 +1,26 @@
+"""chats.dashboard_content_hash
+
+Revision ID: 0005_dashboard_content_hash
+Revises: 0004_chat_ledger_version
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005_dashboard_content_hash"
+down_revision = "0004_chat_ledger_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("chats", sa.Column("dashboard_content_hash", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("chats", "dashboard_content_hash")
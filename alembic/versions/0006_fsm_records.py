@@ -0,0 +1,35 @@
+"""fsm records
+
+Revision ID: 0006_fsm_records
+Revises: 0005_dashboard_content_hash
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0006_fsm_records"
+down_revision = "0005_dashboard_content_hash"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "fsm_records",
+        sa.Column("key", sa.String(length=255), primary_key=True),
+        sa.Column("state", sa.String(length=255), nullable=True),
+        sa.Column("data", postgresql.JSONB(), server_default=sa.text("'{}'::jsonb"), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_fsm_records_expires_at", "fsm_records", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_fsm_records_expires_at", table_name="fsm_records")
+    op.drop_table("fsm_records")
@@ -0,0 +1,33 @@
+"""scheduled deletions
+
+Revision ID: 0007_scheduled_deletions
+Revises: 0006_fsm_records
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007_scheduled_deletions"
+down_revision = "0006_fsm_records"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scheduled_deletions",
+        sa.Column("tg_chat_id", sa.BigInteger(), primary_key=True),
+        sa.Column("message_id", sa.BigInteger(), primary_key=True),
+        sa.Column("due_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_scheduled_deletions_due_at", "scheduled_deletions", ["due_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scheduled_deletions_due_at", table_name="scheduled_deletions")
+    op.drop_table("scheduled_deletions")
@@ -0,0 +1,55 @@
+"""jobs
+
+Revision ID: 0008_jobs
+Revises: 0007_scheduled_deletions
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "0008_jobs"
+down_revision = "0007_scheduled_deletions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("kind", sa.String(length=64), nullable=False),
+        sa.Column("dedup_key", sa.String(length=255), nullable=True),
+        sa.Column("payload", postgresql.JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column("run_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_jobs_run_at", "jobs", ["run_at"])
+    op.create_index(
+        "uq_jobs_dedup_key_queued",
+        "jobs",
+        ["dedup_key"],
+        unique=True,
+        postgresql_where=sa.text("dedup_key IS NOT NULL AND locked_until IS NULL"),
+    )
+    op.create_index(
+        "ix_jobs_dedup_key_locked",
+        "jobs",
+        ["dedup_key"],
+        postgresql_where=sa.text("locked_until IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_jobs_dedup_key_locked", table_name="jobs")
+    op.drop_index("uq_jobs_dedup_key_queued", table_name="jobs")
+    op.drop_index("ix_jobs_run_at", table_name="jobs")
+    op.drop_table("jobs")
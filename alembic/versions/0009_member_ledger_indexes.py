@@ -0,0 +1,52 @@
+"""member-centric ledger indexes
+
+Revision ID: 0009_member_ledger_indexes
+Revises: 0008_jobs
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "0009_member_ledger_indexes"
+down_revision = "0008_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction; the build does not block ledger writes.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tx_participants_member_tx",
+            "transaction_participants",
+            ["member_id", "transaction_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_transactions_chat_paid_by",
+            "transactions",
+            ["chat_id", "paid_by_member_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_transactions_chat_paid_by",
+            table_name="transactions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_tx_participants_member_tx",
+            table_name="transaction_participants",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
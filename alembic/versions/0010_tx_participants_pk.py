@@ -0,0 +1,47 @@
+"""transaction_participants: (transaction_id, member_id) primary key
+
+Revision ID: 0010_tx_participants_pk
+Revises: 0009_member_ledger_indexes
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010_tx_participants_pk"
+down_revision = "0009_member_ledger_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Build the new key's index without blocking writes, then swap constraints in one short transaction.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "transaction_participants_pkey_new",
+            "transaction_participants",
+            ["transaction_id", "member_id"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+    op.drop_index("ix_tx_participants_tx_id", table_name="transaction_participants")
+    op.drop_constraint("uq_tx_participant", "transaction_participants", type_="unique")
+    op.drop_constraint("transaction_participants_pkey", "transaction_participants", type_="primary")
+    op.drop_column("transaction_participants", "id")
+    op.execute(
+        "ALTER TABLE transaction_participants "
+        "ADD CONSTRAINT transaction_participants_pkey PRIMARY KEY USING INDEX transaction_participants_pkey_new"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("transaction_participants_pkey", "transaction_participants", type_="primary")
+    op.add_column("transaction_participants", sa.Column("id", sa.BigInteger(), sa.Identity(), nullable=False))
+    op.create_primary_key("transaction_participants_pkey", "transaction_participants", ["id"])
+    op.create_unique_constraint("uq_tx_participant", "transaction_participants", ["transaction_id", "member_id"])
+    op.create_index("ix_tx_participants_tx_id", "transaction_participants", ["transaction_id"])
@@ -0,0 +1,32 @@
+"""transaction_participants.chat_id
+
+Revision ID: 0011_tx_participants_chat_id
+Revises: 0010_tx_participants_pk
+Create Date: 2026-10-17
+
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011_tx_participants_chat_id"
+down_revision = "0010_tx_participants_pk"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Copy of transactions.chat_id, so participants can share the transactions' partition key (0012).
+    op.add_column("transaction_participants", sa.Column("chat_id", sa.BigInteger(), nullable=True))
+    op.execute(
+        "UPDATE transaction_participants AS tp SET chat_id = t.chat_id "
+        "FROM transactions AS t WHERE t.id = tp.transaction_id"
+    )
+    op.alter_column("transaction_participants", "chat_id", nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column("transaction_participants", "chat_id")
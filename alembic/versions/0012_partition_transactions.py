@@ -0,0 +1,133 @@
+"""Optional hash partitioning of transactions / transaction_participants by chat_id
+
+Revision ID: 0012_partition_transactions
+Revises: 0011_tx_participants_chat_id
+Create Date: 2026-10-17
+
+Opt-in: nothing changes unless a partition count (>= 2) is given, either as
+``alembic -x transaction_partitions=16 upgrade head`` or via TRANSACTION_PARTITIONS.
+An existing database opts in by going back to 0011 and upgrading again with the setting.
+
+Both tables are hash-partitioned on chat_id with the same modulus, so a chat's
+transactions and their participants live in partitions with the same remainder and
+ledger queries filtered by chat_id touch one partition of each. Postgres requires the
+partition key in every unique constraint: the primary keys become (id, chat_id) and
+(transaction_id, member_id, chat_id), and participants reference transactions through
+(transaction_id, chat_id).
+"""
+
+from __future__ import annotations
+
+import os
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = "0012_partition_transactions"
+down_revision = "0011_tx_participants_chat_id"
+branch_labels = None
+depends_on = None
+
+
+def _partitions() -> int:
+    value = context.get_x_argument(as_dictionary=True).get("transaction_partitions")
+    if value is None:
+        value = os.getenv("TRANSACTION_PARTITIONS", "0")
+    return int(value)
+
+
+def _is_partitioned() -> bool:
+    return bool(
+        op.get_bind().scalar(
+            sa.text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'transactions'::regclass)")
+        )
+    )
+
+
+def _rebuild(*, partitions: int) -> None:
+    """Recreates both tables, hash-partitioned by chat_id when partitions >= 2, plain otherwise."""
+
+    partitioned = partitions >= 2
+    by_chat = " PARTITION BY HASH (chat_id)" if partitioned else ""
+
+    # The sequence would be dropped together with the old table otherwise.
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE transaction_participants RENAME TO transaction_participants_old")
+    op.execute("ALTER TABLE transactions RENAME TO transactions_old")
+    op.execute("ALTER TABLE transaction_participants_old RENAME CONSTRAINT transaction_participants_pkey TO transaction_participants_old_pkey")
+    op.execute("ALTER TABLE transactions_old RENAME CONSTRAINT transactions_pkey TO transactions_old_pkey")
+    for name in (
+        "ix_transactions_chat_id",
+        "ix_transactions_chat_created_at",
+        "ix_transactions_chat_paid_by",
+        "ix_tx_participants_member_tx",
+    ):
+        op.execute(f"ALTER INDEX {name} RENAME TO {name}_old")
+
+    op.execute(f"CREATE TABLE transactions (LIKE transactions_old INCLUDING DEFAULTS){by_chat}")
+    op.execute(f"CREATE TABLE transaction_participants (LIKE transaction_participants_old INCLUDING DEFAULTS){by_chat}")
+    if partitioned:
+        for i in range(partitions):
+            bounds = f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})"
+            op.execute(f"CREATE TABLE transactions_p{i} PARTITION OF transactions {bounds}")
+            op.execute(f"CREATE TABLE transaction_participants_p{i} PARTITION OF transaction_participants {bounds}")
+
+    op.execute("INSERT INTO transactions SELECT * FROM transactions_old")
+    op.execute(
+        "INSERT INTO transaction_participants (transaction_id, member_id, chat_id) "
+        "SELECT transaction_id, member_id, chat_id FROM transaction_participants_old"
+    )
+    op.execute("DROP TABLE transaction_participants_old")
+    op.execute("DROP TABLE transactions_old")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+
+    tx_key = ["id", "chat_id"] if partitioned else ["id"]
+    tp_key = ["transaction_id", "member_id", "chat_id"] if partitioned else ["transaction_id", "member_id"]
+    op.create_primary_key("transactions_pkey", "transactions", tx_key)
+    op.create_primary_key("transaction_participants_pkey", "transaction_participants", tp_key)
+    op.create_index("ix_transactions_chat_id", "transactions", ["chat_id"])
+    op.create_index("ix_transactions_chat_created_at", "transactions", ["chat_id", "created_at"])
+    op.create_index("ix_transactions_chat_paid_by", "transactions", ["chat_id", "paid_by_member_id"])
+    op.create_index("ix_tx_participants_member_tx", "transaction_participants", ["member_id", "transaction_id"])
+
+    op.create_foreign_key(
+        "transactions_chat_id_fkey", "transactions", "chats", ["chat_id"], ["id"], ondelete="CASCADE"
+    )
+    op.create_foreign_key(
+        "transactions_paid_by_member_id_fkey",
+        "transactions",
+        "members",
+        ["paid_by_member_id"],
+        ["id"],
+        ondelete="RESTRICT",
+    )
+    op.create_foreign_key(
+        "transaction_participants_transaction_id_fkey",
+        "transaction_participants",
+        "transactions",
+        ["transaction_id", "chat_id"] if partitioned else ["transaction_id"],
+        tx_key,
+        ondelete="CASCADE",
+    )
+    op.create_foreign_key(
+        "transaction_participants_member_id_fkey",
+        "transaction_participants",
+        "members",
+        ["member_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+    op.execute("ANALYZE transactions")
+    op.execute("ANALYZE transaction_participants")
+
+
+def upgrade() -> None:
+    partitions = _partitions()
+    if partitions >= 2 and not _is_partitioned():
+        _rebuild(partitions=partitions)
+
+
+def downgrade() -> None:
+    if _is_partitioned():
+        _rebuild(partitions=0)
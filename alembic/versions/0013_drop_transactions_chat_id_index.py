@@ -0,0 +1,58 @@
+"""drop ix_transactions_chat_id
+
+Revision ID: 0013_drop_tx_chat_id_index
+Revises: 0012_partition_transactions
+Create Date: 2026-10-18
+
+ix_transactions_chat_created_at and ix_transactions_chat_paid_by both lead with
+chat_id, so whole-chat scans are served by either of them; the single-column index
+only cost an extra write per transaction and pulled the payer side of the ledger
+replay away from ix_transactions_chat_paid_by.
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0013_drop_tx_chat_id_index"
+down_revision = "0012_partition_transactions"
+branch_labels = None
+depends_on = None
+
+
+def _is_partitioned() -> bool:
+    return bool(
+        op.get_bind().scalar(
+            sa.text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'transactions'::regclass)")
+        )
+    )
+
+
+def upgrade() -> None:
+    # Indexes on a partitioned table cannot be dropped CONCURRENTLY.
+    if _is_partitioned():
+        op.drop_index("ix_transactions_chat_id", table_name="transactions", if_exists=True)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_transactions_chat_id",
+            table_name="transactions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    if _is_partitioned():
+        op.create_index("ix_transactions_chat_id", "transactions", ["chat_id"], if_not_exists=True)
+        return
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transactions_chat_id",
+            "transactions",
+            ["chat_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
@@ -0,0 +1,103 @@
+"""
+Cost of the wizard keyboards with and without the builder caches in bot/keyboards.py.
+
+"uncached" calls the builder behind lru_cache (__wrapped__), i.e. what every
+keyboard cost before memoization; "cached" is a repeat call that hits the cache.
+"packing" is the share of the uncached time spent in the callback payloads' pack().
+No database or bot token needed:
+
+    python benchmarks/keyboards.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Callable
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from expense_splitting_bot.bot import keyboards  # noqa: E402
+from expense_splitting_bot.bot.callbacks import CallbackCodec  # noqa: E402
+from expense_splitting_bot.bot.member_directory import MemberEntry  # noqa: E402
+
+MEMBERS = tuple(
+    MemberEntry(id=1000 + i, tg_user_id=5000 + i, label=f"user{i}", is_resident=i % 2 == 0) for i in range(20)
+)
+PAGE = MEMBERS[8:16]
+SELECTED = frozenset(m.id for m in PAGE[:4])
+
+# name -> (call through the cache, the same call bypassing it)
+CASES: dict[str, tuple[Callable[[], object], Callable[[], object]]] = {
+    "numeric": (
+        lambda: keyboards.numeric_keyboard(initiator_user_id=42, field="split_amount_k"),
+        lambda: keyboards.numeric_keyboard.__wrapped__(initiator_user_id=42, field="split_amount_k"),
+    ),
+    "members page": (
+        lambda: keyboards.members_keyboard(
+            initiator_user_id=42, flow="split_payer", field="split_paid_by", members=MEMBERS, page=1
+        ),
+        lambda: keyboards._members_markup.__wrapped__(42, "split_payer", "split_paid_by", PAGE, 1, True),
+    ),
+    "setup page": (
+        lambda: keyboards.setup_keyboard(initiator_user_id=42, members=MEMBERS, page=1),
+        lambda: keyboards._setup_markup.__wrapped__(42, PAGE, 1, True),
+    ),
+    "participants page": (
+        lambda: keyboards.split_participants_keyboard(
+            initiator_user_id=42, members=MEMBERS, selected_ids=set(SELECTED), page=1
+        ),
+        lambda: keyboards._split_participants_markup.__wrapped__(42, PAGE, SELECTED, 1, True),
+    ),
+    "confirm": (
+        lambda: keyboards.confirm_keyboard(initiator_user_id=42, flow="split"),
+        lambda: keyboards.confirm_keyboard.__wrapped__(initiator_user_id=42, flow="split"),
+    ),
+}
+
+
+def _per_call_us(fn: Callable[[], object], number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def _packing_share(fn: Callable[[], object], number: int) -> float:
+    """Fraction of fn's time spent inside CallbackCodec.pack()."""
+    pack = CallbackCodec.pack
+    spent = 0.0
+
+    def timed_pack(self: CallbackCodec) -> str:
+        nonlocal spent
+        started = time.perf_counter()
+        try:
+            return pack(self)
+        finally:
+            spent += time.perf_counter() - started
+
+    with mock.patch.object(CallbackCodec, "pack", timed_pack):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        total = time.perf_counter() - started
+    return spent / total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="calls per timing run")
+    args = parser.parse_args()
+
+    print(f"{'keyboard':18} {'uncached':>12} {'packing':>9} {'cached':>12}")
+    for name, (cached, uncached) in CASES.items():
+        cold = _per_call_us(uncached, args.number)
+        packing = _packing_share(uncached, args.number)
+        cached()
+        warm = _per_call_us(cached, args.number)
+        print(f"{name:18} {cold:>9.1f} us {packing:>8.0%} {warm:>9.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Synthetic ledger data and migration helpers for the storage benchmarks.
+
+seed() fills an empty scratch database with --chats groups of 20 members each. The
+first chat holds --big-chat transactions and every other chat --chat-size; each
+transaction has 3 participants. It works at any revision from 0009 on, with or
+without transaction_participants.chat_id (0011).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+ROOT = Path(__file__).resolve().parent.parent
+MEMBERS_PER_CHAT = 20
+PARTICIPANTS_PER_TX = 3
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--big-chat", type=int, default=200_000, help="transactions in the first chat")
+    parser.add_argument("--chat-size", type=int, default=1_000, help="transactions in every other chat")
+
+
+def database_url() -> str:
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        sys.exit("DATABASE_URL must point at an empty scratch database")
+    return url
+
+
+def alembic(url: str, *argv: str) -> None:
+    subprocess.run(
+        [sys.executable, "-m", "alembic", *argv],
+        cwd=ROOT,
+        env=dict(os.environ, DATABASE_URL=url),
+        check=True,
+    )
+
+
+async def has_participant_chat_id(engine: AsyncEngine) -> bool:
+    async with engine.connect() as conn:
+        return bool(
+            await conn.scalar(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'transaction_participants' AND column_name = 'chat_id')"
+                )
+            )
+        )
+
+
+async def seed(engine: AsyncEngine, args: argparse.Namespace) -> list[int]:
+    """Inserts the data set; returns the chat ids, the big chat first."""
+    started = time.monotonic()
+    with_chat_id = await has_participant_chat_id(engine)
+    async with engine.begin() as conn:
+        if await conn.scalar(text("SELECT EXISTS (SELECT 1 FROM chats)")):
+            sys.exit("the scratch database already has chats; use an empty one")
+        chat_ids = list(
+            (
+                await conn.execute(
+                    text(
+                        "INSERT INTO chats (tg_chat_id, title) "
+                        "SELECT -1000 - g, 'bench ' || g FROM generate_series(1, CAST(:chats AS int)) g ORDER BY g RETURNING id"
+                    ),
+                    {"chats": args.chats},
+                )
+            ).scalars()
+        )
+        chat_ids.sort()
+        await conn.execute(
+            text(
+                "INSERT INTO members (chat_id, tg_user_id, first_name, is_resident) "
+                "SELECT c.id, m, 'm' || m, m <= 8 FROM chats c, generate_series(1, CAST(:members AS int)) m"
+            ),
+            {"members": MEMBERS_PER_CHAT},
+        )
+        await conn.execute(
+            text(
+                "INSERT INTO transactions (chat_id, type, amount_k, paid_by_member_id, created_at) "
+                "SELECT c.id, (ARRAY['ROOM', 'SPLIT', 'TRANSFER'])[1 + g % 3]::transaction_type, 10 + g % 400, "
+                "       m.ids[1 + g % cardinality(m.ids)], now() - make_interval(secs => g) "
+                "FROM chats c "
+                "JOIN (SELECT chat_id, array_agg(id ORDER BY id) AS ids FROM members GROUP BY chat_id) m "
+                "  ON m.chat_id = c.id "
+                "CROSS JOIN LATERAL generate_series(1, CASE WHEN c.id = :big_id THEN CAST(:big AS int) ELSE CAST(:small AS int) END) g"
+            ),
+            {"big_id": chat_ids[0], "big": args.big_chat, "small": args.chat_size},
+        )
+        if with_chat_id:
+            columns, values = "transaction_id, member_id, chat_id", "t.id, m.ids[p.k], t.chat_id"
+        else:
+            columns, values = "transaction_id, member_id", "t.id, m.ids[p.k]"
+        await conn.execute(
+            text(
+                f"INSERT INTO transaction_participants ({columns}) "
+                f"SELECT {values} FROM transactions t "
+                "JOIN (SELECT chat_id, array_agg(id ORDER BY id) AS ids FROM members GROUP BY chat_id) m "
+                "  ON m.chat_id = t.chat_id "
+                "CROSS JOIN LATERAL (SELECT 1 + (t.id + i) % cardinality(m.ids) AS k "
+                "                    FROM generate_series(0, CAST(:per_tx AS int) - 1) i) p"
+            ),
+            {"per_tx": PARTICIPANTS_PER_TX},
+        )
+    print(f"seeded {len(chat_ids)} chats in {time.monotonic() - started:.1f} s")
+    return chat_ids
+
+
+async def vacuum(engine: AsyncEngine, *, full: bool = False) -> None:
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in ("transactions", "transaction_participants"):
+            await conn.execute(text(f"VACUUM {'FULL ' if full else ''}ANALYZE {table}"))
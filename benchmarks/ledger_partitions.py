@@ -0,0 +1,146 @@
+"""
+Plain vs hash-partitioned ledger tables (migration 0012).
+
+Migrates an empty scratch database (DATABASE_URL) to head with plain tables, seeds it
+(see ledger_data) and times, for the big chat and one normal-sized chat:
+
+- replay_ledger without checkpoints (the server-side aggregate over the whole ledger)
+- the first /history page
+
+It also prints which tables the aggregate's plan reads. It then converts the database
+the documented way (downgrade to 0011, upgrade with -x transaction_partitions=N) and
+repeats both. The database is left partitioned.
+
+    DATABASE_URL=postgresql+asyncpg://.../scratch python benchmarks/ledger_partitions.py --partitions 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+import ledger_data
+
+sys.path.insert(0, str(ledger_data.ROOT))
+
+from expense_splitting_bot.services.ledger import replay_ledger  # noqa: E402
+from expense_splitting_bot.services.transactions import get_transaction_page  # noqa: E402
+
+BEFORE_0012 = "0011_tx_participants_chat_id"
+
+
+def _relations(plan: dict) -> set[str]:
+    names = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", ()):
+        names |= _relations(child)
+    return names
+
+
+async def _median_ms(
+    sessionmaker: async_sessionmaker[AsyncSession], run: Callable[[AsyncSession], Awaitable[object]], repeat: int
+) -> float:
+    times = []
+    for _ in range(repeat):
+        async with sessionmaker() as session:
+            started = time.perf_counter()
+            await run(session)
+            times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+async def _aggregate_tables(engine: AsyncEngine, chat_id: int) -> list[str]:
+    """Tables the replay aggregate's plan scans (its statement is captured, then EXPLAINed)."""
+    sessionmaker = async_sessionmaker(engine)
+    statements: list[tuple[str, tuple]] = []
+
+    def record(conn, cursor, statement, parameters, *args) -> None:
+        if "row_number" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        async with sessionmaker() as session:
+            await replay_ledger(session, chat_id=chat_id, use_checkpoint=False)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+    statement, parameters = statements[0]
+    async with engine.connect() as conn:
+        raw = (await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)).scalar()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    return sorted(name for name in _relations(plan) if name.startswith("transaction"))
+
+
+async def _measure(url: str, chats: dict[str, int], args: argparse.Namespace) -> dict[str, dict[str, object]]:
+    engine = create_async_engine(url)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        await ledger_data.vacuum(engine)
+        results: dict[str, dict[str, object]] = {}
+        for label, chat_id in chats.items():
+            repeat = max(3, args.repeat // 6) if label == "big" else args.repeat
+            results[label] = {
+                "replay": await _median_ms(
+                    sessionmaker, lambda s: replay_ledger(s, chat_id=chat_id, use_checkpoint=False), repeat
+                ),
+                "history": await _median_ms(
+                    sessionmaker, lambda s: get_transaction_page(s, chat_id=chat_id), args.repeat
+                ),
+                "tables": await _aggregate_tables(engine, chat_id),
+            }
+        return results
+    finally:
+        await engine.dispose()
+
+
+async def _seed(url: str, args: argparse.Namespace) -> list[int]:
+    engine = create_async_engine(url)
+    try:
+        return await ledger_data.seed(engine, args)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ledger_data.add_arguments(parser)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=30, help="runs per timing; the median is printed")
+    args = parser.parse_args()
+    if args.partitions < 2:
+        parser.error("--partitions must be at least 2")
+    url = ledger_data.database_url()
+
+    ledger_data.alembic(url, "-x", "transaction_partitions=0", "upgrade", "head")
+    chat_ids = asyncio.run(_seed(url, args))
+    chats = {"big": chat_ids[0], "normal": chat_ids[1]}
+    plain = asyncio.run(_measure(url, chats, args))
+
+    started = time.monotonic()
+    ledger_data.alembic(url, "downgrade", BEFORE_0012)
+    ledger_data.alembic(url, "-x", f"transaction_partitions={args.partitions}", "upgrade", "head")
+    converted = time.monotonic() - started
+    partitioned = asyncio.run(_measure(url, chats, args))
+
+    sizes = {"big": args.big_chat, "normal": args.chat_size}
+    print(f"{'':38} {'plain':>12} {f'{args.partitions} partitions':>15}")
+    for label in chats:
+        p, q = plain[label], partitioned[label]
+        print(f"{f'replay_ledger, {sizes[label]}-tx chat':38} {p['replay']:>9.1f} ms {q['replay']:>12.1f} ms")
+        print(f"{f'/history first page, {sizes[label]}-tx chat':38} {p['history']:>9.2f} ms {q['history']:>12.2f} ms")
+    print(f"{'converting to partitions (0012)':38} {'':>12} {converted:>13.1f} s")
+    print("tables in the replay aggregate's plan:")
+    for label in chats:
+        for mode, results in (("plain", plain), ("partitioned", partitioned)):
+            print(f"  {f'{label} chat, {mode}':36} {', '.join(results[label]['tables'])}")
+
+
+if __name__ == "__main__":
+    main()
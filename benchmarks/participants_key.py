@@ -0,0 +1,157 @@
+"""
+transaction_participants storage before and after migration 0010 (composite primary key).
+
+Migrates an empty scratch database (DATABASE_URL) to 0009, seeds it (see ledger_data),
+then measures:
+
+- table and index sizes after VACUUM FULL
+- a bulk insert of participant rows, rolled back afterwards
+- create_transaction-shaped commits: one transaction and its participants per commit
+
+It then upgrades to 0010, rewrites the table with VACUUM FULL (existing rows keep the
+dropped id column's bytes until then) and measures again.
+
+    DATABASE_URL=postgresql+asyncpg://.../scratch python benchmarks/participants_key.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+import ledger_data
+
+BEFORE = "0009_member_ledger_indexes"
+AFTER = "0010_tx_participants_pk"
+
+
+async def _sizes(engine: AsyncEngine) -> dict[str, int]:
+    async with engine.connect() as conn:
+        rows = (
+            await conn.execute(
+                text(
+                    "SELECT 'heap', pg_relation_size('transaction_participants') "
+                    "UNION ALL SELECT i.indexrelid::regclass::text, pg_relation_size(i.indexrelid) "
+                    "FROM pg_index i WHERE i.indrelid = 'transaction_participants'::regclass"
+                )
+            )
+        ).all()
+    return {name: int(size) for name, size in rows}
+
+
+async def _bulk_insert(engine: AsyncEngine, chat_id: int, transactions: int) -> float:
+    """Seconds to insert participants for `transactions` new rows (3 each); rolled back."""
+    async with engine.connect() as conn:
+        async with conn.begin() as tx:
+            await conn.execute(
+                text(
+                    "CREATE TEMP TABLE new_tx ON COMMIT DROP AS "
+                    "WITH t AS ("
+                    "  INSERT INTO transactions (chat_id, type, amount_k, paid_by_member_id) "
+                    "  SELECT :chat_id, 'SPLIT', 30, (SELECT min(id) FROM members WHERE chat_id = :chat_id) "
+                    "  FROM generate_series(1, CAST(:n AS int)) RETURNING id"
+                    ") SELECT id FROM t"
+                ),
+                {"chat_id": chat_id, "n": transactions},
+            )
+            started = time.perf_counter()
+            await conn.execute(
+                text(
+                    "INSERT INTO transaction_participants (transaction_id, member_id) "
+                    "SELECT t.id, m.id FROM new_tx t "
+                    "CROSS JOIN (SELECT id FROM members WHERE chat_id = :chat_id ORDER BY id LIMIT 3) m"
+                ),
+                {"chat_id": chat_id},
+            )
+            elapsed = time.perf_counter() - started
+            await tx.rollback()
+    return elapsed
+
+
+async def _commits_per_second(engine: AsyncEngine, chat_id: int, count: int) -> float:
+    """One transaction with 5 participants per commit, like create_transaction; removed afterwards."""
+    async with engine.connect() as conn:
+        members = list(
+            (await conn.execute(text("SELECT id FROM members WHERE chat_id = :c ORDER BY id"), {"c": chat_id})).scalars()
+        )
+        await conn.commit()
+        first_id = None
+        started = time.perf_counter()
+        for i in range(count):
+            async with conn.begin():
+                tx_id = await conn.scalar(
+                    text(
+                        "INSERT INTO transactions (chat_id, type, amount_k, paid_by_member_id) "
+                        "VALUES (:c, 'SPLIT', :a, :p) RETURNING id"
+                    ),
+                    {"c": chat_id, "a": 30 + i % 7, "p": members[i % len(members)]},
+                )
+                first_id = first_id or tx_id
+                await conn.execute(
+                    text("INSERT INTO transaction_participants (transaction_id, member_id) VALUES (:t, :m)"),
+                    [{"t": tx_id, "m": m} for m in members[i % 10 : i % 10 + 5]],
+                )
+        elapsed = time.perf_counter() - started
+        async with conn.begin():
+            await conn.execute(text("DELETE FROM transactions WHERE id >= :first"), {"first": first_id})
+    return count / elapsed
+
+
+async def _measure(url: str, chat_id: int, args: argparse.Namespace) -> dict[str, object]:
+    engine = create_async_engine(url)
+    try:
+        await ledger_data.vacuum(engine, full=True)
+        sizes = await _sizes(engine)
+        bulk = min([await _bulk_insert(engine, chat_id, args.bulk) for _ in range(args.repeat)])
+        rate = max([await _commits_per_second(engine, chat_id, args.commits) for _ in range(args.repeat)])
+        return {"sizes": sizes, "bulk": bulk, "rate": rate}
+    finally:
+        await engine.dispose()
+
+
+async def _seed(url: str, args: argparse.Namespace) -> list[int]:
+    engine = create_async_engine(url)
+    try:
+        return await ledger_data.seed(engine, args)
+    finally:
+        await engine.dispose()
+
+
+def _mb(size: int) -> str:
+    return f"{size / 2**20:.0f} MB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ledger_data.add_arguments(parser)
+    parser.add_argument("--bulk", type=int, default=100_000, help="transactions in the bulk insert (3 rows each)")
+    parser.add_argument("--commits", type=int, default=2_000, help="single-expense commits to time")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the best is kept")
+    args = parser.parse_args()
+    url = ledger_data.database_url()
+
+    ledger_data.alembic(url, "upgrade", BEFORE)
+    chat_ids = asyncio.run(_seed(url, args))
+    # The bulk and per-commit inserts go to a normal-sized chat.
+    chat_id = chat_ids[1]
+    before = asyncio.run(_measure(url, chat_id, args))
+    ledger_data.alembic(url, "upgrade", AFTER)
+    after = asyncio.run(_measure(url, chat_id, args))
+
+    print(f"{'':40} {'0009':>12} {'0010':>12}")
+    for name in sorted(set(before["sizes"]) | set(after["sizes"])):
+        b, a = before["sizes"].get(name), after["sizes"].get(name)
+        print(f"{name:40} {_mb(b) if b is not None else '-':>12} {_mb(a) if a is not None else '-':>12}")
+    total_b, total_a = sum(before["sizes"].values()), sum(after["sizes"].values())
+    print(f"{'total':40} {_mb(total_b):>12} {_mb(total_a):>12}")
+    rows = args.bulk * ledger_data.PARTICIPANTS_PER_TX
+    print(f"{f'bulk insert of {rows} rows':40} {before['bulk']:>10.2f} s {after['bulk']:>10.2f} s")
+    print(f"{'expenses/s, 5 participants per commit':40} {before['rate']:>12.0f} {after['rate']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
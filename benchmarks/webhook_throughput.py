@@ -0,0 +1,198 @@
+"""
+Polling vs webhook ingestion throughput against a fake Bot API.
+
+Starts a fake Telegram endpoint in this process, runs the bot
+(python -m expense_splitting_bot.bot.main) as a subprocess pointed at it through
+TELEGRAM_API_BASE_URL, feeds it --updates /balance commands spread over --chats groups
+and reports updates per second until every /balance reply has been sent. Each fake API
+call takes --latency seconds. Outbound rate limits are lifted so the Bot API queue is
+not what gets measured.
+
+Needs DATABASE_URL pointing at a migrated scratch database (chats and members are
+created) and BOT_TOKEN set to anything. Run it a second time to measure already-known
+chats.
+
+    python benchmarks/webhook_throughput.py --mode polling
+    python benchmarks/webhook_throughput.py --mode webhook --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+from typing import Any
+
+from aiohttp import ClientSession, web
+
+_SECRET = "bench-secret"
+_WEBHOOK_PATH = "/telegram/webhook"
+
+
+def _update(update_id: int, chat_id: int, user_id: int) -> dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup", "title": f"bench {chat_id}"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"u{user_id}"},
+            "text": "/balance",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 8}],
+        },
+    }
+
+
+class FakeBotApi:
+    """Answers every Bot API method after a fixed latency; serves getUpdates from a queue."""
+
+    def __init__(self, *, latency: float) -> None:
+        self.latency = latency
+        self.updates: list[dict[str, Any]] = []
+        self.get_me_calls = 0
+        self.polling = asyncio.Event()
+        self.replies = 0
+        self.done = asyncio.Event()
+        self.expected = 0
+        self._message_id = 10**6
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            data = await request.json()
+        else:
+            data = dict(await request.post())
+
+        if method == "getUpdates":
+            self.polling.set()
+            offset = int(data.get("offset") or 0)
+            self.updates = [u for u in self.updates if u["update_id"] >= offset]
+            batch = self.updates[: int(data.get("limit") or 100)]
+            # An empty queue answers like a short long-poll.
+            await asyncio.sleep(self.latency if batch else 0.05)
+            return web.json_response({"ok": True, "result": batch})
+
+        await asyncio.sleep(self.latency)
+        result: Any = True
+        if method == "getMe":
+            self.get_me_calls += 1
+            result = {"id": 1, "is_bot": True, "first_name": "bench", "username": "benchbot"}
+        elif method == "sendMessage":
+            self._message_id += 1
+            text = str(data.get("text") or "")
+            result = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(data["chat_id"]), "type": "supergroup"},
+                "text": text,
+            }
+            if text.startswith("<b>Balanslar"):
+                self.replies += 1
+                if self.replies >= self.expected:
+                    self.done.set()
+        return web.json_response({"ok": True, "result": result})
+
+
+async def _wait_for_port(port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def run(args: argparse.Namespace) -> float:
+    api = FakeBotApi(latency=args.latency)
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.api_port).start()
+
+    env = dict(
+        os.environ,
+        TELEGRAM_API_BASE_URL=f"http://127.0.0.1:{args.api_port}",
+        BOT_MODE=args.mode,
+        WEBHOOK_WORKERS=str(args.workers),
+        WEBHOOK_URL=f"http://127.0.0.1:{args.webhook_port}",
+        WEBHOOK_PATH=_WEBHOOK_PATH,
+        WEBHOOK_SECRET=_SECRET,
+        WEBHOOK_HOST="127.0.0.1",
+        WEBHOOK_PORT=str(args.webhook_port),
+        DASHBOARD_COORDINATION="postgres" if args.workers > 1 else os.environ.get("DASHBOARD_COORDINATION", "local"),
+        OUTBOUND_GLOBAL_PER_SECOND="1000000",
+        OUTBOUND_GROUP_PER_MINUTE="1000000",
+        LOG_LEVEL="WARNING",
+    )
+    bot = await asyncio.create_subprocess_exec(sys.executable, "-m", "expense_splitting_bot.bot.main", env=env)
+    updates = [
+        _update(i + 1, -(args.chat_base + i % args.chats), args.chat_base + i % (args.chats * 3))
+        for i in range(args.updates)
+    ]
+    api.expected = len(updates)
+    try:
+        if args.mode == "polling":
+            await asyncio.wait_for(api.polling.wait(), args.startup_timeout)
+            started = time.monotonic()
+            api.updates = updates
+        else:
+            deadline = time.monotonic() + args.startup_timeout
+            while api.get_me_calls < args.workers:
+                if time.monotonic() > deadline:
+                    raise TimeoutError("webhook workers did not start")
+                await asyncio.sleep(0.1)
+            await _wait_for_port(args.webhook_port, args.startup_timeout)
+            await asyncio.sleep(1.0)  # the other workers bind after the first one
+            started = time.monotonic()
+            url = f"http://127.0.0.1:{args.webhook_port}{_WEBHOOK_PATH}"
+            headers = {"X-Telegram-Bot-Api-Secret-Token": _SECRET}
+            limit = asyncio.Semaphore(args.concurrency)
+            async with ClientSession() as http:
+
+                async def post(update: dict[str, Any]) -> None:
+                    async with limit:
+                        async with http.post(url, json=update, headers=headers) as resp:
+                            resp.raise_for_status()
+
+                await asyncio.gather(*(post(u) for u in updates))
+        await asyncio.wait_for(api.done.wait(), args.timeout)
+        return len(updates) / (time.monotonic() - started)
+    finally:
+        # SIGINT lets the webhook supervisor stop its workers too.
+        bot.send_signal(signal.SIGINT)
+        await bot.wait()
+        await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--workers", type=int, default=1, help="webhook worker processes")
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--chat-base", type=int, default=900_000_000, help="first synthetic chat/user id")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per fake Bot API call")
+    parser.add_argument("--concurrency", type=int, default=64, help="parallel webhook POSTs")
+    parser.add_argument("--api-port", type=int, default=8091)
+    parser.add_argument("--webhook-port", type=int, default=8090)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+    if args.mode == "polling":
+        args.workers = 1
+
+    rate = asyncio.run(run(args))
+    label = args.mode if args.mode == "polling" else f"webhook x{args.workers}"
+    print(f"{label}: {args.updates} updates over {args.chats} chats, {rate:.0f} updates/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from aiogram import Bot
+
+
+@dataclass(frozen=True, slots=True)
+class _Roster:
+    admin_ids: frozenset[int]  # administrators and the creator
+    expires: float  # monotonic
+
+
+@dataclass(frozen=True)
+class AdminRosterStats:
+    size: int
+    hits: int
+    fetches: int
+    invalidations: int
+
+
+class AdminRosterCache:
+    """
+    Per-chat admin user ids from one getChatAdministrators call, kept for ttl_seconds.
+
+    chat_member / my_chat_member updates invalidate a chat's roster. Concurrent checks of
+    a chat with no roster share a single fetch.
+    """
+
+    def __init__(self, *, ttl_seconds: float = 300.0, max_chats: int = 10_000) -> None:
+        self._ttl = ttl_seconds
+        self._max_chats = max(1, int(max_chats))
+        self._rosters: OrderedDict[int, _Roster] = OrderedDict()
+        self._inflight: dict[int, asyncio.Task[frozenset[int]]] = {}
+        self._hits = 0
+        self._fetches = 0
+        self._invalidations = 0
+
+    async def is_admin(self, bot: Bot, *, tg_chat_id: int, tg_user_id: int) -> bool:
+        roster = self._rosters.get(tg_chat_id)
+        if roster is not None and roster.expires > time.monotonic():
+            self._rosters.move_to_end(tg_chat_id)
+            self._hits += 1
+            return tg_user_id in roster.admin_ids
+
+        task = self._inflight.get(tg_chat_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(bot, tg_chat_id))
+            self._inflight[tg_chat_id] = task
+            task.add_done_callback(lambda t: self._forget(tg_chat_id, t))
+        # shield: one waiter's cancellation must not cancel the fetch the others wait on.
+        return tg_user_id in await asyncio.shield(task)
+
+    def invalidate(self, tg_chat_id: int) -> None:
+        if self._rosters.pop(tg_chat_id, None) is not None:
+            self._invalidations += 1
+        # A fetch already on the wire may predate the change: detached, it won't store its result.
+        self._inflight.pop(tg_chat_id, None)
+
+    def stats(self) -> AdminRosterStats:
+        return AdminRosterStats(
+            size=len(self._rosters),
+            hits=self._hits,
+            fetches=self._fetches,
+            invalidations=self._invalidations,
+        )
+
+    def _forget(self, tg_chat_id: int, task: asyncio.Task[frozenset[int]]) -> None:
+        if self._inflight.get(tg_chat_id) is task:
+            del self._inflight[tg_chat_id]
+
+    async def _fetch(self, bot: Bot, tg_chat_id: int) -> frozenset[int]:
+        self._fetches += 1
+        admins = await bot.get_chat_administrators(chat_id=tg_chat_id)
+        # getChatAdministrators only returns administrators and the creator.
+        admin_ids = frozenset(a.user.id for a in admins)
+        if self._inflight.get(tg_chat_id) is not asyncio.current_task():
+            return admin_ids
+        self._rosters[tg_chat_id] = _Roster(admin_ids=admin_ids, expires=time.monotonic() + self._ttl)
+        self._rosters.move_to_end(tg_chat_id)
+        while len(self._rosters) > self._max_chats:
+            self._rosters.popitem(last=False)
+        return admin_ids
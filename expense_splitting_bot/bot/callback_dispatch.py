@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Optional, TypeVar
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import CallbackQuery
+
+from expense_splitting_bot.bot.callbacks import CallbackCodec, decode
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class CallbackDispatch:
+    """
+    Routes every callback query with one dict lookup on (payload class, route_key()).
+
+    A single catch-all handler replaces the per-router CallbackData filters: the payload
+    is decoded once and passed to the owning handler as callback_data, with the usual
+    aiogram data (session, state, chat_db, workflow_data...) injected by signature.
+    """
+
+    def __init__(self) -> None:
+        self.router = Router(name=__name__)
+        self.router.callback_query.register(self._dispatch)
+        self._routes: dict[tuple[type[CallbackCodec], Optional[str]], HandlerObject] = {}
+
+    def on(self, cb_cls: type[CallbackCodec], key: Optional[str] = None) -> Callable[[F], F]:
+        def register(handler: F) -> F:
+            route = (cb_cls, key)
+            if route in self._routes:
+                raise ValueError(f"Callback route {cb_cls.__name__}/{key} is already registered")
+            self._routes[route] = HandlerObject(callback=handler)
+            return handler
+
+        return register
+
+    async def _dispatch(self, callback: CallbackQuery, **data: Any) -> Any:
+        payload = decode(callback.data or "")
+        handler = self._routes.get((type(payload), payload.route_key())) if payload is not None else None
+        if handler is None:
+            # Buttons from an older layout or a removed flow: just stop the spinner.
+            await callback.answer()
+            return None
+        data["callback_data"] = payload
+        return await handler.call(callback, **data)
+
+
+callbacks = CallbackDispatch()
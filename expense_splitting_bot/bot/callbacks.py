@@ -1,57 +1,188 @@
 from __future__ import annotations
 
-from aiogram.filters.callback_data import CallbackData
-
-
-class CloseCb(CallbackData, prefix="close"):
+from dataclasses import dataclass, fields
+from typing import Any, ClassVar, Optional
+
+# Wire format: "<prefix>:<field>:<field>..." in declaration order. Fields listed in a class's
+# vocab are enum-like strings sent as their base-36 index in that tuple; every other field
+# is an int in base 36. E.g. PageCb(initiator=123456789, flow="split_participants", page=2)
+# packs to "g:21i3v9:3:2" (pydantic CallbackData: "page:123456789:split_participants:2").
+SEP = ":"
+_MAX_LENGTH = 64  # Telegram's callback_data limit, in bytes
+
+_PREFIXES: dict[str, type[CallbackCodec]] = {}
+
+AMOUNT_FIELDS = ("room_amount_k", "split_amount_k", "pay_amount_k", "wizard")
+
+
+def _b36(n: int) -> str:
+    if n < 0:
+        return "-" + _b36(-n)
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if n == 0:
+            return out
+
+
+class CallbackCodec:
+    """Base for the fixed-layout callback payloads; subclasses are frozen dataclasses."""
+
+    prefix: ClassVar[str]
+    vocab: ClassVar[dict[str, tuple[str, ...]]] = {}
+
+    def __init_subclass__(cls, *, prefix: str, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        if SEP in prefix or prefix in _PREFIXES:
+            raise ValueError(f"Bad or duplicate callback prefix {prefix!r}")
+        cls.prefix = prefix
+        _PREFIXES[prefix] = cls
+
+    def route_key(self) -> Optional[str]:
+        """Second dispatch key next to the class (flow/field); None for single-handler payloads."""
+        return None
+
+    def pack(self) -> str:
+        parts = [self.prefix]
+        for f in fields(self):  # type: ignore[arg-type]
+            value = getattr(self, f.name)
+            values = self.vocab.get(f.name)
+            parts.append(_b36(values.index(value)) if values is not None else _b36(int(value)))
+        packed = SEP.join(parts)
+        if len(packed.encode()) > _MAX_LENGTH:
+            raise ValueError(f"Callback data too long: {packed!r}")
+        return packed
+
+    @classmethod
+    def unpack(cls, data: str) -> CallbackCodec:
+        prefix, *parts = data.split(SEP)
+        names = [f.name for f in fields(cls)]  # type: ignore[arg-type]
+        if prefix != cls.prefix or len(parts) != len(names):
+            raise ValueError(f"Not a {cls.__name__} payload: {data!r}")
+        kwargs: dict[str, Any] = {}
+        for name, raw in zip(names, parts):
+            values = cls.vocab.get(name)
+            if values is None:
+                kwargs[name] = int(raw, 36)
+                continue
+            # Plain base-36 digits only: int() would also take "-1", "+1" or "1_0".
+            index = int(raw, 36) if raw.isascii() and raw.isalnum() else -1
+            if not 0 <= index < len(values):
+                raise ValueError(f"Bad {name} in {cls.__name__} payload: {data!r}")
+            kwargs[name] = values[index]
+        return cls(**kwargs)
+
+
+def decode(data: str) -> Optional[CallbackCodec]:
+    """Payload for callback_data, or None for unknown/stale buttons (e.g. the old pydantic format)."""
+    cls = _PREFIXES.get(data.partition(SEP)[0])
+    if cls is None:
+        return None
+    try:
+        return cls.unpack(data)
+    except (ValueError, IndexError):
+        return None
+
+
+@dataclass(frozen=True)
+class CloseCb(CallbackCodec, prefix="x"):
     initiator: int
 
 
-class DigitCb(CallbackData, prefix="digit"):
+@dataclass(frozen=True)
+class DigitCb(CallbackCodec, prefix="d"):
+    vocab = {"field": AMOUNT_FIELDS}
+
     initiator: int
-    field: str  # "amount_k"
+    field: str
     digit: int
 
+    def route_key(self) -> Optional[str]:
+        return self.field
+
+
+@dataclass(frozen=True)
+class NumActionCb(CallbackCodec, prefix="n"):
+    vocab = {"field": AMOUNT_FIELDS, "action": ("ok", "back", "clear", "cancel")}
 
-class NumActionCb(CallbackData, prefix="numact"):
     initiator: int
-    field: str  # "amount_k"
-    action: str  # ok | back | clear | cancel
+    field: str
+    action: str
+
+    def route_key(self) -> Optional[str]:
+        # "Bekor qilish" is handled once for every keyboard.
+        return "cancel" if self.action == "cancel" else self.field
 
 
-class PickMemberCb(CallbackData, prefix="pickm"):
+@dataclass(frozen=True)
+class PickMemberCb(CallbackCodec, prefix="m"):
+    vocab = {"field": ("room_paid_by", "split_paid_by", "payer", "receiver")}
+
     initiator: int
-    field: str  # paid_by | payer | receiver
+    field: str
     member_id: int
 
+    def route_key(self) -> Optional[str]:
+        return self.field
+
+
+@dataclass(frozen=True)
+class PageCb(CallbackCodec, prefix="g"):
+    vocab = {"flow": ("setup", "room_payer", "split_payer", "split_participants", "pay_payer", "pay_receiver")}
 
-class PageCb(CallbackData, prefix="page"):
     initiator: int
-    flow: str  # setup | room_payer | split_payer | split_participants | pay_payer | pay_receiver
+    flow: str
     page: int
 
+    def route_key(self) -> Optional[str]:
+        return self.flow
+
 
-class SetupToggleResidentCb(CallbackData, prefix="setup_res"):
+@dataclass(frozen=True)
+class SetupToggleResidentCb(CallbackCodec, prefix="r"):
     initiator: int
     member_id: int
     page: int
 
 
-class SetupDoneCb(CallbackData, prefix="setup_done"):
+@dataclass(frozen=True)
+class SetupDoneCb(CallbackCodec, prefix="s"):
     initiator: int
 
 
-class ToggleParticipantCb(CallbackData, prefix="tpart"):
+@dataclass(frozen=True)
+class ToggleParticipantCb(CallbackCodec, prefix="t"):
     initiator: int
     member_id: int
 
 
-class SplitParticipantsActionCb(CallbackData, prefix="spact"):
+@dataclass(frozen=True)
+class SplitParticipantsActionCb(CallbackCodec, prefix="a"):
+    vocab = {"action": ("done", "all", "clear")}
+
     initiator: int
-    action: str  # done | all | clear
+    action: str
+
 
+@dataclass(frozen=True)
+class ConfirmCb(CallbackCodec, prefix="c"):
+    vocab = {"flow": ("room", "split", "pay")}
 
-class ConfirmCb(CallbackData, prefix="confirm"):
     initiator: int
-    flow: str  # room | split | pay
+    flow: str
 
+    def route_key(self) -> Optional[str]:
+        return self.flow
+
+
+@dataclass(frozen=True)
+class HistoryCb(CallbackCodec, prefix="h"):
+    # Keyset cursor: the page is the rows right before/after (created_us, tx_id).
+    vocab = {"direction": ("older", "newer")}
+
+    initiator: int
+    direction: str
+    created_us: int  # created_at in microseconds since the Unix epoch
+    tx_id: int
@@ -3,6 +3,7 @@ from __future__ import annotations
 import asyncio
 import logging
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Optional
 
@@ -12,13 +13,18 @@ from aiogram.exceptions import TelegramBadRequest
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from expense_splitting_bot.bot.dashboard_render import render_dashboard
-from expense_splitting_bot.db.models import Chat, Member
-from expense_splitting_bot.services.ledger import compute_balances, compute_room_total_k, compute_settlement
-from expense_splitting_bot.services.members import list_members, list_residents
+from expense_splitting_bot.bot.dashboard_render import dashboard_content_hash, finish_dashboard, render_dashboard_body
+from expense_splitting_bot.bot.dashboard_sync import PgDashboardCoordinator
+from expense_splitting_bot.bot.ledger_cache import LedgerCache
+from expense_splitting_bot.bot.middlewares import AFTER_COMMIT
+from expense_splitting_bot.bot.outbound import Priority, outbound_priority
+from expense_splitting_bot.db.jobs import JobQueue
+from expense_splitting_bot.db.models import Chat
 
 logger = logging.getLogger(__name__)
 
+DASHBOARD_JOB = "dashboard_refresh"
+
 
 @dataclass
 class _ChatDashState:
@@ -26,6 +32,20 @@ class _ChatDashState:
     pending: Optional[asyncio.Task]
     dirty: bool
     last_edit_monotonic: float
+    content_hash: Optional[str] = None
+    # Adaptive debounce: reset to the minimum after a quiet spell, doubled per write in a burst.
+    delay: float = 0.0
+    last_schedule_monotonic: float = 0.0
+
+
+@dataclass(frozen=True)
+class DashboardStats:
+    edits_sent: int
+    edits_skipped: int  # refreshes whose body matched what Telegram already shows
+    live_states: int
+    running_workers: int
+    evictions: int
+    lock_busy: int  # refreshes deferred because another instance held the chat's lock
 
 
 class DashboardManager:
@@ -35,24 +55,149 @@ class DashboardManager:
         bot: Bot,
         sessionmaker: async_sessionmaker[AsyncSession],
         debounce_seconds: float,
+        ledger_cache: LedgerCache,
+        min_debounce_seconds: float = 0.25,
+        state_ttl_seconds: float = 3600.0,
+        max_states: int = 10_000,
+        max_workers: int = 0,
+        coordinator: Optional[PgDashboardCoordinator] = None,
+        job_queue: Optional[JobQueue] = None,
     ) -> None:
         self._bot = bot
         self._sessionmaker = sessionmaker
+        # debounce_seconds is the cap; an isolated write waits only min_debounce_seconds.
         self._debounce = debounce_seconds
-        self._states: dict[int, _ChatDashState] = {}
+        self._min_debounce = min(min_debounce_seconds, debounce_seconds)
+        self._ledger_cache = ledger_cache
+        # LRU order: least recently scheduled first. Idle states expire after state_ttl_seconds
+        # and the oldest idle ones are dropped beyond max_states (the hash also lives on chats).
+        self._states: OrderedDict[int, _ChatDashState] = OrderedDict()
+        self._state_ttl = state_ttl_seconds
+        self._max_states = max(1, int(max_states))
+        # Caps concurrent refreshes (DB + Telegram work); 0 means unlimited.
+        self._refresh_slots: Optional[asyncio.Semaphore] = asyncio.Semaphore(max_workers) if max_workers > 0 else None
+        self._edits_sent = 0
+        self._edits_skipped = 0
+        self._evictions = 0
+        # None: single process, debounce and locking stay in memory.
+        self._coordinator = coordinator
+        self._lock_busy = 0
+        # When set, refreshes are durable jobs (one queued per chat) run by any process.
+        self._job_queue = job_queue
+        if job_queue is not None:
+            job_queue.register(DASHBOARD_JOB, self._run_job)
+
+    async def start(self) -> None:
+        if self._coordinator is not None:
+            await self._coordinator.start(on_notify=self._schedule_local, on_reconnect=self._schedule_all)
 
-    def schedule(self, tg_chat_id: int) -> None:
+    async def stop(self) -> None:
+        if self._coordinator is not None:
+            await self._coordinator.stop()
+
+    def _state(self, tg_chat_id: int) -> _ChatDashState:
         state = self._states.get(tg_chat_id)
         if state is None:
             state = _ChatDashState(lock=asyncio.Lock(), pending=None, dirty=False, last_edit_monotonic=0.0)
             self._states[tg_chat_id] = state
+        self._states.move_to_end(tg_chat_id)
+        return state
+
+    @staticmethod
+    def _is_idle(state: _ChatDashState) -> bool:
+        return not state.dirty and (state.pending is None or state.pending.done())
+
+    def _evict(self, now: float) -> None:
+        over = len(self._states) - self._max_states
+        for tg_chat_id in list(self._states):
+            state = self._states[tg_chat_id]
+            if not self._is_idle(state):
+                continue
+            last_active = max(state.last_schedule_monotonic, state.last_edit_monotonic)
+            if over > 0 or now - last_active > self._state_ttl:
+                del self._states[tg_chat_id]
+                self._evictions += 1
+                over -= 1
+            else:
+                # Remaining states are more recently used; nothing else has expired.
+                break
+
+    def stats(self) -> DashboardStats:
+        return DashboardStats(
+            edits_sent=self._edits_sent,
+            edits_skipped=self._edits_skipped,
+            live_states=len(self._states),
+            running_workers=sum(1 for s in self._states.values() if s.pending is not None and not s.pending.done()),
+            evictions=self._evictions,
+            lock_busy=self._lock_busy,
+        )
 
+    def effective_delays(self) -> dict[int, float]:
+        """Current debounce delay per tg_chat_id."""
+        return {tg_chat_id: state.delay for tg_chat_id, state in self._states.items()}
+
+    async def schedule(self, tg_chat_id: int, *, session: AsyncSession) -> None:
+        """Queue a refresh for the handler's writes; nothing runs before session commits."""
+        if self._job_queue is not None:
+            # The job row commits (or rolls back) with the handler's transaction.
+            state = self._bump(tg_chat_id)
+            await self._job_queue.enqueue(
+                DASHBOARD_JOB,
+                {"tg_chat_id": tg_chat_id},
+                dedup_key=f"dashboard:{tg_chat_id}",
+                delay_seconds=state.delay,
+                session=session,
+            )
+            return
+        if self._coordinator is not None:
+            # Every instance, this one included, hears the NOTIFY and debounces locally.
+            await self._coordinator.publish(session, tg_chat_id)
+            return
+        session.info.setdefault(AFTER_COMMIT, []).append(lambda: self._schedule_local(tg_chat_id))
+
+    def _schedule_all(self) -> None:
+        for tg_chat_id in list(self._states):
+            self._schedule_local(tg_chat_id)
+
+    def _bump(self, tg_chat_id: int) -> _ChatDashState:
+        """Record a write for the adaptive debounce; returns the chat's state with the new delay."""
+        now = time.monotonic()
+        self._evict(now)
+        state = self._state(tg_chat_id)
+        if state.last_schedule_monotonic and now - state.last_schedule_monotonic < self._debounce:
+            state.delay = min(self._debounce, max(self._min_debounce, state.delay * 2))
+        else:
+            state.delay = self._min_debounce
+        state.last_schedule_monotonic = now
+        return state
+
+    def _schedule_local(self, tg_chat_id: int) -> None:
+        state = self._bump(tg_chat_id)
         state.dirty = True
         if state.pending is None or state.pending.done():
             state.pending = asyncio.create_task(self._worker(tg_chat_id))
 
-    async def update_now(self, tg_chat_id: int) -> None:
-        await self._update(tg_chat_id)
+    async def update_now(self, tg_chat_id: int, *, force: bool = False) -> None:
+        if not await self._update(tg_chat_id, force=force):
+            self._schedule_local(tg_chat_id)
+            return
+        state = self._states.get(tg_chat_id)
+        if state is not None:
+            state.last_edit_monotonic = time.monotonic()
+
+    async def _run_job(self, payload: dict) -> None:
+        tg_chat_id = int(payload["tg_chat_id"])
+        if self._refresh_slots is None:
+            done = await self._update(tg_chat_id)
+        else:
+            async with self._refresh_slots:
+                done = await self._update(tg_chat_id)
+        if not done:
+            # Another instance holds the chat's lock (update_now); queue a refresh after it.
+            await self._job_queue.enqueue(
+                DASHBOARD_JOB, payload, dedup_key=f"dashboard:{tg_chat_id}", delay_seconds=self._debounce
+            )
+            return
         state = self._states.get(tg_chat_id)
         if state is not None:
             state.last_edit_monotonic = time.monotonic()
@@ -64,7 +209,10 @@ class DashboardManager:
                 if state is None:
                     return
 
-                wait_s = max(0.0, self._debounce - (time.monotonic() - state.last_edit_monotonic))
+                # At least the floor (to coalesce near-simultaneous writes), and no closer
+                # than the chat's current delay to the previous edit.
+                since_edit = time.monotonic() - state.last_edit_monotonic
+                wait_s = max(self._min_debounce, state.delay - since_edit)
                 await asyncio.sleep(wait_s)
 
                 async with state.lock:
@@ -72,35 +220,57 @@ class DashboardManager:
                         return
                     state.dirty = False
 
-                await self._update(tg_chat_id)
+                if self._refresh_slots is None:
+                    done = await self._update(tg_chat_id)
+                else:
+                    async with self._refresh_slots:
+                        done = await self._update(tg_chat_id)
 
                 async with state.lock:
-                    state.last_edit_monotonic = time.monotonic()
+                    if done:
+                        state.last_edit_monotonic = time.monotonic()
+                    else:
+                        # Another instance is refreshing; look again once it is likely done.
+                        state.dirty = True
         except Exception:
             logger.exception("Dashboard worker crashed for tg_chat_id=%s", tg_chat_id)
 
-    async def _update(self, tg_chat_id: int) -> None:
+    async def _update(self, tg_chat_id: int, *, force: bool = False) -> bool:
+        # Dashboard edits yield to interactive replies in the outbound queue.
+        with outbound_priority(Priority.DASHBOARD):
+            return await self._refresh(tg_chat_id, force=force)
+
+    async def _refresh(self, tg_chat_id: int, *, force: bool) -> bool:
+        """Returns False when another instance holds this chat's dashboard lock."""
         async with self._sessionmaker() as session:
+            if self._coordinator is not None and not await self._coordinator.try_lock(session, tg_chat_id):
+                self._lock_busy += 1
+                return False
+            # Read only after locking, so a previous holder's message id and hash are visible.
             chat = await session.scalar(select(Chat).where(Chat.tg_chat_id == tg_chat_id))
             if chat is None:
                 # If someone calls schedule before middleware upsert (rare), just no-op.
-                return
+                return True
 
-            members = await list_members(session, chat_id=chat.id)
-            residents = await list_residents(session, chat_id=chat.id)
-            balances = await compute_balances(session, chat_id=chat.id)
-            transfers = compute_settlement(balances)
-            room_total_k = await compute_room_total_k(session, chat_id=chat.id)
-            members_by_id: dict[int, Member] = {m.id: m for m in members}
+            view = await self._ledger_cache.get_view(session, chat_id=chat.id, version=chat.ledger_version)
+            summary = view.summary
 
-            text = render_dashboard(
+            body = render_dashboard_body(
                 chat_title=chat.title,
-                residents=residents,
-                room_total_k=room_total_k,
-                balances=balances,
-                transfers=transfers,
-                members_by_id=members_by_id,
+                residents=summary.residents,
+                room_total_k=summary.room_total_k,
+                balances=summary.balances,
+                transfers=summary.transfers,
+                members_by_id=summary.members_by_id,
             )
+            content_hash = dashboard_content_hash(body)
+            state = self._state(tg_chat_id)
+            # chats.dashboard_content_hash is authoritative; memory only fills in while it is still empty.
+            last_hash = chat.dashboard_content_hash or state.content_hash
+            if not force and chat.dashboard_message_id is not None and content_hash == last_hash:
+                self._edits_skipped += 1
+                return True
+            text = finish_dashboard(body)
 
             if chat.dashboard_message_id is None:
                 msg = await self._bot.send_message(
@@ -109,13 +279,16 @@ class DashboardManager:
                     parse_mode=ParseMode.HTML,
                     disable_web_page_preview=True,
                 )
+                self._edits_sent += 1
+                state.content_hash = content_hash
                 chat.dashboard_message_id = msg.message_id
+                chat.dashboard_content_hash = content_hash
                 await session.commit()
                 try:
                     await self._bot.pin_chat_message(chat_id=tg_chat_id, message_id=msg.message_id, disable_notification=True)
                 except Exception:
                     pass
-                return
+                return True
 
             try:
                 await self._bot.edit_message_text(
@@ -127,16 +300,30 @@ class DashboardManager:
                 )
             except TelegramBadRequest as e:
                 if "message is not modified" in str(e).lower():
-                    return
+                    state.content_hash = content_hash
+                    chat.dashboard_content_hash = content_hash
+                    await session.commit()
+                    return True
                 # Message deleted or not editable: recreate.
                 old_id = chat.dashboard_message_id
-                msg = await self._bot.send_message(
-                    chat_id=tg_chat_id,
-                    text=text,
-                    parse_mode=ParseMode.HTML,
-                    disable_web_page_preview=True,
-                )
+                try:
+                    msg = await self._bot.send_message(
+                        chat_id=tg_chat_id,
+                        text=text,
+                        parse_mode=ParseMode.HTML,
+                        disable_web_page_preview=True,
+                    )
+                except Exception:
+                    # Forget the lost message, so the next refresh sends one instead of skipping on the hash.
+                    state.content_hash = None
+                    chat.dashboard_message_id = None
+                    chat.dashboard_content_hash = None
+                    await session.commit()
+                    raise
+                self._edits_sent += 1
+                state.content_hash = content_hash
                 chat.dashboard_message_id = msg.message_id
+                chat.dashboard_content_hash = content_hash
                 await session.commit()
                 try:
                     if old_id and old_id != msg.message_id:
@@ -144,3 +331,10 @@ class DashboardManager:
                     await self._bot.pin_chat_message(chat_id=tg_chat_id, message_id=msg.message_id, disable_notification=True)
                 except Exception:
                     pass
+                return True
+
+            self._edits_sent += 1
+            state.content_hash = content_hash
+            chat.dashboard_content_hash = content_hash
+            await session.commit()
+        return True
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import html
 from datetime import datetime, timezone
 
@@ -12,7 +13,7 @@ def _esc(s: str) -> str:
     return html.escape(s, quote=False)
 
 
-def render_dashboard(
+def render_dashboard_body(
     *,
     chat_title: str | None,
     residents: list[Member],
@@ -52,9 +53,8 @@ def render_dashboard(
     if not lines_settle:
         lines_settle = ["Hozircha kerak emas."]
 
-    updated = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
-
-    text = (
+    # Everything except the "Yangilandi" footer; dashboard_content_hash is taken over this.
+    return (
         f"{title}\n\n"
         f"<b>Residents:</b>\n"
         f"{residents_txt}\n\n"
@@ -63,7 +63,14 @@ def render_dashboard(
         f"<pre>{_esc(chr(10).join(lines_bal))}</pre>\n"
         f"<b>Tavsiya etilgan to'lovlar:</b>\n"
         f"<pre>{_esc(chr(10).join(lines_settle))}</pre>\n"
-        f"<i>Yangilandi: {updated}</i>"
     )
-    return text[:4096]
 
+
+def dashboard_content_hash(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def finish_dashboard(body: str) -> str:
+    updated = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    text = f"{body}<i>Yangilandi: {updated}</i>"
+    return text[:4096]
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from expense_splitting_bot.db.notify import PgNotifyListener
+
+logger = logging.getLogger(__name__)
+
+# First key of the two-key advisory lock form; keeps dashboard locks apart from any other
+# advisory locks taken against the same database.
+DASHBOARD_LOCK_NAMESPACE = 0x4453  # "DS"
+
+
+class PgDashboardCoordinator:
+    """
+    Cross-process dashboard coordination over Postgres.
+
+    publish() NOTIFYs the channel with a tg_chat_id inside the writer's transaction, so it
+    goes out on commit; every instance (the sender included) LISTENs and feeds it to its
+    local debounce. try_lock() takes a transaction-scoped
+    advisory lock per chat, so only one instance at a time reads, sends/edits and
+    commits a chat's dashboard row. The others retry later and find the hash unchanged.
+    """
+
+    def __init__(self, *, engine: AsyncEngine, channel: str = "dashboard_refresh") -> None:
+        self._engine = engine
+        self._channel = channel
+        self._on_notify: Optional[Callable[[int], None]] = None
+        self._listener: Optional[PgNotifyListener] = None
+
+    async def start(self, *, on_notify: Callable[[int], None], on_reconnect: Callable[[], None]) -> None:
+        self._on_notify = on_notify
+        if self._listener is None:
+            self._listener = PgNotifyListener(
+                engine=self._engine,
+                channel=self._channel,
+                on_notify=self._handle,
+                on_reconnect=on_reconnect,
+            )
+        await self._listener.start()
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            await self._listener.stop()
+
+    async def publish(self, session: AsyncSession, tg_chat_id: int) -> None:
+        """NOTIFY on the caller's session; Postgres delivers it only if that transaction commits."""
+        await session.execute(select(func.pg_notify(self._channel, str(tg_chat_id))))
+
+    @staticmethod
+    async def try_lock(session: AsyncSession, tg_chat_id: int) -> bool:
+        """Advisory lock for this chat's dashboard, held until the session's transaction ends."""
+        return bool(
+            await session.scalar(
+                select(
+                    func.pg_try_advisory_xact_lock(
+                        DASHBOARD_LOCK_NAMESPACE,
+                        func.hashtext(str(tg_chat_id)),
+                    )
+                )
+            )
+        )
+
+    def _handle(self, payload: str) -> None:
+        try:
+            tg_chat_id = int(payload)
+        except ValueError:
+            logger.warning("Ignoring dashboard notification with payload %r", payload)
+            return
+        if self._on_notify is not None:
+            self._on_notify(tg_chat_id)
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from expense_splitting_bot.bot.outbound import Priority, outbound_priority
+from expense_splitting_bot.db.models import ScheduledDeletion
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT/DELETE statement (3 bind parameters per upserted row).
+_CHUNK = 1000
+# deleteMessages accepts at most 100 ids per call.
+_BULK_DELETE_LIMIT = 100
+
+_Key = tuple[int, int]  # (tg_chat_id, message_id)
+
+
+class _Entry:
+    __slots__ = ("key", "rounds", "cancelled")
+
+    def __init__(self, key: _Key, rounds: int) -> None:
+        self.key = key
+        self.rounds = rounds  # full wheel turns left before the entry fires
+        self.cancelled = False
+
+
+@dataclass(frozen=True)
+class DeletionSchedulerStats:
+    scheduled: int
+    pending_writes: int
+    fired: int
+    deleted: int
+    claimed_elsewhere: int
+    swept: int
+    api_calls: int
+    failed: int  # messages whose Bot API call failed and will be retried
+
+
+class DeletionScheduler:
+    """
+    Deletes temporary bot/user messages after a delay, replacing one sleeping task per message.
+
+    Deadlines scheduled by this process sit in a hashed timer wheel (wheel_slots buckets of
+    tick_seconds each; an entry further out than one turn carries a round count) and in the
+    scheduled_deletions table. New deadlines are written in one multi-row upsert per tick; a
+    deadline that fires before it was written never touches the table. Due messages are
+    claimed only once due_at has passed, so a deadline pushed back by another process (or by
+    another schedule() here) is not deleted early. Claimed messages are sent as one
+    deleteMessages call per chat.
+
+    A claim leases the row (due_at moves lease_seconds ahead) and the row is deleted only
+    after Telegram took the call. When the call fails (network, RetryAfter past its retries,
+    shutdown) the row comes due again once the lease ends; a failed deadline that was never
+    written goes back to be written.
+
+    The wheel holds only this process's own deadlines. Rows left by a previous run, another
+    replica or a failed call are claimed by due time from the table every
+    sweep_interval_seconds once overdue by orphan_grace_seconds, with SKIP LOCKED, so each
+    row has one claimant at a time.
+    """
+
+    def __init__(
+        self,
+        *,
+        bot: Bot,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        tick_seconds: float = 1.0,
+        wheel_slots: int = 512,
+        sweep_interval_seconds: float = 5.0,
+        orphan_grace_seconds: float = 5.0,
+        lease_seconds: float = 120.0,
+    ) -> None:
+        self._bot = bot
+        self._sessionmaker = sessionmaker
+        self._tick = tick_seconds
+        self._slots: list[list[_Entry]] = [[] for _ in range(max(1, int(wheel_slots)))]
+        self._cursor = 0  # next slot to process, at self._next_tick
+        self._next_tick = time.monotonic() + tick_seconds
+        self._index: dict[_Key, _Entry] = {}
+        self._pending: dict[_Key, datetime] = {}  # deadlines not written to the table yet
+        self._sweep_interval = sweep_interval_seconds
+        self._grace = orphan_grace_seconds
+        self._lease = timedelta(seconds=lease_seconds)
+        self._runner: Optional[asyncio.Task] = None
+
+        self._fired = 0
+        self._deleted = 0
+        self._claimed_elsewhere = 0
+        self._swept = 0
+        self._api_calls = 0
+        self._failed = 0
+
+    async def start(self) -> None:
+        # Rows a previous run left pending are claimed by the first sweep.
+        self._runner = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        # Whatever is still in the wheel is swept by another process or the next start().
+        await self._flush()
+
+    def schedule(self, *, chat_id: int, message_id: int, delay_seconds: float) -> None:
+        key = (chat_id, message_id)
+        old = self._index.pop(key, None)
+        if old is not None:
+            old.cancelled = True
+        self._place(key, time.monotonic() + delay_seconds)
+        self._pending[key] = datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)
+
+    def stats(self) -> DeletionSchedulerStats:
+        return DeletionSchedulerStats(
+            scheduled=len(self._index),
+            pending_writes=len(self._pending),
+            fired=self._fired,
+            deleted=self._deleted,
+            claimed_elsewhere=self._claimed_elsewhere,
+            swept=self._swept,
+            api_calls=self._api_calls,
+            failed=self._failed,
+        )
+
+    def _place(self, key: _Key, due: float) -> None:
+        ticks = max(0, math.ceil((due - self._next_tick) / self._tick))
+        n = len(self._slots)
+        entry = _Entry(key, ticks // n)
+        self._slots[(self._cursor + ticks) % n].append(entry)
+        self._index[key] = entry
+
+    def _advance(self) -> list[_Key]:
+        due: list[_Key] = []
+        keep: list[_Entry] = []
+        for entry in self._slots[self._cursor]:
+            if entry.cancelled:
+                continue
+            if entry.rounds == 0:
+                due.append(entry.key)
+                del self._index[entry.key]
+            else:
+                entry.rounds -= 1
+                keep.append(entry)
+        self._slots[self._cursor] = keep
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        self._next_tick += self._tick
+        return due
+
+    async def _flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        rows = [{"tg_chat_id": c, "message_id": m, "due_at": due} for (c, m), due in batch.items()]
+        try:
+            async with self._sessionmaker() as session:
+                for i in range(0, len(rows), _CHUNK):
+                    stmt = insert(ScheduledDeletion).values(rows[i : i + _CHUNK])
+                    await session.execute(
+                        stmt.on_conflict_do_update(
+                            index_elements=[ScheduledDeletion.tg_chat_id, ScheduledDeletion.message_id],
+                            set_={"due_at": stmt.excluded.due_at},
+                        )
+                    )
+                await session.commit()
+        except Exception:
+            # Keep newer deadlines scheduled meanwhile.
+            for key, due in batch.items():
+                self._pending.setdefault(key, due)
+            raise
+
+    async def _claim(self, keys: list[_Key]) -> dict[_Key, datetime]:
+        """Lease the due rows among keys; returns each claimed key with its lease end."""
+        claimed: dict[_Key, datetime] = {}
+        async with self._sessionmaker() as session:
+            for i in range(0, len(keys), _CHUNK):
+                res = await session.execute(
+                    update(ScheduledDeletion)
+                    .where(
+                        tuple_(ScheduledDeletion.tg_chat_id, ScheduledDeletion.message_id).in_(keys[i : i + _CHUNK]),
+                        # A row re-armed since this entry was placed waits for its new deadline.
+                        ScheduledDeletion.due_at <= func.now(),
+                    )
+                    .values(due_at=func.now() + self._lease)
+                    .returning(ScheduledDeletion.tg_chat_id, ScheduledDeletion.message_id, ScheduledDeletion.due_at)
+                    .execution_options(synchronize_session=False)
+                )
+                claimed.update(((c, m), lease) for c, m, lease in res.all())
+            await session.commit()
+        return claimed
+
+    async def _sweep(self) -> dict[_Key, datetime]:
+        overdue = (
+            select(ScheduledDeletion.tg_chat_id, ScheduledDeletion.message_id)
+            .where(ScheduledDeletion.due_at <= func.now() - timedelta(seconds=self._grace))
+            .order_by(ScheduledDeletion.due_at)
+            .limit(_CHUNK)
+            .with_for_update(skip_locked=True)
+        )
+        async with self._sessionmaker() as session:
+            res = await session.execute(
+                update(ScheduledDeletion)
+                .where(tuple_(ScheduledDeletion.tg_chat_id, ScheduledDeletion.message_id).in_(overdue))
+                .values(due_at=func.now() + self._lease)
+                .returning(ScheduledDeletion.tg_chat_id, ScheduledDeletion.message_id, ScheduledDeletion.due_at)
+                .execution_options(synchronize_session=False)
+            )
+            swept = {(c, m): lease for c, m, lease in res.all()}
+            await session.commit()
+        for key in swept:
+            entry = self._index.pop(key, None)
+            if entry is not None:
+                entry.cancelled = True
+        return swept
+
+    async def _release(self, leases: list[tuple[int, int, datetime]]) -> None:
+        """Drop the rows of finished deletions (a row re-armed since its claim stays)."""
+        async with self._sessionmaker() as session:
+            for i in range(0, len(leases), _CHUNK):
+                await session.execute(
+                    delete(ScheduledDeletion).where(
+                        tuple_(
+                            ScheduledDeletion.tg_chat_id, ScheduledDeletion.message_id, ScheduledDeletion.due_at
+                        ).in_(leases[i : i + _CHUNK])
+                    )
+                )
+            await session.commit()
+
+    async def _fire(self, due: list[_Key]) -> None:
+        self._fired += len(due)
+        # Deadlines that fire before their row was written need no claim.
+        local = [key for key in due if self._pending.pop(key, None) is not None]
+        unwritten = set(local)
+        stored = [key for key in due if key not in unwritten]
+        claimed: dict[_Key, datetime] = {}
+        if stored:
+            try:
+                claimed = await self._claim(stored)
+            except BaseException:
+                self._requeue(local)
+                raise
+            self._claimed_elsewhere += len(stored) - len(claimed)
+        await self._delete(local + list(claimed), claimed)
+
+    def _requeue(self, keys: list[_Key]) -> None:
+        # Written on the next flush (or close()) and picked up by a sweep.
+        now = datetime.now(timezone.utc)
+        for key in keys:
+            self._pending.setdefault(key, now)
+
+    async def _delete(self, keys: list[_Key], leases: dict[_Key, datetime]) -> None:
+        by_chat: defaultdict[int, list[int]] = defaultdict(list)
+        for chat_id, message_id in keys:
+            by_chat[chat_id].append(message_id)
+        done: list[_Key] = []
+        try:
+            await asyncio.gather(*(self._delete_in_chat(chat_id, ids, done) for chat_id, ids in by_chat.items()))
+        finally:
+            finished = set(done)
+            failed = [key for key in keys if key not in finished]
+            self._failed += len(failed)
+            # Leased rows come due again on their own.
+            self._requeue([key for key in failed if key not in leases])
+        released = [(c, m, leases[(c, m)]) for c, m in done if (c, m) in leases]
+        if released:
+            await self._release(released)
+
+    async def _delete_in_chat(self, chat_id: int, message_ids: list[int], done: list[_Key]) -> None:
+        message_ids.sort()
+        for i in range(0, len(message_ids), _BULK_DELETE_LIMIT):
+            chunk = message_ids[i : i + _BULK_DELETE_LIMIT]
+            self._api_calls += 1
+            try:
+                with outbound_priority(Priority.CLEANUP):
+                    if len(chunk) == 1:
+                        await self._bot.delete_message(chat_id=chat_id, message_id=chunk[0])
+                    else:
+                        # Messages that are already gone are skipped by Telegram.
+                        await self._bot.delete_messages(chat_id=chat_id, message_ids=chunk)
+                self._deleted += len(chunk)
+            except (TelegramBadRequest, TelegramForbiddenError):
+                # Already gone, or no rights in the chat: retrying will not help.
+                pass
+            except Exception:
+                logger.warning("Deleting %s message(s) in chat %s failed; will retry", len(chunk), chat_id, exc_info=True)
+                continue
+            done.extend((chat_id, m) for m in chunk)
+
+    async def _run(self) -> None:
+        next_sweep = time.monotonic()
+        while True:
+            await asyncio.sleep(max(0.0, self._next_tick - time.monotonic()))
+            due: list[_Key] = []
+            # Catch up on ticks missed while the loop was busy.
+            while self._next_tick <= time.monotonic():
+                due.extend(self._advance())
+            try:
+                if due:
+                    await self._fire(due)
+                await self._flush()
+            except Exception:
+                # Unclaimed rows stay in the table and are swept once overdue.
+                logger.exception("Scheduled message deletion failed")
+            if time.monotonic() >= next_sweep:
+                next_sweep = time.monotonic() + self._sweep_interval
+                try:
+                    swept = await self._sweep()
+                    if swept:
+                        self._swept += len(swept)
+                        logger.info("Deleting %s overdue message(s) claimed from the table", len(swept))
+                        await self._delete(list(swept), swept)
+                except Exception:
+                    logger.exception("Scheduled deletion sweep failed")
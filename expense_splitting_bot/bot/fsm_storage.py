@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import case, delete, func, literal, null, select
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from expense_splitting_bot.db.models import FsmRecord
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT/DELETE statement when flushing (4 bind parameters per upserted row).
+_FLUSH_CHUNK = 1000
+
+
+@dataclass
+class _Record:
+    state: Optional[str] = None
+    data: dict[str, Any] = field(default_factory=dict)
+    expires: float = 0.0  # monotonic; an untouched record reads as empty after this
+    dirty: bool = False
+
+
+@dataclass(frozen=True)
+class FsmStorageStats:
+    cached: int
+    dirty: int
+    hits: int
+    misses: int
+    flushes: int
+    rows_written: int
+
+
+class PgFsmStorage(BaseStorage):
+    """
+    aiogram FSM storage in the fsm_records table.
+
+    A key not written for ttl_seconds reads as empty (abandoned wizard); expired rows are
+    purged every purge_interval_seconds.
+
+    In a single process (the default) reads are served from an in-process cache once a key
+    has been loaded, and writes update the cache at once and are flushed to Postgres in
+    batches every flush_interval_seconds, so the digit taps of a wizard cost one upsert per
+    interval instead of one per tap.
+
+    With shared set (replicas sharing wizard state) there is no cache: every read goes to
+    Postgres and every write is one upsert of the column it sets, committed before it
+    returns. update_data merges in that upsert too, so two replicas handling taps of the
+    same wizard cannot write back each other's stale data.
+    """
+
+    def __init__(
+        self,
+        *,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        ttl_seconds: float = 1800.0,
+        flush_interval_seconds: float = 0.5,
+        max_cached: int = 10_000,
+        purge_interval_seconds: float = 600.0,
+        shared: bool = False,
+        key_builder: Optional[KeyBuilder] = None,
+    ) -> None:
+        self._sessionmaker = sessionmaker
+        self._ttl = ttl_seconds
+        self._flush_interval = flush_interval_seconds
+        self._max_cached = max(1, int(max_cached))
+        self._purge_interval = purge_interval_seconds
+        self._key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+        self._cache: OrderedDict[str, _Record] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._shared = shared
+
+        self._hits = 0
+        self._misses = 0
+        self._flushes = 0
+        self._rows_written = 0
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
+
+    def stats(self) -> FsmStorageStats:
+        return FsmStorageStats(
+            cached=len(self._cache),
+            dirty=len(self._dirty),
+            hits=self._hits,
+            misses=self._misses,
+            flushes=self._flushes,
+            rows_written=self._rows_written,
+        )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = self._key(key)
+        value = state.state if isinstance(state, State) else state
+        if self._shared:
+            await self._write_through(k, "state", value)
+            return
+        record = await self._load(k)
+        record.state = value
+        self._touch(k, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        if self._shared:
+            return (await self._read(self._key(key)))[0]
+        return (await self._load(self._key(key))).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        k = self._key(key)
+        if self._shared:
+            await self._write_through(k, "data", dict(data))
+            return
+        record = await self._load(k)
+        # Deep copies both ways: nested lists must not change the cache behind the flusher's back.
+        record.data = copy.deepcopy(dict(data))
+        self._touch(k, record)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        if self._shared:
+            return (await self._read(self._key(key)))[1]
+        return copy.deepcopy((await self._load(self._key(key))).data)
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> dict[str, Any]:
+        if self._shared:
+            return await self._write_through(self._key(key), "data", dict(data), merge=True)
+        return await super().update_data(key, data)
+
+    async def flush(self) -> int:
+        """Write every dirty key now; returns the number of keys written."""
+        keys = sorted(self._dirty)
+        if not keys:
+            return 0
+        self._dirty.clear()
+
+        upserts: list[dict[str, Any]] = []
+        deletes: list[str] = []
+        expires_at = func.now() + timedelta(seconds=self._ttl)
+        for k in keys:
+            record = self._cache.get(k)
+            if record is None:
+                continue
+            record.dirty = False
+            if record.state is None and not record.data:
+                deletes.append(k)
+            else:
+                upserts.append(
+                    {"key": k, "state": record.state, "data": copy.deepcopy(record.data), "expires_at": expires_at}
+                )
+
+        try:
+            async with self._sessionmaker() as session:
+                for i in range(0, len(upserts), _FLUSH_CHUNK):
+                    stmt = insert(FsmRecord).values(upserts[i : i + _FLUSH_CHUNK])
+                    await session.execute(
+                        stmt.on_conflict_do_update(
+                            index_elements=[FsmRecord.key],
+                            set_={
+                                "state": stmt.excluded.state,
+                                "data": stmt.excluded.data,
+                                "expires_at": stmt.excluded.expires_at,
+                            },
+                        )
+                    )
+                for i in range(0, len(deletes), _FLUSH_CHUNK):
+                    await session.execute(delete(FsmRecord).where(FsmRecord.key.in_(deletes[i : i + _FLUSH_CHUNK])))
+                await session.commit()
+        except Exception:
+            for k in keys:
+                record = self._cache.get(k)
+                if record is not None:
+                    record.dirty = True
+                    self._dirty.add(k)
+            raise
+
+        self._flushes += 1
+        self._rows_written += len(keys)
+        return len(keys)
+
+    async def purge_expired(self) -> int:
+        async with self._sessionmaker() as session:
+            res = await session.execute(delete(FsmRecord).where(FsmRecord.expires_at <= func.now()))
+            await session.commit()
+        return int(res.rowcount or 0)
+
+    def _key(self, key: StorageKey) -> str:
+        return self._key_builder.build(key)
+
+    async def _load(self, k: str) -> _Record:
+        now = time.monotonic()
+        record = self._cache.get(k)
+        if record is not None:
+            self._cache.move_to_end(k)
+            self._hits += 1
+            if not record.dirty and record.expires <= now:
+                record.state, record.data = None, {}
+            return record
+
+        self._misses += 1
+        async with self._sessionmaker() as session:
+            row = (
+                await session.execute(
+                    select(
+                        FsmRecord.state,
+                        FsmRecord.data,
+                        func.extract("epoch", FsmRecord.expires_at - func.now()),
+                    ).where(FsmRecord.key == k, FsmRecord.expires_at > func.now())
+                )
+            ).one_or_none()
+
+        # A concurrent load or write may have filled the slot while we were reading.
+        record = self._cache.get(k)
+        if record is not None:
+            return record
+        if row is None:
+            record = _Record(expires=now + self._ttl)
+        else:
+            state, data, remaining = row
+            record = _Record(state=state, data=dict(data or {}), expires=now + float(remaining))
+        self._cache[k] = record
+        self._evict()
+        return record
+
+    async def _read(self, k: str) -> tuple[Optional[str], dict[str, Any]]:
+        async with self._sessionmaker() as session:
+            row = (
+                await session.execute(
+                    select(FsmRecord.state, FsmRecord.data).where(FsmRecord.key == k, FsmRecord.expires_at > func.now())
+                )
+            ).one_or_none()
+        return (None, {}) if row is None else (row[0], dict(row[1] or {}))
+
+    async def _write_through(self, k: str, column: str, value: Any, *, merge: bool = False) -> dict[str, Any]:
+        """
+        Upsert one column of the row and commit; returns the row's data afterwards.
+
+        The other column keeps its value unless the row had expired. With merge, data is
+        updated like dict.update by the statement itself (jsonb ||).
+        """
+
+        stmt = insert(FsmRecord).values(
+            **{"key": k, "state": None, "data": {}, column: value},
+            expires_at=func.now() + timedelta(seconds=self._ttl),
+        )
+        live = FsmRecord.expires_at > func.now()
+        state = case((live, FsmRecord.state), else_=null())
+        data = case((live, FsmRecord.data), else_=literal({}, JSONB))
+        if column == "state":
+            state = stmt.excluded.state
+        elif merge:
+            data = data.op("||")(stmt.excluded.data)
+        else:
+            data = stmt.excluded.data
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FsmRecord.key],
+            set_={"state": state, "data": data, "expires_at": stmt.excluded.expires_at},
+        ).returning(FsmRecord.state, FsmRecord.data)
+
+        async with self._sessionmaker() as session:
+            new_state, new_data = (await session.execute(stmt)).one()
+            if new_state is None and not new_data:
+                # The row is locked by the upsert above, so nothing can refill it in between.
+                await session.execute(delete(FsmRecord).where(FsmRecord.key == k))
+            await session.commit()
+        self._rows_written += 1
+        # Nothing to flush; wakes the loop for the periodic purge.
+        self._ensure_runner()
+        self._wakeup.set()
+        return dict(new_data or {})
+
+    def _ensure_runner(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run())
+
+    def _touch(self, k: str, record: _Record) -> None:
+        record.expires = time.monotonic() + self._ttl
+        record.dirty = True
+        self._dirty.add(k)
+        self._ensure_runner()
+        self._wakeup.set()
+
+    def _evict(self) -> None:
+        over = len(self._cache) - self._max_cached
+        if over <= 0:
+            return
+        for k in list(self._cache):
+            if over <= 0:
+                break
+            if not self._cache[k].dirty:
+                del self._cache[k]
+                over -= 1
+
+    async def _run(self) -> None:
+        next_purge = time.monotonic() + self._purge_interval
+        while True:
+            await self._wakeup.wait()
+            # Let the rest of a burst of taps land in the same flush.
+            await asyncio.sleep(self._flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("FSM flush failed; retrying")
+                self._wakeup.set()
+            # Piggybacks on writes: expired rows are invisible to reads anyway.
+            if time.monotonic() >= next_purge:
+                next_purge = time.monotonic() + self._purge_interval
+                try:
+                    purged = await self.purge_expired()
+                    if purged:
+                        logger.info("Purged %s expired FSM record(s)", purged)
+                except Exception:
+                    logger.exception("FSM purge failed")
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Sequence
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
@@ -7,6 +11,7 @@ from expense_splitting_bot.bot.callbacks import (
     CloseCb,
     ConfirmCb,
     DigitCb,
+    HistoryCb,
     NumActionCb,
     PageCb,
     PickMemberCb,
@@ -15,10 +20,22 @@ from expense_splitting_bot.bot.callbacks import (
     SplitParticipantsActionCb,
     ToggleParticipantCb,
 )
-from expense_splitting_bot.db.models import Member
-from expense_splitting_bot.bot.text import member_label
+from expense_splitting_bot.bot.member_directory import MemberEntry
+from expense_splitting_bot.services.transactions import TransactionCursor
+
+# Building the markup (pydantic InlineKeyboardButton models, InlineKeyboardBuilder) costs
+# hundreds of microseconds per keyboard; packing the callback payloads is a small part of it.
+# So the builders below are memoized (see benchmarks/keyboards.py). Paged keyboards are keyed
+# by the immutable entries of the visible page (which change whenever the member directory
+# version does), never by chat-local counters.
+# Returned markups are shared between callers and must not be mutated.
+_STATIC_CACHE_SIZE = 4096
+_PAGE_CACHE_SIZE = 4096
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 
+@lru_cache(maxsize=_STATIC_CACHE_SIZE)
 def close_keyboard(*, initiator_user_id: int, text: str = "Yopish") -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     kb.row(
@@ -28,6 +45,39 @@ def close_keyboard(*, initiator_user_id: int, text: str = "Yopish") -> InlineKey
     return kb.as_markup()
 
 
+def history_cursor_us(cursor: TransactionCursor) -> int:
+    return (cursor.created_at - _EPOCH) // timedelta(microseconds=1)
+
+
+def history_cursor(created_us: int, tx_id: int) -> TransactionCursor:
+    return TransactionCursor(created_at=_EPOCH + timedelta(microseconds=created_us), id=tx_id)
+
+
+def history_keyboard(
+    *,
+    initiator_user_id: int,
+    newer: Optional[TransactionCursor],
+    older: Optional[TransactionCursor],
+) -> InlineKeyboardMarkup:
+    # Not memoized: every page has its own cursors.
+    kb = InlineKeyboardBuilder()
+    nav: list[InlineKeyboardButton] = []
+    for text, direction, cursor in (("⬅️ Yangiroq", "newer", newer), ("Eskiroq ➡️", "older", older)):
+        if cursor is not None:
+            cb = HistoryCb(
+                initiator=initiator_user_id,
+                direction=direction,
+                created_us=history_cursor_us(cursor),
+                tx_id=cursor.id,
+            )
+            nav.append(InlineKeyboardButton(text=text, callback_data=cb.pack()))
+    if nav:
+        kb.row(*nav)
+    kb.row(InlineKeyboardButton(text="Yopish", callback_data=CloseCb(initiator=initiator_user_id).pack()))
+    return kb.as_markup()
+
+
+@lru_cache(maxsize=_STATIC_CACHE_SIZE)
 def numeric_keyboard(*, initiator_user_id: int, field: str) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     digits = [
@@ -65,17 +115,35 @@ def members_keyboard(
     initiator_user_id: int,
     flow: str,
     field: str,
-    members: list[Member],
+    members: Sequence[MemberEntry],
     page: int,
     per_page: int = 8,
 ) -> InlineKeyboardMarkup:
-    kb = InlineKeyboardBuilder()
     start = page * per_page
-    chunk = members[start : start + per_page]
+    return _members_markup(
+        initiator_user_id,
+        flow,
+        field,
+        tuple(members[start : start + per_page]),
+        page,
+        start + per_page < len(members),
+    )
+
+
+@lru_cache(maxsize=_PAGE_CACHE_SIZE)
+def _members_markup(
+    initiator_user_id: int,
+    flow: str,
+    field: str,
+    chunk: tuple[MemberEntry, ...],
+    page: int,
+    has_next: bool,
+) -> InlineKeyboardMarkup:
+    kb = InlineKeyboardBuilder()
     for m in chunk:
         kb.row(
             InlineKeyboardButton(
-                text=member_label(m),
+                text=m.label,
                 callback_data=PickMemberCb(initiator=initiator_user_id, field=field, member_id=m.id).pack(),
             )
         )
@@ -88,7 +156,7 @@ def members_keyboard(
                 callback_data=PageCb(initiator=initiator_user_id, flow=flow, page=page - 1).pack(),
             )
         )
-    if start + per_page < len(members):
+    if has_next:
         nav.append(
             InlineKeyboardButton(
                 text="➡️",
@@ -107,18 +175,27 @@ def members_keyboard(
 def setup_keyboard(
     *,
     initiator_user_id: int,
-    members: list[Member],
+    members: Sequence[MemberEntry],
     page: int,
     per_page: int = 8,
 ) -> InlineKeyboardMarkup:
-    kb = InlineKeyboardBuilder()
     start = page * per_page
-    chunk = members[start : start + per_page]
+    return _setup_markup(initiator_user_id, tuple(members[start : start + per_page]), page, start + per_page < len(members))
+
+
+@lru_cache(maxsize=_PAGE_CACHE_SIZE)
+def _setup_markup(
+    initiator_user_id: int,
+    chunk: tuple[MemberEntry, ...],
+    page: int,
+    has_next: bool,
+) -> InlineKeyboardMarkup:
+    kb = InlineKeyboardBuilder()
     for m in chunk:
         prefix = "🏠" if m.is_resident else "➖"
         kb.row(
             InlineKeyboardButton(
-                text=f"{prefix} {member_label(m)}",
+                text=f"{prefix} {m.label}",
                 callback_data=SetupToggleResidentCb(initiator=initiator_user_id, member_id=m.id, page=page).pack(),
             )
         )
@@ -126,7 +203,7 @@ def setup_keyboard(
     nav: list[InlineKeyboardButton] = []
     if page > 0:
         nav.append(InlineKeyboardButton(text="⬅️", callback_data=PageCb(initiator=initiator_user_id, flow="setup", page=page - 1).pack()))
-    if start + per_page < len(members):
+    if has_next:
         nav.append(InlineKeyboardButton(text="➡️", callback_data=PageCb(initiator=initiator_user_id, flow="setup", page=page + 1).pack()))
     if nav:
         kb.row(*nav, width=len(nav))
@@ -142,19 +219,37 @@ def setup_keyboard(
 def split_participants_keyboard(
     *,
     initiator_user_id: int,
-    members: list[Member],
+    members: Sequence[MemberEntry],
     selected_ids: set[int],
     page: int,
     per_page: int = 8,
 ) -> InlineKeyboardMarkup:
-    kb = InlineKeyboardBuilder()
     start = page * per_page
-    chunk = members[start : start + per_page]
+    chunk = tuple(members[start : start + per_page])
+    return _split_participants_markup(
+        initiator_user_id,
+        chunk,
+        # Only the visible checkmarks matter for this page.
+        frozenset(m.id for m in chunk if m.id in selected_ids),
+        page,
+        start + per_page < len(members),
+    )
+
+
+@lru_cache(maxsize=_PAGE_CACHE_SIZE)
+def _split_participants_markup(
+    initiator_user_id: int,
+    chunk: tuple[MemberEntry, ...],
+    selected_ids: frozenset[int],
+    page: int,
+    has_next: bool,
+) -> InlineKeyboardMarkup:
+    kb = InlineKeyboardBuilder()
     for m in chunk:
         checked = "✅" if m.id in selected_ids else "☑️"
         kb.row(
             InlineKeyboardButton(
-                text=f"{checked} {member_label(m)}",
+                text=f"{checked} {m.label}",
                 callback_data=ToggleParticipantCb(initiator=initiator_user_id, member_id=m.id).pack(),
             )
         )
@@ -162,7 +257,7 @@ def split_participants_keyboard(
     nav: list[InlineKeyboardButton] = []
     if page > 0:
         nav.append(InlineKeyboardButton(text="⬅️", callback_data=PageCb(initiator=initiator_user_id, flow="split_participants", page=page - 1).pack()))
-    if start + per_page < len(members):
+    if has_next:
         nav.append(InlineKeyboardButton(text="➡️", callback_data=PageCb(initiator=initiator_user_id, flow="split_participants", page=page + 1).pack()))
     if nav:
         kb.row(*nav, width=len(nav))
@@ -180,6 +275,7 @@ def split_participants_keyboard(
     return kb.as_markup()
 
 
+@lru_cache(maxsize=_STATIC_CACHE_SIZE)
 def confirm_keyboard(*, initiator_user_id: int, flow: str) -> InlineKeyboardMarkup:
     kb = InlineKeyboardBuilder()
     kb.row(
@@ -189,3 +285,17 @@ def confirm_keyboard(*, initiator_user_id: int, flow: str) -> InlineKeyboardMark
     )
     return kb.as_markup()
 
+
+def cache_info() -> dict[str, object]:
+    """functools cache statistics per memoized builder (logged at shutdown)."""
+    return {
+        f.__name__: f.cache_info()
+        for f in (
+            close_keyboard,
+            numeric_keyboard,
+            confirm_keyboard,
+            _members_markup,
+            _setup_markup,
+            _split_participants_markup,
+        )
+    }
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from expense_splitting_bot.bot.text import member_label
+from expense_splitting_bot.db.models import Chat
+from expense_splitting_bot.services.ledger import BUMPED_LEDGER_CHATS, LedgerSummary, compute_ledger_summary
+
+
+@dataclass(frozen=True)
+class LedgerView:
+    version: int
+    summary: LedgerSummary
+    labels: dict[int, str]  # member_id -> member_label
+
+    def label(self, member_id: int) -> str:
+        return self.labels.get(member_id, str(member_id))
+
+
+@dataclass(frozen=True)
+class LedgerCacheStats:
+    size: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class LedgerCache:
+    """
+    In-process LRU of computed ledger views, valid for one (chat_id, ledger_version).
+
+    Every write that changes the views bumps chats.ledger_version in the same DB
+    transaction, so a lookup costs one primary-key read of that counter.
+    """
+
+    def __init__(self, *, max_entries: int = 1024) -> None:
+        self._max_entries = max(1, int(max_entries))
+        # chat_id -> view; a view only answers for its own version.
+        self._entries: OrderedDict[int, LedgerView] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    async def get_view(self, session: AsyncSession, *, chat_id: int, version: Optional[int] = None) -> LedgerView:
+        if version is None:
+            version = int(await session.scalar(select(Chat.ledger_version).where(Chat.id == chat_id)) or 0)
+
+        view = self._entries.get(chat_id)
+        if view is not None and view.version == version:
+            self._entries.move_to_end(chat_id)
+            self._hits += 1
+            return view
+
+        self._misses += 1
+        summary = await compute_ledger_summary(session, chat_id=chat_id)
+        view = LedgerView(
+            version=version,
+            summary=summary,
+            labels={m.id: member_label(m) for m in summary.members},
+        )
+        if chat_id in session.info.get(BUMPED_LEDGER_CHATS, ()):
+            # This session's bump could still roll back and the version be reused by another write.
+            return view
+        self._entries[chat_id] = view
+        self._entries.move_to_end(chat_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+        return view
+
+    def stats(self) -> LedgerCacheStats:
+        return LedgerCacheStats(
+            size=len(self._entries),
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+        )
@@ -2,30 +2,99 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import multiprocessing
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiogram.exceptions import TelegramUnauthorizedError
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 
+from expense_splitting_bot.bot.admin_roster import AdminRosterCache
 from expense_splitting_bot.bot.dashboard import DashboardManager
+from expense_splitting_bot.bot.dashboard_sync import PgDashboardCoordinator
+from expense_splitting_bot.bot.deletion_scheduler import DeletionScheduler
+from expense_splitting_bot.bot.fsm_storage import PgFsmStorage
+from expense_splitting_bot.bot.keyboards import cache_info as keyboard_cache_info
+from expense_splitting_bot.bot.ledger_cache import LedgerCache
+from expense_splitting_bot.bot.member_directory import MemberDirectoryCache
+from expense_splitting_bot.bot.upsert_cache import UpsertFingerprintCache
 from expense_splitting_bot.bot.middlewares import DbSessionMiddleware, UpsertChatMemberMiddleware
+from expense_splitting_bot.bot.outbound import OutboundScheduler
 from expense_splitting_bot.bot.routers import all_routers
 from expense_splitting_bot.config import settings
-from expense_splitting_bot.db.session import SessionMaker
+from expense_splitting_bot.db.jobs import JobQueue
+from expense_splitting_bot.db.session import SessionMaker, engine
 from expense_splitting_bot.logging import configure_logging
+from expense_splitting_bot.services.checkpoints import LedgerCompactor
 
 logger = logging.getLogger(__name__)
 
 
-async def main() -> None:
-    configure_logging(settings.log_level)
+def _bot_mode() -> str:
+    mode = settings.bot_mode.strip().lower()
+    if mode not in ("polling", "webhook"):
+        raise RuntimeError("BOT_MODE must be 'polling' or 'webhook'.")
+    return mode
+
+
+def _dashboard_coordination() -> str:
+    coordination = settings.dashboard_coordination.strip().lower()
+    if coordination not in ("local", "postgres"):
+        raise RuntimeError("DASHBOARD_COORDINATION must be 'local' or 'postgres'.")
+    return coordination
+
+
+def _fsm_storage() -> str:
+    storage = settings.fsm_storage.strip().lower()
+    if storage not in ("memory", "postgres"):
+        raise RuntimeError("FSM_STORAGE must be 'memory' or 'postgres'.")
+    return storage
 
-    bot = Bot(
+
+def _webhook_url() -> str:
+    if not settings.webhook_url:
+        raise RuntimeError("WEBHOOK_URL is required when BOT_MODE=webhook.")
+    return settings.webhook_url.rstrip("/") + settings.webhook_path
+
+
+def create_bot() -> Bot:
+    session = None
+    if settings.telegram_api_base_url:
+        # Local telegram-bot-api server or a test stub.
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.telegram_api_base_url))
+    return Bot(
         token=settings.bot_token,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
+
+
+async def run_bot(*, worker_index: int = 0) -> None:
+    """
+    Run one bot process: polling, or one webhook worker.
+
+    Worker 0 also registers the webhook and runs the ledger compactor, so N webhook
+    workers do not repeat process-wide jobs.
+    """
+
+    mode = _bot_mode()
+    coordination = _dashboard_coordination()
+    fsm_storage = _fsm_storage()
+
+    bot = create_bot()
+    # Every Bot API call (routers, utils, dashboard) goes through one rate-limited queue.
+    outbound = OutboundScheduler(
+        global_per_second=settings.outbound_global_per_second,
+        group_per_minute=settings.outbound_group_per_minute,
+        # Webhook workers split the bot's limits between them.
+        processes=settings.webhook_workers if mode == "webhook" else 1,
+    )
+    bot.session.middleware(outbound)
     try:
         try:
             me = await bot.get_me()
@@ -37,28 +106,200 @@ async def main() -> None:
         if not bot_username:
             raise RuntimeError("Bot username is empty; cannot parse @BotName quick-add messages.")
 
-        dp = Dispatcher(storage=MemoryStorage())
+        if fsm_storage == "postgres":
+            storage = PgFsmStorage(
+                sessionmaker=SessionMaker,
+                ttl_seconds=settings.fsm_ttl_seconds,
+                flush_interval_seconds=settings.fsm_flush_interval_seconds,
+                max_cached=settings.fsm_cache_size,
+                # Several processes read and write the table directly.
+                shared=coordination == "postgres",
+            )
+        else:
+            storage = MemoryStorage()
+        # The dispatcher closes the storage on shutdown (PgFsmStorage flushes there).
+        dp = Dispatcher(storage=storage)
 
         dp.update.middleware(DbSessionMiddleware(SessionMaker))
-        dp.message.middleware(UpsertChatMemberMiddleware())
-        dp.callback_query.middleware(UpsertChatMemberMiddleware())
+        upsert_cache = (
+            UpsertFingerprintCache(max_entries=settings.upsert_cache_size, ttl_seconds=settings.upsert_cache_ttl_seconds)
+            if settings.upsert_cache_size > 0
+            else None
+        )
+        upsert_mw = UpsertChatMemberMiddleware(upsert_cache)
+        dp.message.middleware(upsert_mw)
+        dp.callback_query.middleware(upsert_mw)
 
+        ledger_cache = LedgerCache(max_entries=settings.ledger_cache_size)
+        member_directory = MemberDirectoryCache(max_entries=settings.member_directory_cache_size)
+        admin_roster = AdminRosterCache(ttl_seconds=settings.admin_cache_ttl_seconds)
+        job_queue = (
+            JobQueue(
+                sessionmaker=SessionMaker,
+                workers=settings.job_queue_workers,
+                poll_interval_seconds=settings.job_queue_poll_interval_seconds,
+                max_attempts=settings.job_queue_max_attempts,
+            )
+            if settings.job_queue_workers > 0
+            else None
+        )
+        coordinator = (
+            PgDashboardCoordinator(engine=engine, channel=settings.dashboard_notify_channel)
+            if coordination == "postgres"
+            else None
+        )
         dashboard = DashboardManager(
             bot=bot,
             sessionmaker=SessionMaker,
             debounce_seconds=settings.dashboard_debounce_seconds,
+            min_debounce_seconds=settings.dashboard_debounce_min_seconds,
+            state_ttl_seconds=settings.dashboard_state_ttl_seconds,
+            max_states=settings.dashboard_max_states,
+            max_workers=settings.dashboard_max_workers,
+            ledger_cache=ledger_cache,
+            coordinator=coordinator,
+            job_queue=job_queue,
         )
 
-        dp.workflow_data.update({"dashboard": dashboard})
+        deletions = DeletionScheduler(bot=bot, sessionmaker=SessionMaker)
+
+        dp.workflow_data.update(
+            {
+                "dashboard": dashboard,
+                "deletions": deletions,
+                "ledger_cache": ledger_cache,
+                "member_directory": member_directory,
+                "admin_roster": admin_roster,
+                "outbound": outbound,
+            }
+        )
 
         for r in all_routers():
             dp.include_router(r)
 
-        logger.info("Starting bot as @%s", bot_username)
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        # Every process runs checkpoint jobs; only worker 0 scans for due chats.
+        compactor = LedgerCompactor(
+            sessionmaker=SessionMaker,
+            min_delta=settings.ledger_checkpoint_min_delta,
+            interval_seconds=settings.ledger_checkpoint_interval_seconds,
+            job_queue=job_queue,
+        )
+        if worker_index == 0:
+            compactor.start()
+
+        logger.info(
+            "Starting bot as @%s (mode: %s, worker: %s, dashboard coordination: %s)",
+            bot_username,
+            mode,
+            worker_index,
+            coordination,
+        )
+        try:
+            await dashboard.start()
+            await deletions.start()
+            if job_queue is not None:
+                await job_queue.start()
+            if mode == "webhook":
+                await _serve_webhook(bot, dp, worker_index=worker_index)
+            else:
+                # getUpdates is refused while a webhook is set.
+                await bot.delete_webhook()
+                await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        finally:
+            await dashboard.stop()
+            await deletions.close()
+            await compactor.stop()
+            if job_queue is not None:
+                await job_queue.close()
+            logger.info("Dashboard stats: %s", dashboard.stats())
+            logger.info("Deletion scheduler stats: %s", deletions.stats())
+            logger.info("Member directory stats: %s", member_directory.stats())
+            logger.info("Admin roster stats: %s", admin_roster.stats())
+            logger.info("Keyboard cache stats: %s", keyboard_cache_info())
+            if job_queue is not None:
+                logger.info("Job queue stats: %s", job_queue.stats())
+            if upsert_cache is not None:
+                logger.info("Upsert cache stats: %s", upsert_cache.stats())
+            if isinstance(storage, PgFsmStorage):
+                logger.info("FSM storage stats: %s", storage.stats())
     finally:
+        logger.info("Outbound stats: %s", outbound.stats())
+        await outbound.close()
         await bot.session.close()
 
 
+async def _serve_webhook(bot: Bot, dp: Dispatcher, *, worker_index: int) -> None:
+    secret = settings.webhook_secret or None
+    if worker_index == 0:
+        await bot.set_webhook(
+            url=_webhook_url(),
+            secret_token=secret,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret).register(app, path=settings.webhook_path)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    # Workers share the listen socket; the kernel spreads connections over them.
+    site = web.TCPSite(
+        runner,
+        host=settings.webhook_host,
+        port=settings.webhook_port,
+        reuse_port=settings.webhook_workers > 1,
+    )
+    await site.start()
+    logger.info("Webhook worker %s listening on %s:%s%s", worker_index, settings.webhook_host, settings.webhook_port, settings.webhook_path)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def _worker_main(worker_index: int) -> None:
+    configure_logging(settings.log_level)
+    try:
+        asyncio.run(run_bot(worker_index=worker_index))
+    except KeyboardInterrupt:
+        pass
+
+
+def _run_webhook_workers(count: int) -> None:
+    if _dashboard_coordination() != "postgres":
+        raise RuntimeError("WEBHOOK_WORKERS > 1 needs DASHBOARD_COORDINATION=postgres.")
+    if _fsm_storage() != "postgres":
+        raise RuntimeError("WEBHOOK_WORKERS > 1 needs FSM_STORAGE=postgres.")
+    _webhook_url()
+
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_worker_main, args=(i,), name=f"webhook-worker-{i}") for i in range(count)]
+    for p in workers:
+        p.start()
+    try:
+        for p in workers:
+            p.join()
+            if p.exitcode:
+                logger.error("%s exited with code %s", p.name, p.exitcode)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in workers:
+            if p.is_alive():
+                p.terminate()
+        for p in workers:
+            p.join()
+
+
+async def main() -> None:
+    configure_logging(settings.log_level)
+    await run_bot()
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    configure_logging(settings.log_level)
+    if _bot_mode() == "webhook" and settings.webhook_workers > 1:
+        _run_webhook_workers(settings.webhook_workers)
+    else:
+        asyncio.run(main())
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from expense_splitting_bot.bot.text import member_label
+from expense_splitting_bot.db.models import Chat, Member
+from expense_splitting_bot.services.ledger import BUMPED_LEDGER_CHATS
+
+
+@dataclass(frozen=True, slots=True)
+class MemberEntry:
+    id: int
+    tg_user_id: int
+    label: str
+    is_resident: bool
+
+
+@dataclass(frozen=True, slots=True)
+class MemberDirectory:
+    version: int
+    members: tuple[MemberEntry, ...]  # ordered by tg_user_id, like list_members
+    by_id: Mapping[int, MemberEntry]
+
+    @property
+    def residents(self) -> tuple[MemberEntry, ...]:
+        return tuple(m for m in self.members if m.is_resident)
+
+    def get(self, member_id: int) -> Optional[MemberEntry]:
+        return self.by_id.get(member_id)
+
+    def label(self, member_id: int) -> str:
+        m = self.by_id.get(member_id)
+        return m.label if m else str(member_id)
+
+
+@dataclass(frozen=True)
+class MemberDirectoryStats:
+    size: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class MemberDirectoryCache:
+    """
+    In-process LRU of per-chat member snapshots for wizard keyboards.
+
+    Like LedgerCache, a snapshot answers for one (chat_id, ledger_version):
+    upsert_member (new member or label change) and toggle_resident bump the version.
+    """
+
+    def __init__(self, *, max_entries: int = 1024) -> None:
+        self._max_entries = max(1, int(max_entries))
+        self._entries: OrderedDict[int, MemberDirectory] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    async def get(self, session: AsyncSession, *, chat_id: int, version: Optional[int] = None) -> MemberDirectory:
+        if version is None:
+            version = int(await session.scalar(select(Chat.ledger_version).where(Chat.id == chat_id)) or 0)
+
+        directory = self._entries.get(chat_id)
+        if directory is not None and directory.version == version:
+            self._entries.move_to_end(chat_id)
+            self._hits += 1
+            return directory
+
+        self._misses += 1
+        rows = await session.execute(
+            select(Member.id, Member.tg_user_id, Member.username, Member.first_name, Member.is_resident)
+            .where(Member.chat_id == chat_id)
+            .order_by(Member.tg_user_id.asc())
+        )
+        members = tuple(
+            MemberEntry(id=r.id, tg_user_id=r.tg_user_id, label=member_label(r), is_resident=bool(r.is_resident))
+            for r in rows
+        )
+        directory = MemberDirectory(
+            version=version,
+            members=members,
+            by_id=MappingProxyType({m.id: m for m in members}),
+        )
+        if chat_id in session.info.get(BUMPED_LEDGER_CHATS, ()):
+            # This session's bump could still roll back and the version be reused by another write.
+            return directory
+        self._entries[chat_id] = directory
+        self._entries.move_to_end(chat_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+        return directory
+
+    def stats(self) -> MemberDirectoryStats:
+        return MemberDirectoryStats(
+            size=len(self._entries),
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+        )
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
-from typing import Any, Awaitable, Callable
+from typing import Any, Awaitable, Callable, Optional
 
 from aiogram import BaseMiddleware
 from aiogram.types import CallbackQuery, Message, TelegramObject
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from expense_splitting_bot.services.members import ensure_chat, upsert_member
+from expense_splitting_bot.bot.upsert_cache import UpsertFingerprintCache
+from expense_splitting_bot.db.jobs import AFTER_COMMIT
+from expense_splitting_bot.services.members import upsert_chat_member
+
+
+async def commit_session(session: AsyncSession) -> None:
+    """Commit and run the AFTER_COMMIT callbacks registered so far."""
+    await session.commit()
+    for callback in session.info.pop(AFTER_COMMIT, ()):
+        callback()
 
 
 class DbSessionMiddleware(BaseMiddleware):
@@ -24,7 +33,7 @@ class DbSessionMiddleware(BaseMiddleware):
             try:
                 data["session"] = session
                 result = await handler(event, data)
-                await session.commit()
+                await commit_session(session)
                 return result
             except Exception:
                 await session.rollback()
@@ -32,6 +41,10 @@ class DbSessionMiddleware(BaseMiddleware):
 
 
 class UpsertChatMemberMiddleware(BaseMiddleware):
+    def __init__(self, cache: Optional[UpsertFingerprintCache] = None) -> None:
+        super().__init__()
+        self._cache = cache
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
@@ -59,8 +72,25 @@ class UpsertChatMemberMiddleware(BaseMiddleware):
         if tg_user.is_bot:
             return await handler(event, data)
 
-        chat_db = await ensure_chat(session, tg_chat=tg_chat)
-        member_db = await upsert_member(session, chat=chat_db, user=tg_user)
+        if self._cache is not None:
+            cached = await self._cache.lookup(
+                session,
+                tg_chat_id=tg_chat.id,
+                tg_user_id=tg_user.id,
+                title=tg_chat.title,
+                username=tg_user.username.lower() if tg_user.username else None,
+                first_name=tg_user.first_name or None,
+            )
+            if cached is not None:
+                data["chat_db"], data["member_db"] = cached
+                return await handler(event, data)
+
+        chat_db, member_db = await upsert_chat_member(session, tg_chat=tg_chat, user=tg_user)
+        if self._cache is not None:
+            cache = self._cache
+            session.info.setdefault(AFTER_COMMIT, []).append(
+                lambda: cache.remember(tg_chat_id=tg_chat.id, tg_user_id=tg_user.id, chat=chat_db, member=member_db)
+            )
         data["chat_db"] = chat_db
         data["member_db"] = member_db
         return await handler(event, data)
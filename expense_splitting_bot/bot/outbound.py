@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Iterator, Optional
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    # Lower value is sent first.
+    INTERACTIVE = 0  # replies, wizard edits, callback answers
+    DASHBOARD = 1
+    CLEANUP = 2  # deletions of commands, wizards and temporary messages
+
+
+# Besides send*: methods that post a new message and so count against the chat's limit.
+_NEW_MESSAGE_METHODS = frozenset({"forwardMessage", "forwardMessages", "copyMessage", "copyMessages"})
+
+_priority: ContextVar[Priority] = ContextVar("outbound_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def outbound_priority(priority: Priority) -> Iterator[None]:
+    """Send every Bot API call made inside the block with the given priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, *, rate_per_second: float, capacity: float) -> None:
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        # Seconds until one token is available (0 when it is available now).
+        self._refill(now)
+        pause = max(0.0, self.paused_until - now)
+        if self.tokens >= 1.0:
+            return pause
+        return max(pause, (1.0 - self.tokens) / self.rate)
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1.0
+
+    def pause_time(self, now: float) -> float:
+        return max(0.0, self.paused_until - now)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and self.paused_until <= now
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    chat_id: Optional[int] = field(compare=False)
+    new_message: bool = field(compare=False)
+    enqueued: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+@dataclass
+class _WaitStats:
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+@dataclass(frozen=True)
+class OutboundStats:
+    queue_depth: int
+    depth_by_priority: dict[str, int]
+    sent: int
+    retry_after_hits: int
+    avg_wait_seconds: dict[str, float]
+    max_wait_seconds: dict[str, float]
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Bot session middleware that routes every Bot API call through one priority queue.
+
+    A global token bucket caps total requests per second and a bucket per chat caps
+    new messages per chat (groups: per minute, private chats: per second); edits,
+    deletions and other calls only count against the global bucket. Waiters are
+    released in priority order, and TelegramRetryAfter pauses the affected chat (or
+    the global bucket) and re-queues the call.
+
+    Telegram's limits are per bot, not per process: with N processes serving one bot,
+    pass processes=N and each takes an equal 1/N share of every rate. A chat whose
+    updates all land on one process is then held to that share; coordinating the
+    buckets through the database would cost a round trip per call.
+    """
+
+    def __init__(
+        self,
+        *,
+        global_per_second: float = 30.0,
+        group_per_minute: float = 20.0,
+        private_per_second: float = 1.0,
+        max_retries: int = 3,
+        processes: int = 1,
+    ) -> None:
+        share = 1.0 / max(1, int(processes))
+        global_per_second *= share
+        group_per_minute *= share
+        private_per_second *= share
+        self._global = TokenBucket(rate_per_second=global_per_second, capacity=max(1.0, global_per_second))
+        self._group_rate = group_per_minute / 60.0
+        self._group_capacity = max(1.0, group_per_minute)
+        self._private_rate = private_per_second
+        self._max_retries = max_retries
+        self._chats: dict[int, TokenBucket] = {}
+        self._queue: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._pump_task: Optional[asyncio.Task] = None
+        self._sent = 0
+        self._retry_after_hits = 0
+        self._waits: dict[Priority, _WaitStats] = {p: _WaitStats() for p in Priority}
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        chat_key = chat_id if isinstance(chat_id, int) else None
+        new_message = method.__api_method__ in _NEW_MESSAGE_METHODS or method.__api_method__.startswith("send")
+        priority = _priority.get()
+
+        attempt = 0
+        while True:
+            await self._acquire(chat_key, priority, new_message=new_message)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self._retry_after_hits += 1
+                self._pause(chat_key, float(e.retry_after))
+                attempt += 1
+                if attempt > self._max_retries:
+                    raise
+                logger.warning("Flood control on %s (chat=%s): retry in %ss", type(method).__name__, chat_key, e.retry_after)
+
+    def stats(self) -> OutboundStats:
+        depth = {p.name.lower(): 0 for p in Priority}
+        for w in self._queue:
+            depth[Priority(w.priority).name.lower()] += 1
+        return OutboundStats(
+            queue_depth=len(self._queue),
+            depth_by_priority=depth,
+            sent=self._sent,
+            retry_after_hits=self._retry_after_hits,
+            avg_wait_seconds={
+                p.name.lower(): (s.total_seconds / s.count if s.count else 0.0) for p, s in self._waits.items()
+            },
+            max_wait_seconds={p.name.lower(): s.max_seconds for p, s in self._waits.items()},
+        )
+
+    async def close(self) -> None:
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            try:
+                await self._pump_task
+            except asyncio.CancelledError:
+                pass
+            self._pump_task = None
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = TokenBucket(rate_per_second=self._group_rate, capacity=self._group_capacity)
+            else:
+                bucket = TokenBucket(rate_per_second=self._private_rate, capacity=max(1.0, self._private_rate))
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _pause(self, chat_id: Optional[int], seconds: float) -> None:
+        until = time.monotonic() + seconds
+        bucket = self._chat_bucket(chat_id) if chat_id is not None else self._global
+        bucket.paused_until = max(bucket.paused_until, until)
+        self._wakeup.set()
+
+    async def _acquire(self, chat_id: Optional[int], priority: Priority, *, new_message: bool) -> None:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(
+            priority=int(priority),
+            seq=next(self._seq),
+            chat_id=chat_id,
+            new_message=new_message,
+            enqueued=time.monotonic(),
+            future=loop.create_future(),
+        )
+        heapq.heappush(self._queue, waiter)
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        self._wakeup.set()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+            raise
+
+    def _release_ready(self) -> float:
+        """Release every waiter that may go now; return seconds until the next one could."""
+        now = time.monotonic()
+        next_wait = float("inf")
+        blocked: list[_Waiter] = []
+        while self._queue:
+            global_wait = self._global.wait_time(now)
+            if global_wait > 0:
+                next_wait = min(next_wait, global_wait)
+                break
+            waiter = heapq.heappop(self._queue)
+            if waiter.future.done():
+                continue
+            if waiter.chat_id is not None:
+                bucket = self._chat_bucket(waiter.chat_id)
+                # Only new messages spend the chat's tokens; a flood pause holds every call.
+                chat_wait = bucket.wait_time(now) if waiter.new_message else bucket.pause_time(now)
+                if chat_wait > 0:
+                    # Lower-priority work for other chats may still go.
+                    next_wait = min(next_wait, chat_wait)
+                    blocked.append(waiter)
+                    continue
+                if waiter.new_message:
+                    bucket.take(now)
+            self._global.take(now)
+            self._record_wait(waiter, now)
+            waiter.future.set_result(None)
+
+        for waiter in blocked:
+            heapq.heappush(self._queue, waiter)
+
+        for chat_id in [cid for cid, b in self._chats.items() if b.is_idle(now)]:
+            del self._chats[chat_id]
+        return next_wait
+
+    def _record_wait(self, waiter: _Waiter, now: float) -> None:
+        waited = now - waiter.enqueued
+        s = self._waits[Priority(waiter.priority)]
+        s.count += 1
+        s.total_seconds += waited
+        s.max_seconds = max(s.max_seconds, waited)
+        self._sent += 1
+
+    async def _pump(self) -> None:
+        while True:
+            self._wakeup.clear()
+            next_wait = self._release_ready()
+            timeout = None if next_wait == float("inf") else next_wait
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -3,16 +3,20 @@ from __future__ import annotations
 from aiogram import Bot, Router
 from aiogram.enums import ChatMemberStatus, ChatType, ParseMode
 from aiogram.filters import Command
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, ChatMemberUpdated, Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from expense_splitting_bot.bot.admin_roster import AdminRosterCache
+from expense_splitting_bot.bot.callback_dispatch import callbacks
 from expense_splitting_bot.bot.callbacks import PageCb, SetupDoneCb, SetupToggleResidentCb
 from expense_splitting_bot.bot.dashboard import DashboardManager
+from expense_splitting_bot.bot.deletion_scheduler import DeletionScheduler
 from expense_splitting_bot.bot.keyboards import setup_keyboard
-from expense_splitting_bot.bot.utils import delete_later, safe_delete_message
+from expense_splitting_bot.bot.ledger_cache import LedgerCache
+from expense_splitting_bot.bot.member_directory import MemberDirectoryCache
+from expense_splitting_bot.bot.utils import safe_delete_message
 from expense_splitting_bot.db.models import Chat, Member
-from expense_splitting_bot.services.ledger import compute_balances, compute_room_breakdown, compute_room_total_k, compute_settlement
-from expense_splitting_bot.services.members import get_member_by_tg_user_id, list_members, toggle_resident, upsert_member
+from expense_splitting_bot.services.members import get_member_by_tg_user_id, toggle_resident, upsert_member
 from expense_splitting_bot.bot.text import member_label
 from expense_splitting_bot.bot.keyboards import close_keyboard
 
@@ -23,9 +27,19 @@ def _require_group(message: Message) -> bool:
     return message.chat.type in (ChatType.GROUP, ChatType.SUPERGROUP)
 
 
-async def _is_admin(bot: Bot, *, tg_chat_id: int, tg_user_id: int) -> bool:
-    cm = await bot.get_chat_member(chat_id=tg_chat_id, user_id=tg_user_id)
-    return cm.status in (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.CREATOR)
+_ADMIN_STATUSES = (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.CREATOR)
+
+
+@router.chat_member()
+async def chat_member_updated(event: ChatMemberUpdated, admin_roster: AdminRosterCache) -> None:
+    # Promotions, demotions and admins leaving; plain joins and leaves don't touch the roster.
+    if event.old_chat_member.status in _ADMIN_STATUSES or event.new_chat_member.status in _ADMIN_STATUSES:
+        admin_roster.invalidate(event.chat.id)
+
+
+@router.my_chat_member()
+async def my_chat_member_updated(event: ChatMemberUpdated, admin_roster: AdminRosterCache) -> None:
+    admin_roster.invalidate(event.chat.id)
 
 
 @router.message(Command("setup"))
@@ -35,20 +49,23 @@ async def setup_cmd(
     session: AsyncSession,
     chat_db: Chat,
     member_db: Member,
+    member_directory: MemberDirectoryCache,
+    admin_roster: AdminRosterCache,
+    deletions: DeletionScheduler,
 ) -> None:
     if not _require_group(message):
         return
     await safe_delete_message(bot, chat_id=message.chat.id, message_id=message.message_id)
 
-    if not await _is_admin(bot, tg_chat_id=message.chat.id, tg_user_id=message.from_user.id):
+    if not await admin_roster.is_admin(bot, tg_chat_id=message.chat.id, tg_user_id=message.from_user.id):
         msg = await message.answer("Bu buyruq faqat adminlar uchun.")
-        delete_later(bot, chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=5)
+        deletions.schedule(chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=5)
         return
 
-    members = await list_members(session, chat_id=chat_db.id)
+    members = (await member_directory.get(session, chat_id=chat_db.id)).members
     if not members:
         msg = await message.answer("Hali a'zolar yo'q. Avval guruhda yozishsin, keyin /setup qiling.")
-        delete_later(bot, chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=7)
+        deletions.schedule(chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=7)
         return
 
     wizard = await message.answer(
@@ -57,47 +74,47 @@ async def setup_cmd(
         reply_markup=setup_keyboard(initiator_user_id=message.from_user.id, members=members, page=0),
     )
     # Wizard message will be deleted on Save/Cancel.
-    delete_later(bot, chat_id=wizard.chat.id, message_id=wizard.message_id, delay_seconds=600)
+    deletions.schedule(chat_id=wizard.chat.id, message_id=wizard.message_id, delay_seconds=600)
 
 
-@router.callback_query(PageCb.filter())
+@callbacks.on(PageCb, "setup")
 async def setup_page_cb(
     callback: CallbackQuery,
     callback_data: PageCb,
     session: AsyncSession,
     chat_db: Chat,
+    member_directory: MemberDirectoryCache,
 ) -> None:
-    if callback_data.flow != "setup":
-        return
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
-    members = await list_members(session, chat_id=chat_db.id)
+    members = (await member_directory.get(session, chat_id=chat_db.id)).members
     await callback.message.edit_reply_markup(
         reply_markup=setup_keyboard(initiator_user_id=callback.from_user.id, members=members, page=callback_data.page)
     )
     await callback.answer()
 
 
-@router.callback_query(SetupToggleResidentCb.filter())
+@callbacks.on(SetupToggleResidentCb)
 async def setup_toggle_cb(
     callback: CallbackQuery,
     callback_data: SetupToggleResidentCb,
     session: AsyncSession,
     chat_db: Chat,
+    member_directory: MemberDirectoryCache,
 ) -> None:
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
     await toggle_resident(session, chat_id=chat_db.id, member_id=callback_data.member_id)
-    members = await list_members(session, chat_id=chat_db.id)
+    members = (await member_directory.get(session, chat_id=chat_db.id)).members
     await callback.message.edit_reply_markup(
         reply_markup=setup_keyboard(initiator_user_id=callback.from_user.id, members=members, page=callback_data.page)
     )
     await callback.answer("Yangilandi.")
 
 
-@router.callback_query(SetupDoneCb.filter())
+@callbacks.on(SetupDoneCb)
 async def setup_done_cb(
     callback: CallbackQuery,
     callback_data: SetupDoneCb,
@@ -111,7 +128,7 @@ async def setup_done_cb(
         return
     # close wizard
     await safe_delete_message(bot, chat_id=callback.message.chat.id, message_id=callback.message.message_id)
-    dashboard.schedule(callback.message.chat.id)
+    await dashboard.schedule(callback.message.chat.id, session=session)
     await callback.answer("Saqlangan.")
 
 
@@ -122,25 +139,27 @@ async def add_member_cmd(
     session: AsyncSession,
     chat_db: Chat,
     dashboard: DashboardManager,
+    admin_roster: AdminRosterCache,
+    deletions: DeletionScheduler,
 ) -> None:
     if not _require_group(message):
         return
     await safe_delete_message(bot, chat_id=message.chat.id, message_id=message.message_id)
 
-    if not await _is_admin(bot, tg_chat_id=message.chat.id, tg_user_id=message.from_user.id):
+    if not await admin_roster.is_admin(bot, tg_chat_id=message.chat.id, tg_user_id=message.from_user.id):
         msg = await message.answer("Bu buyruq faqat adminlar uchun.")
-        delete_later(bot, chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=5)
+        deletions.schedule(chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=5)
         return
 
     if not message.reply_to_message or not message.reply_to_message.from_user:
         msg = await message.answer("Foydalanuvchining xabariga reply qilib /add_member yozing.")
-        delete_later(bot, chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=7)
+        deletions.schedule(chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=7)
         return
 
     u = message.reply_to_message.from_user
     if u.is_bot:
         msg = await message.answer("Botni qo'shib bo'lmaydi.")
-        delete_later(bot, chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=5)
+        deletions.schedule(chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=5)
         return
 
     existing = await get_member_by_tg_user_id(session, chat_id=chat_db.id, tg_user_id=u.id)
@@ -148,8 +167,8 @@ async def add_member_cmd(
         await upsert_member(session, chat=chat_db, user=u)
 
     msg = await message.answer(f"A'zo qo'shildi: {member_label(existing) if existing else (('@'+u.username) if u.username else u.first_name)}")
-    delete_later(bot, chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=5)
-    dashboard.schedule(message.chat.id)
+    deletions.schedule(chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=5)
+    await dashboard.schedule(message.chat.id, session=session)
 
 
 @router.message(Command("report"))
@@ -158,41 +177,36 @@ async def report_cmd(
     bot: Bot,
     session: AsyncSession,
     chat_db: Chat,
+    ledger_cache: LedgerCache,
+    admin_roster: AdminRosterCache,
+    deletions: DeletionScheduler,
 ) -> None:
     if not _require_group(message):
         return
     await safe_delete_message(bot, chat_id=message.chat.id, message_id=message.message_id)
 
-    if not await _is_admin(bot, tg_chat_id=message.chat.id, tg_user_id=message.from_user.id):
+    if not await admin_roster.is_admin(bot, tg_chat_id=message.chat.id, tg_user_id=message.from_user.id):
         msg = await message.answer("Bu buyruq faqat adminlar uchun.")
-        delete_later(bot, chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=5)
+        deletions.schedule(chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=5)
         return
 
-    members = await list_members(session, chat_id=chat_db.id)
-    members_by_id = {m.id: m for m in members}
-
-    room_total_k = await compute_room_total_k(session, chat_id=chat_db.id)
-    breakdown = await compute_room_breakdown(session, chat_id=chat_db.id)
-    balances = await compute_balances(session, chat_id=chat_db.id)
-    transfers = compute_settlement(balances)
+    view = await ledger_cache.get_view(session, chat_id=chat_db.id)
+    summary = view.summary
+    room_total_k = summary.room_total_k
 
     breakdown_lines = []
-    for e in breakdown[:20]:
-        m = members_by_id.get(e.member_id)
-        breakdown_lines.append(f"{member_label(m) if m else e.member_id}: {e.total_share_k}k")
+    for e in summary.room_breakdown[:20]:
+        breakdown_lines.append(f"{view.label(e.member_id)}: {e.total_share_k}k")
     if not breakdown_lines:
         breakdown_lines = ["Hali ROOM tranzaksiyalar yo'q."]
 
     bal_lines = []
-    for b in balances[:20]:
-        m = members_by_id.get(b.member_id)
-        bal_lines.append(f"{member_label(m) if m else b.member_id}: {b.balance_k}k")
+    for b in summary.balances[:20]:
+        bal_lines.append(f"{view.label(b.member_id)}: {b.balance_k}k")
 
     settle_lines = []
-    for t in transfers[:20]:
-        settle_lines.append(
-            f"{member_label(members_by_id.get(t.from_member_id))} -> {member_label(members_by_id.get(t.to_member_id))}: {t.amount_k}k"
-        )
+    for t in summary.transfers[:20]:
+        settle_lines.append(f"{view.label(t.from_member_id)} -> {view.label(t.to_member_id)}: {t.amount_k}k")
     if not settle_lines:
         settle_lines = ["Kerak emas."]
 
@@ -206,4 +220,4 @@ async def report_cmd(
     )
     msg = await message.answer(text, parse_mode=ParseMode.HTML, reply_markup=close_keyboard(initiator_user_id=message.from_user.id))
     # user can close; also auto-delete later
-    delete_later(bot, chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=180)
+    deletions.schedule(chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=180)
@@ -7,14 +7,15 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from expense_splitting_bot.bot.callback_dispatch import callbacks
 from expense_splitting_bot.bot.callbacks import ConfirmCb, DigitCb, NumActionCb, PageCb, PickMemberCb
 from expense_splitting_bot.bot.dashboard import DashboardManager
 from expense_splitting_bot.bot.keyboards import confirm_keyboard, members_keyboard, numeric_keyboard
+from expense_splitting_bot.bot.member_directory import MemberDirectoryCache
+from expense_splitting_bot.bot.middlewares import commit_session
 from expense_splitting_bot.bot.utils import safe_delete_message
 from expense_splitting_bot.db.models import Chat, TransactionType
-from expense_splitting_bot.services.members import list_members
 from expense_splitting_bot.services.transactions import create_transaction
-from expense_splitting_bot.bot.text import member_label
 
 router = Router(name=__name__)
 
@@ -24,7 +25,14 @@ def _require_group(message: Message) -> bool:
 
 
 @router.message(Command("pay"))
-async def pay_cmd(message: Message, bot: Bot, session: AsyncSession, chat_db: Chat, state: FSMContext) -> None:
+async def pay_cmd(
+    message: Message,
+    bot: Bot,
+    session: AsyncSession,
+    chat_db: Chat,
+    state: FSMContext,
+    member_directory: MemberDirectoryCache,
+) -> None:
     if not _require_group(message):
         return
     await safe_delete_message(bot, chat_id=message.chat.id, message_id=message.message_id)
@@ -35,7 +43,7 @@ async def pay_cmd(message: Message, bot: Bot, session: AsyncSession, chat_db: Ch
         pay_receiver_member_id=None,
         pay_amount_k_str="",
     )
-    members = await list_members(session, chat_id=chat_db.id)
+    members = (await member_directory.get(session, chat_id=chat_db.id)).members
     wizard = await message.answer(
         "<b>PAY (o'tkazma)</b>\nKim to'laydi (payer)?",
         parse_mode=ParseMode.HTML,
@@ -50,13 +58,18 @@ async def pay_cmd(message: Message, bot: Bot, session: AsyncSession, chat_db: Ch
     await state.update_data(wizard_message_id=wizard.message_id)
 
 
-@router.callback_query(PageCb.filter())
-async def pay_pages_cb(callback: CallbackQuery, callback_data: PageCb, session: AsyncSession, chat_db: Chat) -> None:
+@callbacks.on(PageCb, "pay_payer")
+@callbacks.on(PageCb, "pay_receiver")
+async def pay_pages_cb(
+    callback: CallbackQuery,
+    callback_data: PageCb,
+    session: AsyncSession,
+    chat_db: Chat,
+    member_directory: MemberDirectoryCache,
+) -> None:
     if callback.from_user.id != callback_data.initiator:
         return
-    if callback_data.flow not in ("pay_payer", "pay_receiver"):
-        return
-    members = await list_members(session, chat_id=chat_db.id)
+    members = (await member_directory.get(session, chat_id=chat_db.id)).members
     field = "payer" if callback_data.flow == "pay_payer" else "receiver"
     await callback.message.edit_reply_markup(
         reply_markup=members_keyboard(
@@ -70,13 +83,21 @@ async def pay_pages_cb(callback: CallbackQuery, callback_data: PageCb, session:
     await callback.answer()
 
 
-@router.callback_query(PickMemberCb.filter())
-async def pay_pick_member_cb(callback: CallbackQuery, callback_data: PickMemberCb, session: AsyncSession, chat_db: Chat, state: FSMContext) -> None:
+@callbacks.on(PickMemberCb, "payer")
+@callbacks.on(PickMemberCb, "receiver")
+async def pay_pick_member_cb(
+    callback: CallbackQuery,
+    callback_data: PickMemberCb,
+    session: AsyncSession,
+    chat_db: Chat,
+    state: FSMContext,
+    member_directory: MemberDirectoryCache,
+) -> None:
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
 
-    members = await list_members(session, chat_id=chat_db.id)
+    directory = await member_directory.get(session, chat_id=chat_db.id)
 
     if callback_data.field == "payer":
         await state.update_data(pay_payer_member_id=callback_data.member_id)
@@ -87,7 +108,7 @@ async def pay_pick_member_cb(callback: CallbackQuery, callback_data: PickMemberC
                 initiator_user_id=callback.from_user.id,
                 flow="pay_receiver",
                 field="receiver",
-                members=members,
+                members=directory.members,
                 page=0,
             ),
         )
@@ -104,12 +125,10 @@ async def pay_pick_member_cb(callback: CallbackQuery, callback_data: PickMemberC
             await callback.answer("Payer va receiver bir xil bo'lmasin.", show_alert=True)
             return
         await state.update_data(pay_receiver_member_id=callback_data.member_id, pay_amount_k_str="")
-        payer = next((m for m in members if m.id == int(payer_id)), None)
-        receiver = next((m for m in members if m.id == int(callback_data.member_id)), None)
         await callback.message.edit_text(
             "<b>PAY</b>\n"
-            f"Payer: <b>{member_label(payer) if payer else payer_id}</b>\n"
-            f"Receiver: <b>{member_label(receiver) if receiver else callback_data.member_id}</b>\n\n"
+            f"Payer: <b>{directory.label(int(payer_id))}</b>\n"
+            f"Receiver: <b>{directory.label(int(callback_data.member_id))}</b>\n\n"
             "Summa (k) kiriting:",
             parse_mode=ParseMode.HTML,
             reply_markup=numeric_keyboard(initiator_user_id=callback.from_user.id, field="pay_amount_k"),
@@ -118,10 +137,8 @@ async def pay_pick_member_cb(callback: CallbackQuery, callback_data: PickMemberC
         return
 
 
-@router.callback_query(DigitCb.filter())
+@callbacks.on(DigitCb, "pay_amount_k")
 async def pay_digit_cb(callback: CallbackQuery, callback_data: DigitCb, state: FSMContext) -> None:
-    if callback_data.field != "pay_amount_k":
-        return
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -142,10 +159,15 @@ async def pay_digit_cb(callback: CallbackQuery, callback_data: DigitCb, state: F
     await callback.answer()
 
 
-@router.callback_query(NumActionCb.filter())
-async def pay_num_action_cb(callback: CallbackQuery, callback_data: NumActionCb, session: AsyncSession, chat_db: Chat, state: FSMContext) -> None:
-    if callback_data.field != "pay_amount_k":
-        return
+@callbacks.on(NumActionCb, "pay_amount_k")
+async def pay_num_action_cb(
+    callback: CallbackQuery,
+    callback_data: NumActionCb,
+    session: AsyncSession,
+    chat_db: Chat,
+    state: FSMContext,
+    member_directory: MemberDirectoryCache,
+) -> None:
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -170,14 +192,12 @@ async def pay_num_action_cb(callback: CallbackQuery, callback_data: NumActionCb,
         if not payer_id or not receiver_id:
             await callback.answer("Sessiya eskirgan. /pay qayta bosing.", show_alert=True)
             return
-        members = await list_members(session, chat_id=chat_db.id)
-        payer = next((m for m in members if m.id == int(payer_id)), None)
-        receiver = next((m for m in members if m.id == int(receiver_id)), None)
+        directory = await member_directory.get(session, chat_id=chat_db.id)
         await state.update_data(pay_amount_k=amount_k)
         await callback.message.edit_text(
             "<b>PAY</b>\n"
-            f"Payer: <b>{member_label(payer) if payer else payer_id}</b>\n"
-            f"Receiver: <b>{member_label(receiver) if receiver else receiver_id}</b>\n"
+            f"Payer: <b>{directory.label(int(payer_id))}</b>\n"
+            f"Receiver: <b>{directory.label(int(receiver_id))}</b>\n"
             f"Summa: <b>{amount_k}k</b>\n\n"
             "Tasdiqlaysizmi?",
             parse_mode=ParseMode.HTML,
@@ -198,7 +218,7 @@ async def pay_num_action_cb(callback: CallbackQuery, callback_data: NumActionCb,
     await callback.answer()
 
 
-@router.callback_query(ConfirmCb.filter())
+@callbacks.on(ConfirmCb, "pay")
 async def pay_confirm_cb(
     callback: CallbackQuery,
     callback_data: ConfirmCb,
@@ -208,8 +228,6 @@ async def pay_confirm_cb(
     state: FSMContext,
     dashboard: DashboardManager,
 ) -> None:
-    if callback_data.flow != "pay":
-        return
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -235,9 +253,12 @@ async def pay_confirm_cb(
         await callback.answer(str(e), show_alert=True)
         return
 
+    await dashboard.schedule(callback.message.chat.id, session=session)
+    # Commit before the Bot API calls: the ledger lock must not wait on Telegram.
+    await commit_session(session)
+
     if callback.message:
         await safe_delete_message(bot, chat_id=callback.message.chat.id, message_id=callback.message.message_id)
     await state.clear()
-    dashboard.schedule(callback.message.chat.id)
     await callback.answer("Saqlandi.")
 
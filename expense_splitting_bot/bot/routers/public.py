@@ -1,17 +1,23 @@
 from __future__ import annotations
 
+import html
+
 from aiogram import Bot, Router
 from aiogram.enums import ChatType, ParseMode
 from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from expense_splitting_bot.bot.keyboards import close_keyboard
-from expense_splitting_bot.bot.utils import delete_later, safe_delete_message
-from expense_splitting_bot.db.models import Chat
-from expense_splitting_bot.services.ledger import compute_balances, compute_settlement
-from expense_splitting_bot.services.members import list_members
-from expense_splitting_bot.bot.text import member_label
+from expense_splitting_bot.bot.callback_dispatch import callbacks
+from expense_splitting_bot.bot.callbacks import HistoryCb
+from expense_splitting_bot.bot.dashboard import DashboardManager
+from expense_splitting_bot.bot.deletion_scheduler import DeletionScheduler
+from expense_splitting_bot.bot.keyboards import close_keyboard, history_cursor, history_keyboard
+from expense_splitting_bot.bot.ledger_cache import LedgerCache
+from expense_splitting_bot.bot.member_directory import MemberDirectory, MemberDirectoryCache
+from expense_splitting_bot.bot.utils import safe_delete_message
+from expense_splitting_bot.db.models import Chat, TransactionType
+from expense_splitting_bot.services.transactions import TransactionPage, get_transaction_page
 
 router = Router(name=__name__)
 
@@ -21,19 +27,18 @@ def _require_group(message: Message) -> bool:
 
 
 @router.message(Command("balance"))
-async def balance_cmd(message: Message, bot: Bot, session: AsyncSession, chat_db: Chat) -> None:
+async def balance_cmd(
+    message: Message, bot: Bot, session: AsyncSession, chat_db: Chat, ledger_cache: LedgerCache, deletions: DeletionScheduler
+) -> None:
     if not _require_group(message):
         return
     await safe_delete_message(bot, chat_id=message.chat.id, message_id=message.message_id)
 
-    members = await list_members(session, chat_id=chat_db.id)
-    members_by_id = {m.id: m for m in members}
-    balances = await compute_balances(session, chat_id=chat_db.id)
+    view = await ledger_cache.get_view(session, chat_id=chat_db.id)
 
     lines = []
-    for b in balances[:30]:
-        m = members_by_id.get(b.member_id)
-        name = member_label(m) if m else str(b.member_id)
+    for b in view.summary.balances[:30]:
+        name = view.label(b.member_id)
         if b.balance_k > 0:
             lines.append(f"{name}: +{b.balance_k}k (beradi)")
         elif b.balance_k < 0:
@@ -48,25 +53,22 @@ async def balance_cmd(message: Message, bot: Bot, session: AsyncSession, chat_db
         parse_mode=ParseMode.HTML,
         reply_markup=close_keyboard(initiator_user_id=message.from_user.id),
     )
-    delete_later(bot, chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=120)
+    deletions.schedule(chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=120)
 
 
 @router.message(Command("settle"))
-async def settle_cmd(message: Message, bot: Bot, session: AsyncSession, chat_db: Chat) -> None:
+async def settle_cmd(
+    message: Message, bot: Bot, session: AsyncSession, chat_db: Chat, ledger_cache: LedgerCache, deletions: DeletionScheduler
+) -> None:
     if not _require_group(message):
         return
     await safe_delete_message(bot, chat_id=message.chat.id, message_id=message.message_id)
 
-    members = await list_members(session, chat_id=chat_db.id)
-    members_by_id = {m.id: m for m in members}
-    balances = await compute_balances(session, chat_id=chat_db.id)
-    transfers = compute_settlement(balances)
+    view = await ledger_cache.get_view(session, chat_id=chat_db.id)
 
     lines = []
-    for t in transfers[:30]:
-        frm = members_by_id.get(t.from_member_id)
-        to = members_by_id.get(t.to_member_id)
-        lines.append(f"{member_label(frm) if frm else t.from_member_id} → {member_label(to) if to else t.to_member_id}: {t.amount_k}k")
+    for t in view.summary.transfers[:30]:
+        lines.append(f"{view.label(t.from_member_id)} → {view.label(t.to_member_id)}: {t.amount_k}k")
     if not lines:
         lines = ["Hozircha kerak emas."]
 
@@ -75,5 +77,102 @@ async def settle_cmd(message: Message, bot: Bot, session: AsyncSession, chat_db:
         parse_mode=ParseMode.HTML,
         reply_markup=close_keyboard(initiator_user_id=message.from_user.id),
     )
-    delete_later(bot, chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=120)
+    deletions.schedule(chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=120)
+
+
+HISTORY_PAGE_SIZE = 10
+HISTORY_TTL_SECONDS = 180
 
+
+def _render_history(page: TransactionPage, directory: MemberDirectory) -> str:
+    if not page.rows:
+        return "<b>Tarix</b>\nHali tranzaksiyalar yo'q."
+    lines = []
+    for row in page.rows:
+        payer = html.escape(row.paid_by_label, quote=False)
+        if row.type == TransactionType.ROOM:
+            whom = f"residentlar ({len(row.participant_member_ids)})"
+        else:
+            names = [directory.label(mid) for mid in row.participant_member_ids[:3]]
+            rest = len(row.participant_member_ids) - len(names)
+            whom = html.escape(", ".join(names) + (f" +{rest}" if rest > 0 else ""), quote=False)
+        line = f"{row.created_at:%m-%d %H:%M} <b>{row.type.value}</b> {row.amount_k}k: {payer} → {whom}"
+        if row.note:
+            line += f"\n    <i>{html.escape(row.note, quote=False)}</i>"
+        lines.append(line)
+    return "<b>Tarix</b>\n" + "\n".join(lines)
+
+
+def _history_markup(page: TransactionPage, initiator_user_id: int) -> InlineKeyboardMarkup:
+    return history_keyboard(
+        initiator_user_id=initiator_user_id,
+        newer=page.rows[0].cursor if page.rows and page.has_newer else None,
+        older=page.rows[-1].cursor if page.rows and page.has_older else None,
+    )
+
+
+@router.message(Command("history"))
+async def history_cmd(
+    message: Message,
+    bot: Bot,
+    session: AsyncSession,
+    chat_db: Chat,
+    member_directory: MemberDirectoryCache,
+    deletions: DeletionScheduler,
+) -> None:
+    if not _require_group(message):
+        return
+    await safe_delete_message(bot, chat_id=message.chat.id, message_id=message.message_id)
+
+    page = await get_transaction_page(session, chat_id=chat_db.id, limit=HISTORY_PAGE_SIZE)
+    directory = await member_directory.get(session, chat_id=chat_db.id)
+    msg = await message.answer(
+        _render_history(page, directory),
+        parse_mode=ParseMode.HTML,
+        reply_markup=_history_markup(page, message.from_user.id),
+    )
+    deletions.schedule(chat_id=msg.chat.id, message_id=msg.message_id, delay_seconds=HISTORY_TTL_SECONDS)
+
+
+@callbacks.on(HistoryCb)
+async def history_page_cb(
+    callback: CallbackQuery,
+    callback_data: HistoryCb,
+    session: AsyncSession,
+    chat_db: Chat,
+    member_directory: MemberDirectoryCache,
+    deletions: DeletionScheduler,
+) -> None:
+    if callback.from_user.id != callback_data.initiator:
+        await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
+        return
+    cursor = history_cursor(callback_data.created_us, callback_data.tx_id)
+    older = callback_data.direction == "older"
+    page = await get_transaction_page(
+        session,
+        chat_id=chat_db.id,
+        limit=HISTORY_PAGE_SIZE,
+        older_than=cursor if older else None,
+        newer_than=None if older else cursor,
+    )
+    directory = await member_directory.get(session, chat_id=chat_db.id)
+    if callback.message:
+        await callback.message.edit_text(
+            _render_history(page, directory),
+            parse_mode=ParseMode.HTML,
+            reply_markup=_history_markup(page, callback_data.initiator),
+        )
+        # Paging keeps the message alive.
+        deletions.schedule(
+            chat_id=callback.message.chat.id, message_id=callback.message.message_id, delay_seconds=HISTORY_TTL_SECONDS
+        )
+    await callback.answer()
+
+
+@router.message(Command("dashboard"))
+async def dashboard_cmd(message: Message, bot: Bot, dashboard: DashboardManager) -> None:
+    if not _require_group(message):
+        return
+    await safe_delete_message(bot, chat_id=message.chat.id, message_id=message.message_id)
+    # Forced: the stored hash cannot tell that someone deleted the pinned message.
+    await dashboard.update_now(message.chat.id, force=True)
@@ -7,14 +7,16 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from expense_splitting_bot.bot.callback_dispatch import callbacks
 from expense_splitting_bot.bot.callbacks import ConfirmCb, DigitCb, NumActionCb, PageCb, PickMemberCb
 from expense_splitting_bot.bot.dashboard import DashboardManager
 from expense_splitting_bot.bot.keyboards import confirm_keyboard, members_keyboard, numeric_keyboard
+from expense_splitting_bot.bot.member_directory import MemberDirectoryCache
+from expense_splitting_bot.bot.middlewares import commit_session
 from expense_splitting_bot.bot.utils import safe_delete_message
 from expense_splitting_bot.db.models import Chat, Member, TransactionType
-from expense_splitting_bot.services.members import list_members, list_residents
+from expense_splitting_bot.services.members import list_residents
 from expense_splitting_bot.services.transactions import create_transaction
-from expense_splitting_bot.bot.text import member_label
 
 router = Router(name=__name__)
 
@@ -56,10 +58,8 @@ async def room_cmd(
     await state.update_data(wizard_message_id=wizard.message_id)
 
 
-@router.callback_query(DigitCb.filter())
+@callbacks.on(DigitCb, "room_amount_k")
 async def room_digit_cb(callback: CallbackQuery, callback_data: DigitCb, state: FSMContext) -> None:
-    if callback_data.field != "room_amount_k":
-        return
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -80,16 +80,15 @@ async def room_digit_cb(callback: CallbackQuery, callback_data: DigitCb, state:
     await callback.answer()
 
 
-@router.callback_query(NumActionCb.filter())
+@callbacks.on(NumActionCb, "room_amount_k")
 async def room_num_action_cb(
     callback: CallbackQuery,
     callback_data: NumActionCb,
     session: AsyncSession,
     chat_db: Chat,
     state: FSMContext,
+    member_directory: MemberDirectoryCache,
 ) -> None:
-    if callback_data.field != "room_amount_k":
-        return
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -111,7 +110,7 @@ async def room_num_action_cb(
         if amount_k <= 0:
             await callback.answer("Summani to'g'ri kiriting.", show_alert=True)
             return
-        members = await list_members(session, chat_id=chat_db.id)
+        members = (await member_directory.get(session, chat_id=chat_db.id)).members
         await state.update_data(room_amount_k=amount_k, room_payer_page=0)
         await callback.message.edit_text(
             "<b>ROOM</b>\n"
@@ -121,7 +120,7 @@ async def room_num_action_cb(
             reply_markup=members_keyboard(
                 initiator_user_id=callback.from_user.id,
                 flow="room_payer",
-                field="paid_by",
+                field="room_paid_by",
                 members=members,
                 page=0,
             ),
@@ -141,19 +140,23 @@ async def room_num_action_cb(
     await callback.answer()
 
 
-@router.callback_query(PageCb.filter())
-async def room_page_cb(callback: CallbackQuery, callback_data: PageCb, session: AsyncSession, chat_db: Chat) -> None:
-    if callback_data.flow != "room_payer":
-        return
+@callbacks.on(PageCb, "room_payer")
+async def room_page_cb(
+    callback: CallbackQuery,
+    callback_data: PageCb,
+    session: AsyncSession,
+    chat_db: Chat,
+    member_directory: MemberDirectoryCache,
+) -> None:
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
-    members = await list_members(session, chat_id=chat_db.id)
+    members = (await member_directory.get(session, chat_id=chat_db.id)).members
     await callback.message.edit_reply_markup(
         reply_markup=members_keyboard(
             initiator_user_id=callback.from_user.id,
             flow="room_payer",
-            field="paid_by",
+            field="room_paid_by",
             members=members,
             page=callback_data.page,
         )
@@ -161,16 +164,15 @@ async def room_page_cb(callback: CallbackQuery, callback_data: PageCb, session:
     await callback.answer()
 
 
-@router.callback_query(PickMemberCb.filter())
+@callbacks.on(PickMemberCb, "room_paid_by")
 async def room_pick_payer_cb(
     callback: CallbackQuery,
     callback_data: PickMemberCb,
     session: AsyncSession,
     chat_db: Chat,
     state: FSMContext,
+    member_directory: MemberDirectoryCache,
 ) -> None:
-    if callback_data.field != "paid_by":
-        return
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -180,18 +182,18 @@ async def room_pick_payer_cb(
         await callback.answer("Sessiya eskirgan. /room qayta bosing.", show_alert=True)
         return
 
-    residents = await list_residents(session, chat_id=chat_db.id)
+    directory = await member_directory.get(session, chat_id=chat_db.id)
+    residents = directory.residents
     if not residents:
         await callback.answer("Residentlar tanlanmagan. /setup qiling.", show_alert=True)
         return
 
-    payer = next((m for m in await list_members(session, chat_id=chat_db.id) if m.id == callback_data.member_id), None)
     await state.update_data(paid_by_member_id=callback_data.member_id)
 
     await callback.message.edit_text(
         "<b>ROOM</b>\n"
         f"Summa: <b>{amount_k}k</b>\n"
-        f"To'lovchi: <b>{member_label(payer) if payer else callback_data.member_id}</b>\n"
+        f"To'lovchi: <b>{directory.label(callback_data.member_id)}</b>\n"
         f"Ishtirokchilar: <b>{len(residents)}</b> (barchasi resident)\n\n"
         "Tasdiqlaysizmi?",
         parse_mode=ParseMode.HTML,
@@ -200,7 +202,7 @@ async def room_pick_payer_cb(
     await callback.answer()
 
 
-@router.callback_query(ConfirmCb.filter())
+@callbacks.on(ConfirmCb, "room")
 async def room_confirm_cb(
     callback: CallbackQuery,
     callback_data: ConfirmCb,
@@ -210,8 +212,6 @@ async def room_confirm_cb(
     state: FSMContext,
     dashboard: DashboardManager,
 ) -> None:
-    if callback_data.flow != "room":
-        return
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -242,8 +242,11 @@ async def room_confirm_cb(
         return
 
     # Clean up wizard message.
+    await dashboard.schedule(callback.message.chat.id, session=session)
+    # Commit before the Bot API calls: the ledger lock must not wait on Telegram.
+    await commit_session(session)
+
     if callback.message:
         await safe_delete_message(bot, chat_id=callback.message.chat.id, message_id=callback.message.message_id)
     await state.clear()
-    dashboard.schedule(callback.message.chat.id)
     await callback.answer("Saqlandi.")
@@ -7,14 +7,15 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from expense_splitting_bot.bot.callback_dispatch import callbacks
 from expense_splitting_bot.bot.callbacks import ConfirmCb, DigitCb, NumActionCb, PageCb, PickMemberCb, SplitParticipantsActionCb, ToggleParticipantCb
 from expense_splitting_bot.bot.dashboard import DashboardManager
 from expense_splitting_bot.bot.keyboards import confirm_keyboard, members_keyboard, numeric_keyboard, split_participants_keyboard
+from expense_splitting_bot.bot.member_directory import MemberDirectoryCache
+from expense_splitting_bot.bot.middlewares import commit_session
 from expense_splitting_bot.bot.utils import safe_delete_message
 from expense_splitting_bot.db.models import Chat, TransactionType
-from expense_splitting_bot.services.members import list_members
 from expense_splitting_bot.services.transactions import create_transaction
-from expense_splitting_bot.bot.text import member_label
 
 router = Router(name=__name__)
 
@@ -43,10 +44,8 @@ async def split_cmd(message: Message, bot: Bot, session: AsyncSession, chat_db:
     await state.update_data(wizard_message_id=wizard.message_id)
 
 
-@router.callback_query(DigitCb.filter())
+@callbacks.on(DigitCb, "split_amount_k")
 async def split_digit_cb(callback: CallbackQuery, callback_data: DigitCb, state: FSMContext) -> None:
-    if callback_data.field != "split_amount_k":
-        return
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -67,16 +66,15 @@ async def split_digit_cb(callback: CallbackQuery, callback_data: DigitCb, state:
     await callback.answer()
 
 
-@router.callback_query(NumActionCb.filter())
+@callbacks.on(NumActionCb, "split_amount_k")
 async def split_num_action_cb(
     callback: CallbackQuery,
     callback_data: NumActionCb,
     session: AsyncSession,
     chat_db: Chat,
     state: FSMContext,
+    member_directory: MemberDirectoryCache,
 ) -> None:
-    if callback_data.field != "split_amount_k":
-        return
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -98,7 +96,7 @@ async def split_num_action_cb(
         if amount_k <= 0:
             await callback.answer("Summani to'g'ri kiriting.", show_alert=True)
             return
-        members = await list_members(session, chat_id=chat_db.id)
+        members = (await member_directory.get(session, chat_id=chat_db.id)).members
         await state.update_data(split_amount_k=amount_k, split_payer_page=0)
         await callback.message.edit_text(
             "<b>SPLIT</b>\n"
@@ -108,7 +106,7 @@ async def split_num_action_cb(
             reply_markup=members_keyboard(
                 initiator_user_id=callback.from_user.id,
                 flow="split_payer",
-                field="paid_by",
+                field="split_paid_by",
                 members=members,
                 page=0,
             ),
@@ -128,17 +126,25 @@ async def split_num_action_cb(
     await callback.answer()
 
 
-@router.callback_query(PageCb.filter())
-async def split_pages_cb(callback: CallbackQuery, callback_data: PageCb, session: AsyncSession, chat_db: Chat, state: FSMContext) -> None:
+@callbacks.on(PageCb, "split_payer")
+@callbacks.on(PageCb, "split_participants")
+async def split_pages_cb(
+    callback: CallbackQuery,
+    callback_data: PageCb,
+    session: AsyncSession,
+    chat_db: Chat,
+    state: FSMContext,
+    member_directory: MemberDirectoryCache,
+) -> None:
     if callback.from_user.id != callback_data.initiator:
         return
     if callback_data.flow == "split_payer":
-        members = await list_members(session, chat_id=chat_db.id)
+        members = (await member_directory.get(session, chat_id=chat_db.id)).members
         await callback.message.edit_reply_markup(
             reply_markup=members_keyboard(
                 initiator_user_id=callback.from_user.id,
                 flow="split_payer",
-                field="paid_by",
+                field="split_paid_by",
                 members=members,
                 page=callback_data.page,
             )
@@ -148,7 +154,7 @@ async def split_pages_cb(callback: CallbackQuery, callback_data: PageCb, session
     if callback_data.flow == "split_participants":
         data = await state.get_data()
         selected = set(int(x) for x in data.get("split_participant_ids", []))
-        members = await list_members(session, chat_id=chat_db.id)
+        members = (await member_directory.get(session, chat_id=chat_db.id)).members
         await state.update_data(split_participants_page=callback_data.page)
         await callback.message.edit_reply_markup(
             reply_markup=split_participants_keyboard(
@@ -162,16 +168,15 @@ async def split_pages_cb(callback: CallbackQuery, callback_data: PageCb, session
         return
 
 
-@router.callback_query(PickMemberCb.filter())
+@callbacks.on(PickMemberCb, "split_paid_by")
 async def split_pick_payer_cb(
     callback: CallbackQuery,
     callback_data: PickMemberCb,
     session: AsyncSession,
     chat_db: Chat,
     state: FSMContext,
+    member_directory: MemberDirectoryCache,
 ) -> None:
-    if callback_data.field != "paid_by":
-        return
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -181,14 +186,14 @@ async def split_pick_payer_cb(
         await callback.answer("Sessiya eskirgan. /split qayta bosing.", show_alert=True)
         return
 
-    members = await list_members(session, chat_id=chat_db.id)
-    payer = next((m for m in members if m.id == callback_data.member_id), None)
+    directory = await member_directory.get(session, chat_id=chat_db.id)
+    members = directory.members
     await state.update_data(split_paid_by_member_id=callback_data.member_id, split_participant_ids=[m.id for m in members], split_participants_page=0)
 
     await callback.message.edit_text(
         "<b>SPLIT</b>\n"
         f"Summa: <b>{amount_k}k</b>\n"
-        f"To'lovchi: <b>{member_label(payer) if payer else callback_data.member_id}</b>\n\n"
+        f"To'lovchi: <b>{directory.label(callback_data.member_id)}</b>\n\n"
         "Ishtirokchilarni tanlang:",
         parse_mode=ParseMode.HTML,
         reply_markup=split_participants_keyboard(
@@ -201,8 +206,15 @@ async def split_pick_payer_cb(
     await callback.answer()
 
 
-@router.callback_query(ToggleParticipantCb.filter())
-async def split_toggle_participant_cb(callback: CallbackQuery, callback_data: ToggleParticipantCb, session: AsyncSession, chat_db: Chat, state: FSMContext) -> None:
+@callbacks.on(ToggleParticipantCb)
+async def split_toggle_participant_cb(
+    callback: CallbackQuery,
+    callback_data: ToggleParticipantCb,
+    session: AsyncSession,
+    chat_db: Chat,
+    state: FSMContext,
+    member_directory: MemberDirectoryCache,
+) -> None:
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -214,7 +226,7 @@ async def split_toggle_participant_cb(callback: CallbackQuery, callback_data: To
         selected.add(callback_data.member_id)
     await state.update_data(split_participant_ids=list(selected))
     page = int(data.get("split_participants_page") or 0)
-    members = await list_members(session, chat_id=chat_db.id)
+    members = (await member_directory.get(session, chat_id=chat_db.id)).members
     await callback.message.edit_reply_markup(
         reply_markup=split_participants_keyboard(
             initiator_user_id=callback.from_user.id,
@@ -226,13 +238,14 @@ async def split_toggle_participant_cb(callback: CallbackQuery, callback_data: To
     await callback.answer()
 
 
-@router.callback_query(SplitParticipantsActionCb.filter())
+@callbacks.on(SplitParticipantsActionCb)
 async def split_participants_action_cb(
     callback: CallbackQuery,
     callback_data: SplitParticipantsActionCb,
     session: AsyncSession,
     chat_db: Chat,
     state: FSMContext,
+    member_directory: MemberDirectoryCache,
 ) -> None:
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
@@ -244,7 +257,8 @@ async def split_participants_action_cb(
         await callback.answer("Sessiya eskirgan. /split qayta bosing.", show_alert=True)
         return
 
-    members = await list_members(session, chat_id=chat_db.id)
+    directory = await member_directory.get(session, chat_id=chat_db.id)
+    members = directory.members
     if callback_data.action == "all":
         selected = {m.id for m in members}
         await state.update_data(split_participant_ids=list(selected))
@@ -275,11 +289,10 @@ async def split_participants_action_cb(
         if not selected:
             await callback.answer("Kamida 1 ishtirokchi tanlang.", show_alert=True)
             return
-        payer = next((m for m in members if m.id == int(paid_by_member_id)), None)
         await callback.message.edit_text(
             "<b>SPLIT</b>\n"
             f"Summa: <b>{amount_k}k</b>\n"
-            f"To'lovchi: <b>{member_label(payer) if payer else paid_by_member_id}</b>\n"
+            f"To'lovchi: <b>{directory.label(int(paid_by_member_id))}</b>\n"
             f"Ishtirokchilar: <b>{len(selected)}</b>\n\n"
             "Tasdiqlaysizmi?",
             parse_mode=ParseMode.HTML,
@@ -289,7 +302,7 @@ async def split_participants_action_cb(
         return
 
 
-@router.callback_query(ConfirmCb.filter())
+@callbacks.on(ConfirmCb, "split")
 async def split_confirm_cb(
     callback: CallbackQuery,
     callback_data: ConfirmCb,
@@ -299,8 +312,6 @@ async def split_confirm_cb(
     state: FSMContext,
     dashboard: DashboardManager,
 ) -> None:
-    if callback_data.flow != "split":
-        return
     if callback.from_user.id != callback_data.initiator:
         await callback.answer("Bu tugma siz uchun emas.", show_alert=True)
         return
@@ -325,8 +336,11 @@ async def split_confirm_cb(
         await callback.answer(str(e), show_alert=True)
         return
 
+    await dashboard.schedule(callback.message.chat.id, session=session)
+    # Commit before the Bot API calls: the ledger lock must not wait on Telegram.
+    await commit_session(session)
+
     if callback.message:
         await safe_delete_message(bot, chat_id=callback.message.chat.id, message_id=callback.message.message_id)
     await state.clear()
-    dashboard.schedule(callback.message.chat.id)
     await callback.answer("Saqlandi.")
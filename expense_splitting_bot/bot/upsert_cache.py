@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from expense_splitting_bot.db.models import Chat, Member
+
+
+@dataclass(frozen=True, slots=True)
+class _Written:
+    chat_id: int
+    member_id: int
+    title: Optional[str]
+    username: Optional[str]
+    first_name: Optional[str]
+    expires: float  # monotonic
+
+
+@dataclass(frozen=True)
+class UpsertCacheStats:
+    size: int
+    skipped_writes: int
+    writes: int
+    evictions: int
+
+
+class UpsertFingerprintCache:
+    """
+    Remembers the chat title and member labels last committed per (tg_chat_id, tg_user_id).
+
+    UpsertChatMemberMiddleware skips its chat/member upserts when an update carries the
+    same values again. Entries expire after ttl_seconds, so a label written by another
+    process is not masked for long.
+    """
+
+    def __init__(self, *, max_entries: int = 10_000, ttl_seconds: float = 600.0) -> None:
+        self._max_entries = max(1, int(max_entries))
+        self._ttl = ttl_seconds
+        self._entries: OrderedDict[tuple[int, int], _Written] = OrderedDict()
+        self._skipped = 0
+        self._writes = 0
+        self._evictions = 0
+
+    async def lookup(
+        self,
+        session: AsyncSession,
+        *,
+        tg_chat_id: int,
+        tg_user_id: int,
+        title: Optional[str],
+        username: Optional[str],
+        first_name: Optional[str],
+    ) -> Optional[tuple[Chat, Member]]:
+        """Session-bound chat/member rows on a fingerprint match, else None (a write is due)."""
+        key = (tg_chat_id, tg_user_id)
+        w = self._entries.get(key)
+        if (
+            w is None
+            or w.expires <= time.monotonic()
+            or (w.title, w.username, w.first_name) != (title, username, first_name)
+        ):
+            self._writes += 1
+            return None
+        self._entries.move_to_end(key)
+        self._skipped += 1
+
+        # Only identity and label columns are known here; the rest stay unloaded, so e.g.
+        # ledger_version must be read from the database (LedgerCache/MemberDirectoryCache do).
+        chat = Chat(id=w.chat_id, tg_chat_id=tg_chat_id, title=title)
+        member = Member(id=w.member_id, chat_id=w.chat_id, tg_user_id=tg_user_id, username=username, first_name=first_name)
+        make_transient_to_detached(chat)
+        make_transient_to_detached(member)
+        return await session.merge(chat, load=False), await session.merge(member, load=False)
+
+    def remember(self, *, tg_chat_id: int, tg_user_id: int, chat: Chat, member: Member) -> None:
+        """Record what was written; call only once the transaction has committed."""
+        key = (tg_chat_id, tg_user_id)
+        self._entries[key] = _Written(
+            chat_id=chat.id,
+            member_id=member.id,
+            title=chat.title,
+            username=member.username,
+            first_name=member.first_name,
+            expires=time.monotonic() + self._ttl,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def stats(self) -> UpsertCacheStats:
+        return UpsertCacheStats(
+            size=len(self._entries),
+            skipped_writes=self._skipped,
+            writes=self._writes,
+            evictions=self._evictions,
+        )
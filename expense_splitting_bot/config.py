@@ -16,7 +16,49 @@ class Settings(BaseSettings):
     log_level: str = Field("INFO", alias="LOG_LEVEL")
     sql_echo: bool = Field(False, alias="SQL_ECHO")
 
+    # "polling" or "webhook". Webhook mode serves WEBHOOK_URL + WEBHOOK_PATH from WEBHOOK_HOST:WEBHOOK_PORT.
+    bot_mode: str = Field("polling", alias="BOT_MODE")
+    webhook_url: str = Field("", alias="WEBHOOK_URL")  # public base URL, e.g. https://bot.example.com
+    webhook_path: str = Field("/telegram/webhook", alias="WEBHOOK_PATH")
+    webhook_host: str = Field("0.0.0.0", alias="WEBHOOK_HOST")
+    webhook_port: int = Field(8080, alias="WEBHOOK_PORT")
+    webhook_secret: str = Field("", alias="WEBHOOK_SECRET")
+    webhook_workers: int = Field(1, alias="WEBHOOK_WORKERS")
+    # Custom Bot API server (local telegram-bot-api or a test stub); empty = api.telegram.org.
+    telegram_api_base_url: str = Field("", alias="TELEGRAM_API_BASE_URL")
+
+    # Adaptive per-chat debounce: an isolated write refreshes after the minimum,
+    # a burst of writes backs off exponentially up to DASHBOARD_DEBOUNCE_SECONDS.
     dashboard_debounce_seconds: float = Field(2.0, alias="DASHBOARD_DEBOUNCE_SECONDS")
+    dashboard_debounce_min_seconds: float = Field(0.25, alias="DASHBOARD_DEBOUNCE_MIN_SECONDS")
+    dashboard_state_ttl_seconds: float = Field(3600.0, alias="DASHBOARD_STATE_TTL_SECONDS")
+    dashboard_max_states: int = Field(10_000, alias="DASHBOARD_MAX_STATES")
+    dashboard_max_workers: int = Field(0, alias="DASHBOARD_MAX_WORKERS")  # 0 = unlimited
+    # "local" (one bot process) or "postgres" (LISTEN/NOTIFY + advisory locks, for several replicas).
+    dashboard_coordination: str = Field("local", alias="DASHBOARD_COORDINATION")
+    dashboard_notify_channel: str = Field("dashboard_refresh", alias="DASHBOARD_NOTIFY_CHANNEL")
+
+    # Outbound Bot API rate limits (Telegram: ~30 msg/s overall, ~20 msg/min per group).
+    outbound_global_per_second: float = Field(30.0, alias="OUTBOUND_GLOBAL_PER_SECOND")
+    outbound_group_per_minute: float = Field(20.0, alias="OUTBOUND_GROUP_PER_MINUTE")
+
+    # "postgres" (fsm_records table + in-process cache) or "memory" (lost on restart, one process only).
+    fsm_storage: str = Field("postgres", alias="FSM_STORAGE")
+    fsm_ttl_seconds: float = Field(1800.0, alias="FSM_TTL_SECONDS")  # abandoned wizards expire
+    fsm_flush_interval_seconds: float = Field(0.5, alias="FSM_FLUSH_INTERVAL_SECONDS")
+    fsm_cache_size: int = Field(10_000, alias="FSM_CACHE_SIZE")
+
+    ledger_cache_size: int = Field(1024, alias="LEDGER_CACHE_SIZE")
+    member_directory_cache_size: int = Field(1024, alias="MEMBER_DIRECTORY_CACHE_SIZE")
+    upsert_cache_size: int = Field(10_000, alias="UPSERT_CACHE_SIZE")
+    upsert_cache_ttl_seconds: float = Field(600.0, alias="UPSERT_CACHE_TTL_SECONDS")
+    admin_cache_ttl_seconds: float = Field(300.0, alias="ADMIN_CACHE_TTL_SECONDS")
+    # Durable background jobs (dashboard refreshes, checkpoints) in the jobs table; 0 = in-process tasks.
+    job_queue_workers: int = Field(4, alias="JOB_QUEUE_WORKERS")
+    job_queue_poll_interval_seconds: float = Field(1.0, alias="JOB_QUEUE_POLL_INTERVAL_SECONDS")
+    job_queue_max_attempts: int = Field(5, alias="JOB_QUEUE_MAX_ATTEMPTS")
+    ledger_checkpoint_min_delta: int = Field(500, alias="LEDGER_CHECKPOINT_MIN_DELTA")
+    ledger_checkpoint_interval_seconds: float = Field(300.0, alias="LEDGER_CHECKPOINT_INTERVAL_SECONDS")
 
 
 settings = Settings()
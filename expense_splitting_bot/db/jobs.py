@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+import sqlalchemy as sa
+from sqlalchemy import delete, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import aliased
+
+from expense_splitting_bot.db.models import Job
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict[str, Any]], Awaitable[None]]
+
+# Must match the predicate of uq_jobs_dedup_key_queued for ON CONFLICT to pick the index.
+_QUEUED = sa.text("dedup_key IS NOT NULL AND locked_until IS NULL")
+# last_error is kept short; the full traceback goes to the log.
+_MAX_ERROR_LENGTH = 1000
+
+# session.info key: callables to run once the session's transaction has committed
+# (bot.middlewares.DbSessionMiddleware runs them).
+AFTER_COMMIT = "after_commit"
+
+
+@dataclass(frozen=True)
+class JobQueueDepth:
+    kind: str
+    queued: int
+    due: int
+    running: int
+    oldest_due_seconds: float  # how long the oldest due job has waited; 0 when none is due
+
+
+@dataclass(frozen=True)
+class JobQueueStats:
+    enqueued: int
+    deduplicated: int  # enqueues merged into an already queued job with the same dedup key
+    succeeded: int
+    retried: int
+    dropped: int  # gave up after max_attempts
+    avg_wait_ms: float  # run_at -> claimed
+    max_wait_ms: float
+    avg_run_ms: float
+    max_run_ms: float
+
+
+class JobQueue:
+    """
+    Durable background jobs in the jobs table, run by `workers` tasks per process.
+
+    Each worker claims one due job at a time with SELECT ... FOR UPDATE SKIP LOCKED and
+    holds it under a lease (locked_until); any number of processes can share the table,
+    and a job whose worker died is claimed again once the lease expires. Success deletes
+    the row; a failure requeues it with exponential backoff until max_attempts.
+
+    Jobs with a dedup_key collapse: enqueueing while one with the same key is still queued
+    only moves its run_at earlier. A claimed job does not block a queued successor, but two
+    jobs with the same key never run at once.
+    """
+
+    def __init__(
+        self,
+        *,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        workers: int = 4,
+        poll_interval_seconds: float = 1.0,
+        lease_seconds: float = 120.0,
+        max_attempts: int = 5,
+        backoff_base_seconds: float = 1.0,
+        backoff_max_seconds: float = 300.0,
+        metrics_interval_seconds: float = 60.0,
+    ) -> None:
+        self._sessionmaker = sessionmaker
+        self._workers_count = max(1, int(workers))
+        self._poll = poll_interval_seconds
+        self._lease = timedelta(seconds=lease_seconds)
+        self._max_attempts = max(1, int(max_attempts))
+        self._backoff_base = backoff_base_seconds
+        self._backoff_max = backoff_max_seconds
+        self._metrics_interval = metrics_interval_seconds
+
+        self._handlers: dict[str, JobHandler] = {}
+        self._workers: list[asyncio.Task] = []
+        self._metrics: Optional[asyncio.Task] = None
+        self._closing = False
+        # Replaced on every wake-up, so each idle worker sees the one it waited on set.
+        self._wakeup = asyncio.Event()
+        self._due_hints: list[float] = []  # monotonic run_at of jobs enqueued by this process
+
+        self._enqueued = 0
+        self._deduplicated = 0
+        self._succeeded = 0
+        self._retried = 0
+        self._dropped = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._runs = 0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        if kind in self._handlers:
+            raise ValueError(f"Job kind {kind!r} is already registered")
+        self._handlers[kind] = handler
+
+    async def start(self) -> None:
+        self._closing = False
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self._workers_count)]
+        if self._metrics_interval > 0:
+            self._metrics = asyncio.create_task(self._log_depth())
+
+    async def close(self, *, grace_seconds: float = 10.0) -> None:
+        self._closing = True
+        self._wake()
+        if self._metrics is not None:
+            self._metrics.cancel()
+            await asyncio.gather(self._metrics, return_exceptions=True)
+            self._metrics = None
+        if self._workers:
+            # Let running jobs finish; a job cut off here is retried once its lease expires.
+            _, pending = await asyncio.wait(self._workers, timeout=grace_seconds)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
+
+    async def enqueue(
+        self,
+        kind: str,
+        payload: Optional[dict[str, Any]] = None,
+        *,
+        dedup_key: Optional[str] = None,
+        delay_seconds: float = 0.0,
+        session: Optional[AsyncSession] = None,
+    ) -> bool:
+        """
+        Queue a job; returns False when it was merged into a queued job with the same dedup_key.
+
+        With session the row is part of the caller's transaction (committed or rolled back with it),
+        and local workers are only woken once that commits (AFTER_COMMIT).
+        """
+
+        stmt = insert(Job).values(
+            kind=kind,
+            dedup_key=dedup_key,
+            payload=payload or {},
+            run_at=func.now() + timedelta(seconds=max(0.0, delay_seconds)),
+        )
+        if dedup_key is not None:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Job.dedup_key],
+                index_where=_QUEUED,
+                set_={"run_at": func.least(Job.run_at, stmt.excluded.run_at)},
+            )
+        # xmax is 0 for a freshly inserted row and set for one updated by ON CONFLICT.
+        stmt = stmt.returning(sa.literal_column("xmax = 0"))
+        if session is not None:
+            inserted = bool(await session.scalar(stmt))
+        else:
+            async with self._sessionmaker() as own:
+                inserted = bool(await own.scalar(stmt))
+                await own.commit()
+
+        if inserted:
+            self._enqueued += 1
+        else:
+            self._deduplicated += 1
+        if kind in self._handlers:
+            due = time.monotonic() + max(0.0, delay_seconds)
+            if session is None:
+                self._hint(due)
+            else:
+                # A worker woken now would not see the uncommitted row and sleep a full poll.
+                session.info.setdefault(AFTER_COMMIT, []).append(lambda: self._hint(due))
+        return inserted
+
+    async def depth(self) -> list[JobQueueDepth]:
+        queued = Job.locked_until.is_(None)
+        due = sa.and_(queued, Job.run_at <= func.now())
+        async with self._sessionmaker() as session:
+            rows = (
+                await session.execute(
+                    select(
+                        Job.kind,
+                        func.count().filter(queued),
+                        func.count().filter(due),
+                        func.count().filter(~queued),
+                        func.coalesce(func.max(func.extract("epoch", func.now() - Job.run_at)).filter(due), 0),
+                    )
+                    .group_by(Job.kind)
+                    .order_by(Job.kind)
+                )
+            ).all()
+        return [
+            JobQueueDepth(kind=k, queued=int(q), due=int(d), running=int(r), oldest_due_seconds=float(o))
+            for k, q, d, r, o in rows
+        ]
+
+    def stats(self) -> JobQueueStats:
+        return JobQueueStats(
+            enqueued=self._enqueued,
+            deduplicated=self._deduplicated,
+            succeeded=self._succeeded,
+            retried=self._retried,
+            dropped=self._dropped,
+            avg_wait_ms=round(self._wait_total / self._waits * 1000, 1) if self._waits else 0.0,
+            max_wait_ms=round(self._wait_max * 1000, 1),
+            avg_run_ms=round(self._run_total / self._runs * 1000, 1) if self._runs else 0.0,
+            max_run_ms=round(self._run_max * 1000, 1),
+        )
+
+    def _hint(self, due: float) -> None:
+        heapq.heappush(self._due_hints, due)
+        self._wake()
+
+    def _wake(self) -> None:
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    async def _idle(self) -> None:
+        """Sleep until the poll interval passes, a local job falls due, or close()."""
+        deadline = time.monotonic() + self._poll
+        while not self._closing:
+            now = time.monotonic()
+            if self._due_hints and self._due_hints[0] <= now:
+                heapq.heappop(self._due_hints)
+                return
+            until = min(deadline, self._due_hints[0]) if self._due_hints else deadline
+            if until <= now:
+                return
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), until - now)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self) -> Optional[tuple[int, str, dict[str, Any], int, float]]:
+        running = aliased(Job)
+        candidate = (
+            select(Job.id)
+            .where(
+                Job.kind.in_(list(self._handlers)),
+                Job.run_at <= func.now(),
+                or_(Job.locked_until.is_(None), Job.locked_until < func.now()),
+                ~exists().where(
+                    running.dedup_key == Job.dedup_key,
+                    running.id != Job.id,
+                    running.locked_until > func.now(),
+                ),
+            )
+            .order_by(Job.run_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        async with self._sessionmaker() as session:
+            row = (
+                await session.execute(
+                    update(Job)
+                    .where(Job.id.in_(candidate))
+                    .values(locked_until=func.now() + self._lease, attempts=Job.attempts + 1)
+                    .returning(
+                        Job.id,
+                        Job.kind,
+                        Job.payload,
+                        Job.attempts,
+                        func.extract("epoch", func.now() - Job.run_at),
+                    )
+                )
+            ).one_or_none()
+            await session.commit()
+        if row is None:
+            return None
+        job_id, kind, payload, attempts, waited = row
+        return int(job_id), kind, dict(payload or {}), int(attempts), max(0.0, float(waited))
+
+    async def _work(self) -> None:
+        while not self._closing:
+            if not self._handlers:
+                await self._idle()
+                continue
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Job claim failed")
+                await asyncio.sleep(self._poll)
+                continue
+            if job is None:
+                await self._idle()
+                continue
+            try:
+                await self._execute(*job)
+            except Exception:
+                logger.exception("Job bookkeeping failed; job %s is retried after its lease", job[0])
+
+    async def _execute(self, job_id: int, kind: str, payload: dict[str, Any], attempts: int, waited: float) -> None:
+        self._waits += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+        if attempts > self._max_attempts:
+            # Claimed again after lease expiries only: the job keeps killing or hanging its worker.
+            await self._finish(job_id, kind=kind, payload=payload, attempts=attempts, error="lease expired")
+            return
+
+        started = time.monotonic()
+        error: Optional[str] = None
+        try:
+            await self._handlers[kind](payload)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed, attempt %s/%s", job_id, kind, attempts, self._max_attempts)
+            error = f"{type(e).__name__}: {e}"[:_MAX_ERROR_LENGTH]
+        elapsed = time.monotonic() - started
+        self._runs += 1
+        self._run_total += elapsed
+        self._run_max = max(self._run_max, elapsed)
+        await self._finish(job_id, kind=kind, payload=payload, attempts=attempts, error=error)
+
+    async def _finish(
+        self, job_id: int, *, kind: str, payload: dict[str, Any], attempts: int, error: Optional[str]
+    ) -> None:
+        async with self._sessionmaker() as session:
+            if error is None or attempts >= self._max_attempts:
+                await session.execute(delete(Job).where(Job.id == job_id))
+                await session.commit()
+                if error is None:
+                    self._succeeded += 1
+                else:
+                    self._dropped += 1
+                    logger.error("Dropping job %s (%s) after %s attempts: %s", job_id, kind, attempts, error)
+                return
+
+            backoff = min(self._backoff_max, self._backoff_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+            old = (
+                await session.execute(
+                    delete(Job).where(Job.id == job_id).returning(Job.dedup_key, Job.created_at)
+                )
+            ).one_or_none()
+            if old is not None:
+                dedup_key, created_at = old
+                # A job queued meanwhile with the same dedup key already covers this one.
+                stmt = insert(Job).values(
+                    kind=kind,
+                    dedup_key=dedup_key,
+                    payload=payload,
+                    run_at=func.now() + timedelta(seconds=backoff),
+                    attempts=attempts,
+                    last_error=error,
+                    created_at=created_at,
+                )
+                await session.execute(stmt.on_conflict_do_nothing(index_elements=[Job.dedup_key], index_where=_QUEUED))
+            await session.commit()
+        self._retried += 1
+
+    async def _log_depth(self) -> None:
+        while True:
+            await asyncio.sleep(self._metrics_interval)
+            try:
+                depth = await self.depth()
+            except Exception:
+                logger.exception("Job queue depth query failed")
+                continue
+            for d in depth:
+                logger.info(
+                    "Job queue %s: queued=%s due=%s running=%s oldest_due=%.1fs",
+                    d.kind,
+                    d.queued,
+                    d.due,
+                    d.running,
+                    d.oldest_due_seconds,
+                )
@@ -6,6 +6,7 @@ from typing import Optional
 
 import sqlalchemy as sa
 from sqlalchemy import BigInteger, Boolean, DateTime, Enum, ForeignKey, Index, Integer, String, Text, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -28,6 +29,10 @@ class Chat(Base):
     tg_chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     title: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     dashboard_message_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    # sha256 of the dashboard body (without the "Yangilandi" timestamp) last sent to Telegram.
+    dashboard_content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    # Bumped by every write that changes what the ledger views show (see services.ledger.bump_ledger_version).
+    ledger_version: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=sa.text("0"))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=UTC_NOW, nullable=False)
 
     members: Mapped[list[Member]] = relationship(back_populates="chat", cascade="all, delete-orphan")
@@ -71,8 +76,11 @@ class TransactionType(str, enum.Enum):
 class Transaction(Base):
     __tablename__ = "transactions"
     __table_args__ = (
-        Index("ix_transactions_chat_id", "chat_id"),
+        # Both lead with chat_id, which is all a whole-chat scan needs (no separate chat_id index).
         Index("ix_transactions_chat_created_at", "chat_id", "created_at"),
+        # "Paid by member X" lookups, the payer side of a ledger replay, and the ON DELETE
+        # RESTRICT check when a member row goes.
+        Index("ix_transactions_chat_paid_by", "chat_id", "paid_by_member_id"),
     )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
@@ -112,21 +120,137 @@ class Transaction(Base):
 class TransactionParticipant(Base):
     __tablename__ = "transaction_participants"
     __table_args__ = (
-        UniqueConstraint("transaction_id", "member_id", name="uq_tx_participant"),
-        Index("ix_tx_participants_tx_id", "transaction_id"),
+        # "Transactions involving member X", and the ON DELETE CASCADE from members.
+        Index("ix_tx_participants_member_tx", "member_id", "transaction_id"),
     )
 
-    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    # The (transaction_id, member_id) primary key also serves lookups by transaction_id.
     transaction_id: Mapped[int] = mapped_column(
         BigInteger,
         ForeignKey("transactions.id", ondelete="CASCADE"),
-        nullable=False,
+        primary_key=True,
     )
     member_id: Mapped[int] = mapped_column(
         BigInteger,
         ForeignKey("members.id", ondelete="CASCADE"),
-        nullable=False,
+        primary_key=True,
     )
+    # Copy of transactions.chat_id: the shared partition key when the tables are partitioned (migration 0012).
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
 
     transaction: Mapped[Transaction] = relationship(back_populates="participants")
     member: Mapped[Member] = relationship()
+
+
+class MemberBalance(Base):
+    """Running per-member balance, maintained by create_transaction in the same DB transaction."""
+
+    __tablename__ = "member_balances"
+    __table_args__ = (Index("ix_member_balances_chat_id", "chat_id"),)
+
+    member_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("members.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    chat_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("chats.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    # Same sign as BalanceEntry: positive owes, negative is owed (thousands of UZS).
+    balance_k: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=sa.text("0"))
+
+
+class LedgerCheckpoint(Base):
+    """Snapshot of a chat's ledger folded up to a transactions.id high-water mark."""
+
+    __tablename__ = "ledger_checkpoints"
+    __table_args__ = (Index("ix_ledger_checkpoints_chat_upto", "chat_id", "upto_transaction_id"),)
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    chat_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("chats.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    # Every transaction of the chat with id <= upto_transaction_id is included.
+    upto_transaction_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    room_total_k: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default=sa.text("0"))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=UTC_NOW, nullable=False)
+
+    entries: Mapped[list[LedgerCheckpointEntry]] = relationship(
+        back_populates="checkpoint",
+        cascade="all, delete-orphan",
+    )
+
+
+class LedgerCheckpointEntry(Base):
+    __tablename__ = "ledger_checkpoint_entries"
+
+    checkpoint_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("ledger_checkpoints.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    member_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("members.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    balance_k: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    room_share_k: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    checkpoint: Mapped[LedgerCheckpoint] = relationship(back_populates="entries")
+
+
+class FsmRecord(Base):
+    """aiogram FSM state/data for one storage key (see bot.fsm_storage.PgFsmStorage)."""
+
+    __tablename__ = "fsm_records"
+    __table_args__ = (Index("ix_fsm_records_expires_at", "expires_at"),)
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    data: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default=sa.text("'{}'::jsonb"))
+    # Abandoned wizards stop being visible after this and are purged later.
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class ScheduledDeletion(Base):
+    """A temporary bot message to delete at due_at (see bot.deletion_scheduler)."""
+
+    __tablename__ = "scheduled_deletions"
+    __table_args__ = (Index("ix_scheduled_deletions_due_at", "due_at"),)
+
+    tg_chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    message_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    due_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class Job(Base):
+    """A unit of background work (see db.jobs.JobQueue)."""
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_run_at", "run_at"),
+        # At most one queued (not yet claimed) job per dedup key; a claimed one may have a queued successor.
+        Index(
+            "uq_jobs_dedup_key_queued",
+            "dedup_key",
+            unique=True,
+            postgresql_where=sa.text("dedup_key IS NOT NULL AND locked_until IS NULL"),
+        ),
+        Index("ix_jobs_dedup_key_locked", "dedup_key", postgresql_where=sa.text("locked_until IS NOT NULL")),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(64), nullable=False)
+    dedup_key: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default=sa.text("'{}'::jsonb"))
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=sa.func.now(), nullable=False)
+    # Set while a worker runs the job; an expired lease makes it claimable again.
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default=sa.text("0"))
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=sa.func.now(), nullable=False)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+class PgNotifyListener:
+    """
+    Keeps one LISTEN connection on a channel open and passes every payload to on_notify.
+
+    The connection is replaced when it drops; on_reconnect then runs, because
+    notifications sent while disconnected are lost.
+    """
+
+    _HEALTH_CHECK_SECONDS = 30.0
+
+    def __init__(
+        self,
+        *,
+        engine: AsyncEngine,
+        channel: str,
+        on_notify: Callable[[str], None],
+        on_reconnect: Optional[Callable[[], None]] = None,
+        reconnect_seconds: float = 1.0,
+    ) -> None:
+        self._engine = engine
+        self._channel = channel
+        self._on_notify = on_notify
+        self._on_reconnect = on_reconnect
+        self._reconnect = reconnect_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    async def start(self) -> None:
+        """Start listening; returns once the first LISTEN is in place."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen_forever())
+        await self._ready.wait()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._ready.clear()
+
+    def _handle(self, _conn: Any, _pid: int, _channel: str, payload: str) -> None:
+        try:
+            self._on_notify(payload)
+        except Exception:
+            logger.exception("Notification handler failed on %r", self._channel)
+
+    async def _listen_forever(self) -> None:
+        first = True
+        while True:
+            conn: Optional[AsyncConnection] = None
+            try:
+                conn = await self._engine.connect()
+                raw = (await conn.get_raw_connection()).driver_connection
+                lost = asyncio.Event()
+                raw.add_termination_listener(lambda _c: lost.set())
+                await raw.add_listener(self._channel, self._handle)
+                logger.info("Listening for notifications on %r", self._channel)
+                if not first and self._on_reconnect is not None:
+                    self._on_reconnect()
+                first = False
+                self._ready.set()
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=self._HEALTH_CHECK_SECONDS)
+                    except asyncio.TimeoutError:
+                        # A silently dropped TCP connection never fires the termination listener.
+                        await raw.execute("SELECT 1")
+                logger.warning("Notification connection for %r lost; reconnecting", self._channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("LISTEN on %r failed; retrying in %ss", self._channel, self._reconnect)
+            finally:
+                if conn is not None:
+                    # Never hand a LISTENing (or dead) connection back to the pool.
+                    try:
+                        await conn.invalidate()
+                    except Exception:
+                        pass
+            await asyncio.sleep(self._reconnect)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import select
+
+from expense_splitting_bot.config import settings
+from expense_splitting_bot.db.jobs import JobQueue
+from expense_splitting_bot.db.models import Chat
+from expense_splitting_bot.db.session import SessionMaker, engine
+from expense_splitting_bot.logging import configure_logging
+from expense_splitting_bot.services.checkpoints import write_checkpoint
+from expense_splitting_bot.services.ledger import compute_balances, rebuild_member_balances, replay_ledger
+
+logger = logging.getLogger(__name__)
+
+
+async def _chat_ids(tg_chat_id: Optional[int]) -> list[int]:
+    async with SessionMaker() as session:
+        stmt = select(Chat.id).order_by(Chat.id.asc())
+        if tg_chat_id is not None:
+            stmt = stmt.where(Chat.tg_chat_id == tg_chat_id)
+        return [int(x) for x in (await session.scalars(stmt)).all()]
+
+
+async def rebuild_balances(tg_chat_id: Optional[int], *, from_checkpoint: bool) -> None:
+    chat_ids = await _chat_ids(tg_chat_id)
+    for chat_id in chat_ids:
+        # One DB transaction per chat keeps row locks short.
+        async with SessionMaker() as session:
+            n = await rebuild_member_balances(session, chat_id=chat_id, from_checkpoint=from_checkpoint)
+            await session.commit()
+        logger.info("Rebuilt member_balances for chat_id=%s (%s members)", chat_id, n)
+    logger.info("Done: %s chat(s)", len(chat_ids))
+
+
+async def checkpoint(tg_chat_id: Optional[int], *, min_delta: int) -> None:
+    chat_ids = await _chat_ids(tg_chat_id)
+    written = 0
+    for chat_id in chat_ids:
+        async with SessionMaker() as session:
+            cp = await write_checkpoint(session, chat_id=chat_id, min_delta=min_delta)
+            await session.commit()
+        if cp is not None:
+            written += 1
+            logger.info("Checkpoint chat_id=%s upto_transaction_id=%s", chat_id, cp.upto_transaction_id)
+    logger.info("Done: %s checkpoint(s) for %s chat(s)", written, len(chat_ids))
+
+
+async def verify_balances(tg_chat_id: Optional[int]) -> bool:
+    # Cross-checks member_balances against both replay paths (SQL window functions and Python).
+    chat_ids = await _chat_ids(tg_chat_id)
+    mismatched = 0
+    for chat_id in chat_ids:
+        async with SessionMaker() as session:
+            stored = {e.member_id: e.balance_k for e in await compute_balances(session, chat_id=chat_id)}
+            sql = await replay_ledger(session, chat_id=chat_id, use_checkpoint=False, server_side=True)
+            py = await replay_ledger(session, chat_id=chat_id, use_checkpoint=False, server_side=False)
+        ok = (
+            stored == sql.balances == py.balances
+            and dict(sql.room_shares) == dict(py.room_shares)
+            and sql.room_total_k == py.room_total_k
+        )
+        if not ok:
+            mismatched += 1
+            logger.error("Ledger mismatch for chat_id=%s", chat_id)
+    logger.info("Verified %s chat(s), %s mismatched", len(chat_ids), mismatched)
+    return mismatched == 0
+
+
+async def job_depth() -> None:
+    depth = await JobQueue(sessionmaker=SessionMaker).depth()
+    for d in depth:
+        logger.info(
+            "%s: queued=%s due=%s running=%s oldest_due=%.1fs", d.kind, d.queued, d.due, d.running, d.oldest_due_seconds
+        )
+    logger.info("Done: %s job kind(s)", len(depth))
+
+
+def _parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m expense_splitting_bot.maintenance")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    rb = sub.add_parser("rebuild-balances", help="Regenerate member_balances from the raw ledger.")
+    rb.add_argument("--tg-chat-id", type=int, default=None, help="Only this Telegram chat (default: all chats).")
+    rb.add_argument(
+        "--from-checkpoint",
+        action="store_true",
+        help="Start from the newest ledger checkpoint instead of replaying every transaction.",
+    )
+
+    cp = sub.add_parser("checkpoint", help="Write ledger checkpoints now.")
+    cp.add_argument("--tg-chat-id", type=int, default=None, help="Only this Telegram chat (default: all chats).")
+    cp.add_argument("--min-delta", type=int, default=1, help="Skip chats with fewer new transactions (default: 1).")
+
+    vb = sub.add_parser("verify-balances", help="Compare member_balances with SQL and Python ledger replays.")
+    vb.add_argument("--tg-chat-id", type=int, default=None, help="Only this Telegram chat (default: all chats).")
+
+    sub.add_parser("jobs", help="Show job queue depth and the oldest due job per kind.")
+    return p
+
+
+async def main(argv: Optional[list[str]] = None) -> int:
+    configure_logging(settings.log_level)
+    args = _parser().parse_args(argv)
+    try:
+        if args.command == "rebuild-balances":
+            await rebuild_balances(args.tg_chat_id, from_checkpoint=args.from_checkpoint)
+        elif args.command == "checkpoint":
+            await checkpoint(args.tg_chat_id, min_delta=args.min_delta)
+        elif args.command == "verify-balances":
+            return 0 if await verify_balances(args.tg_chat_id) else 1
+        elif args.command == "jobs":
+            await job_depth()
+        return 0
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from expense_splitting_bot.db.jobs import JobQueue
+from expense_splitting_bot.db.models import LedgerCheckpoint, LedgerCheckpointEntry, Transaction
+from expense_splitting_bot.services.ledger import load_latest_checkpoint, replay_ledger, settled_high_water_mark
+
+logger = logging.getLogger(__name__)
+
+# Older checkpoints kept per chat besides the newest one.
+KEEP_PREVIOUS_CHECKPOINTS = 1
+
+CHECKPOINT_JOB = "ledger_checkpoint"
+
+
+async def chats_due_for_checkpoint(session: AsyncSession, *, min_delta: int) -> list[int]:
+    latest = (
+        select(LedgerCheckpoint.chat_id, func.max(LedgerCheckpoint.upto_transaction_id).label("upto"))
+        .group_by(LedgerCheckpoint.chat_id)
+        .subquery()
+    )
+    rows = await session.scalars(
+        select(Transaction.chat_id)
+        .outerjoin(latest, latest.c.chat_id == Transaction.chat_id)
+        .where(Transaction.id > func.coalesce(latest.c.upto, 0))
+        .group_by(Transaction.chat_id)
+        .having(func.count() >= min_delta)
+    )
+    return [int(x) for x in rows.all()]
+
+
+async def write_checkpoint(session: AsyncSession, *, chat_id: int, min_delta: int = 1) -> Optional[LedgerCheckpoint]:
+    """
+    Fold the settled delta after the newest checkpoint into a new one.
+
+    Returns None when fewer than min_delta settled transactions accumulated, or when a
+    writer in the chat is still open (see settled_high_water_mark).
+    """
+
+    cp = await load_latest_checkpoint(session, chat_id=chat_id)
+    after_id = cp.upto_transaction_id if cp else 0
+    hwm = await settled_high_water_mark(session, chat_id=chat_id)
+    if hwm is None or hwm <= after_id:
+        return None
+    count = await session.scalar(
+        select(func.count()).where(
+            Transaction.chat_id == chat_id,
+            Transaction.id > after_id,
+            Transaction.id <= hwm,
+        )
+    )
+    if not count or count < min_delta:
+        return None
+
+    state = await replay_ledger(session, chat_id=chat_id, upto_transaction_id=int(hwm))
+    new_cp = LedgerCheckpoint(
+        chat_id=chat_id,
+        upto_transaction_id=state.upto_transaction_id,
+        room_total_k=state.room_total_k,
+    )
+    session.add(new_cp)
+    await session.flush()
+
+    member_ids = set(state.balances) | set(state.room_shares)
+    session.add_all(
+        [
+            LedgerCheckpointEntry(
+                checkpoint_id=new_cp.id,
+                member_id=mid,
+                balance_k=state.balances.get(mid, 0),
+                room_share_k=state.room_shares.get(mid, 0),
+            )
+            for mid in sorted(member_ids)
+        ]
+    )
+    await session.flush()
+
+    stale = (
+        await session.scalars(
+            select(LedgerCheckpoint.id)
+            .where(LedgerCheckpoint.chat_id == chat_id, LedgerCheckpoint.id != new_cp.id)
+            .order_by(LedgerCheckpoint.upto_transaction_id.desc(), LedgerCheckpoint.id.desc())
+            .offset(KEEP_PREVIOUS_CHECKPOINTS)
+        )
+    ).all()
+    if stale:
+        await session.execute(delete(LedgerCheckpoint).where(LedgerCheckpoint.id.in_(stale)))
+    return new_cp
+
+
+class LedgerCompactor:
+    """
+    Background task that checkpoints every chat whose delta passed min_delta.
+
+    With a job queue the periodic pass only enqueues one job per due chat, and whichever
+    process claims it writes the checkpoint; start() is then needed in one process only.
+    """
+
+    def __init__(
+        self,
+        *,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        min_delta: int,
+        interval_seconds: float,
+        job_queue: Optional[JobQueue] = None,
+    ) -> None:
+        self._sessionmaker = sessionmaker
+        self._min_delta = max(1, int(min_delta))
+        self._interval = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._job_queue = job_queue
+        if job_queue is not None:
+            job_queue.register(CHECKPOINT_JOB, self._run_job)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> int:
+        """Checkpoint (or, with a job queue, enqueue) every due chat; returns how many."""
+        async with self._sessionmaker() as session:
+            chat_ids = await chats_due_for_checkpoint(session, min_delta=self._min_delta)
+
+        if self._job_queue is not None:
+            for chat_id in chat_ids:
+                await self._job_queue.enqueue(CHECKPOINT_JOB, {"chat_id": chat_id}, dedup_key=f"checkpoint:{chat_id}")
+            return len(chat_ids)
+
+        written = 0
+        for chat_id in chat_ids:
+            if await self._checkpoint(chat_id):
+                written += 1
+        return written
+
+    async def _checkpoint(self, chat_id: int) -> bool:
+        async with self._sessionmaker() as session:
+            cp = await write_checkpoint(session, chat_id=chat_id, min_delta=self._min_delta)
+            await session.commit()
+        if cp is None:
+            return False
+        logger.info("Ledger checkpoint chat_id=%s upto_transaction_id=%s", chat_id, cp.upto_transaction_id)
+        return True
+
+    async def _run_job(self, payload: dict) -> None:
+        await self._checkpoint(int(payload["chat_id"]))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ledger compactor pass failed")
+            await asyncio.sleep(self._interval)
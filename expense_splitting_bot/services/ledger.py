@@ -2,11 +2,22 @@ from __future__ import annotations
 
 from collections import defaultdict
 from dataclasses import dataclass
+from typing import Optional
 
-from sqlalchemy import func, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import BigInteger, and_, case, cast, func, literal, null, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
-from expense_splitting_bot.db.models import Member, Transaction, TransactionParticipant, TransactionType
+from expense_splitting_bot.db.models import (
+    Chat,
+    LedgerCheckpoint,
+    LedgerCheckpointEntry,
+    Member,
+    MemberBalance,
+    Transaction,
+    TransactionParticipant,
+    TransactionType,
+)
 
 
 @dataclass(frozen=True)
@@ -28,36 +39,332 @@ class RoomBreakdownEntry:
     total_share_k: int
 
 
+@dataclass(frozen=True)
+class LedgerSummary:
+    members: list[Member]  # ordered by tg_user_id
+    residents: list[Member]
+    room_total_k: int
+    room_breakdown: list[RoomBreakdownEntry]
+    balances: list[BalanceEntry]
+    transfers: list[Transfer]
+
+    @property
+    def members_by_id(self) -> dict[int, Member]:
+        return {m.id: m for m in self.members}
+
+
 async def compute_room_total_k(session: AsyncSession, *, chat_id: int) -> int:
+    cp = await load_latest_checkpoint(session, chat_id=chat_id)
     total = await session.scalar(
         select(func.coalesce(func.sum(Transaction.amount_k), 0)).where(
             Transaction.chat_id == chat_id,
             Transaction.type == TransactionType.ROOM,
+            Transaction.id > (cp.upto_transaction_id if cp else 0),
         )
     )
-    return int(total or 0)
+    return int(total or 0) + (int(cp.room_total_k) if cp else 0)
+
+
+def split_amount_k(amount_k: int, n: int) -> list[int]:
+    # Integer split: amount_k // n each, +1k to the first (amount_k % n) participants.
+    # Callers must pass participants ordered by tg_user_id.
+    share = amount_k // n
+    rem = amount_k % n
+    return [share + (1 if i < rem else 0) for i in range(n)]
+
+
+def _sorted_entries(balances: dict[int, int]) -> list[BalanceEntry]:
+    entries = [BalanceEntry(member_id=mid, balance_k=bal) for (mid, bal) in balances.items()]
+    # positive first (owes most), then negative (is owed most), then zeros.
+    entries.sort(key=lambda e: (0, -e.balance_k) if e.balance_k > 0 else (1, e.balance_k) if e.balance_k < 0 else (2, 0))
+    return entries
 
 
 async def compute_balances(session: AsyncSession, *, chat_id: int) -> list[BalanceEntry]:
+    # O(members): reads the running totals maintained by create_transaction.
+    rows = (
+        await session.execute(
+            select(Member.id, func.coalesce(MemberBalance.balance_k, 0))
+            .outerjoin(MemberBalance, MemberBalance.member_id == Member.id)
+            .where(Member.chat_id == chat_id)
+        )
+    ).all()
+    return _sorted_entries({int(mid): int(bal) for mid, bal in rows})
+
+
+# session.info key: chats whose ledger_version this session bumped but may not have committed yet.
+BUMPED_LEDGER_CHATS = "bumped_ledger_chats"
+
+# First key of the two-key advisory lock form for per-chat ledger write locks (the
+# dashboard uses its own namespace, see bot.dashboard_sync).
+LEDGER_LOCK_NAMESPACE = 0x4C47  # "LG"
+
+
+async def bump_ledger_version(session: AsyncSession, *, chat_id: int) -> None:
+    # Invalidates cached ledger views of this chat (keyed by (chat_id, ledger_version)).
+    await session.execute(update(Chat).where(Chat.id == chat_id).values(ledger_version=Chat.ledger_version + 1))
+    session.info.setdefault(BUMPED_LEDGER_CHATS, set()).add(chat_id)
+
+
+def _ledger_lock_key(chat_id: int) -> tuple:
+    return LEDGER_LOCK_NAMESPACE, func.hashtext(str(chat_id))
+
+
+async def lock_ledger_for_write(session: AsyncSession, *, chat_id: int) -> None:
+    """
+    Shared advisory lock on the chat's ledger until the session's transaction ends.
+
+    Taken before a transactions row gets its id, so settled_high_water_mark can tell whether
+    every id already handed out in this chat has committed or rolled back.
+    """
+
+    if _is_postgres(session):
+        await session.execute(select(func.pg_advisory_xact_lock_shared(*_ledger_lock_key(chat_id))))
+
+
+async def settled_high_water_mark(session: AsyncSession, *, chat_id: int) -> Optional[int]:
+    """
+    Highest transactions.id of the chat such that every lower id is committed or gone.
+
+    Ids are assigned at INSERT, so an open DB transaction can still commit an id below the
+    newest visible one. The read runs in a short transaction of its own under the exclusive
+    lock, so ids handed out afterwards are all higher. The lock is only tried: while a writer
+    holding lock_ledger_for_write is still open this returns None and the chat is skipped
+    until the next pass (waiting would queue every new writer of the chat behind us).
+    """
+
+    stmt = select(func.max(Transaction.id)).where(Transaction.chat_id == chat_id)
+    if not _is_postgres(session):
+        return await session.scalar(stmt)
+    bind = session.bind
+    engine = bind if isinstance(bind, AsyncEngine) else bind.engine
+    async with engine.begin() as conn:
+        if not await conn.scalar(select(func.pg_try_advisory_xact_lock(*_ledger_lock_key(chat_id)))):
+            return None
+        return await conn.scalar(stmt)
+
+
+async def apply_balance_deltas(session: AsyncSession, *, chat_id: int, deltas: dict[int, int]) -> None:
+    # Sorted by member_id so concurrent writers lock member_balances rows in the same order.
+    values = [
+        {"member_id": mid, "chat_id": chat_id, "balance_k": delta}
+        for mid, delta in sorted(deltas.items())
+        if delta
+    ]
+    if not values:
+        return
+    insert_stmt = insert(MemberBalance).values(values)
+    stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[MemberBalance.member_id],
+        set_={"balance_k": MemberBalance.balance_k + insert_stmt.excluded.balance_k},
+    )
+    await session.execute(stmt)
+
+
+@dataclass
+class LedgerState:
+    # Ledger folded up to (and including) upto_transaction_id.
+    upto_transaction_id: int
+    balances: dict[int, int]
+    room_shares: dict[int, int]
+    room_total_k: int
+
+
+async def load_latest_checkpoint(session: AsyncSession, *, chat_id: int) -> Optional[LedgerCheckpoint]:
+    return await session.scalar(
+        select(LedgerCheckpoint)
+        .where(LedgerCheckpoint.chat_id == chat_id)
+        .order_by(LedgerCheckpoint.upto_transaction_id.desc(), LedgerCheckpoint.id.desc())
+        .limit(1)
+    )
+
+
+async def _load_checkpoint_into(
+    session: AsyncSession,
+    state: LedgerState,
+    *,
+    chat_id: int,
+    upto_transaction_id: Optional[int] = None,
+) -> None:
+    # Newest usable checkpoint header + entries in a single round trip.
+    cp_filter = [LedgerCheckpoint.chat_id == chat_id]
+    if upto_transaction_id is not None:
+        cp_filter.append(LedgerCheckpoint.upto_transaction_id <= upto_transaction_id)
+    latest = (
+        select(LedgerCheckpoint.id, LedgerCheckpoint.upto_transaction_id, LedgerCheckpoint.room_total_k)
+        .where(*cp_filter)
+        .order_by(LedgerCheckpoint.upto_transaction_id.desc(), LedgerCheckpoint.id.desc())
+        .limit(1)
+        .subquery()
+    )
+    rows = (
+        await session.execute(
+            select(
+                latest.c.upto_transaction_id,
+                latest.c.room_total_k,
+                LedgerCheckpointEntry.member_id,
+                LedgerCheckpointEntry.balance_k,
+                LedgerCheckpointEntry.room_share_k,
+            ).outerjoin(LedgerCheckpointEntry, LedgerCheckpointEntry.checkpoint_id == latest.c.id)
+        )
+    ).all()
+    for upto, room_total_k, mid, bal, room_share in rows:
+        state.upto_transaction_id = int(upto)
+        state.room_total_k = int(room_total_k)
+        if mid is None:
+            continue
+        state.balances[int(mid)] = int(bal)
+        if room_share:
+            state.room_shares[int(mid)] = int(room_share)
+
+
+async def replay_ledger(
+    session: AsyncSession,
+    *,
+    chat_id: int,
+    use_checkpoint: bool = True,
+    upto_transaction_id: Optional[int] = None,
+    server_side: Optional[bool] = None,
+) -> LedgerState:
+    """
+    Fold the chat's ledger: start from the newest checkpoint (if any) and replay only the
+    transactions after its high-water mark. use_checkpoint=False replays the raw ledger.
+
+    On PostgreSQL the delta is aggregated server-side (O(members) rows over the wire);
+    other backends, or server_side=False, use the Python split.
+    """
+
     member_ids = (
         await session.scalars(select(Member.id).where(Member.chat_id == chat_id))
     ).all()
-    balances: dict[int, int] = {int(mid): 0 for mid in member_ids}
+    state = LedgerState(
+        upto_transaction_id=0,
+        balances={int(mid): 0 for mid in member_ids},
+        room_shares=defaultdict(int),
+        room_total_k=0,
+    )
+
+    if use_checkpoint:
+        await _load_checkpoint_into(session, state, chat_id=chat_id, upto_transaction_id=upto_transaction_id)
+
+    tx_filter = [Transaction.chat_id == chat_id, Transaction.id > state.upto_transaction_id]
+    if upto_transaction_id is not None:
+        tx_filter.append(Transaction.id <= upto_transaction_id)
+
+    if server_side is None:
+        server_side = _is_postgres(session)
+    aggregate = _aggregate_delta_sql if server_side else _aggregate_delta_python
+    deltas, max_tx_id = await aggregate(session, tx_filter)
+    if max_tx_id is None:
+        return state
+
+    for d in deltas:
+        state.balances[d.member_id] = state.balances.get(d.member_id, 0) + d.balance_k
+        if d.room_share_k:
+            state.room_shares[d.member_id] += d.room_share_k
+        state.room_total_k += d.room_paid_k
+    state.upto_transaction_id = max_tx_id
+    return state
+
 
+def _is_postgres(session: AsyncSession) -> bool:
+    return session.get_bind().dialect.name == "postgresql"
+
+
+@dataclass(frozen=True)
+class _MemberDelta:
+    member_id: int
+    balance_k: int
+    room_share_k: int
+    room_paid_k: int  # ROOM amounts this member paid; their sum is the ROOM total.
+
+
+# Joining on chat_id as well lets the planner carry the tx_filter chat_id over to the
+# participants, so both sides are pruned to one partition when the tables are partitioned.
+_PARTICIPANT_JOIN = and_(
+    Transaction.chat_id == TransactionParticipant.chat_id,
+    Transaction.id == TransactionParticipant.transaction_id,
+)
+
+
+async def _aggregate_delta_sql(session: AsyncSession, tx_filter: list) -> tuple[list[_MemberDelta], Optional[int]]:
+    # One statement, one row per member: the split is done with window functions over each
+    # transaction's participants ordered by tg_user_id (same rule as split_amount_k).
+    parts = (
+        select(
+            TransactionParticipant.member_id.label("member_id"),
+            Transaction.type.label("type"),
+            Transaction.amount_k.label("amount_k"),
+            (
+                func.row_number().over(
+                    partition_by=TransactionParticipant.transaction_id,
+                    order_by=Member.tg_user_id.asc(),
+                )
+                - 1
+            ).label("idx"),
+            func.count().over(partition_by=TransactionParticipant.transaction_id).label("n"),
+        )
+        # Scoping members to the chat lets the planner start from them and walk ix_tx_participants_member_tx.
+        .join(Member, and_(Member.id == TransactionParticipant.member_id, Member.chat_id == TransactionParticipant.chat_id))
+        .join(Transaction, _PARTICIPANT_JOIN)
+        .where(*tx_filter)
+        .subquery()
+    )
+    share = parts.c.amount_k // parts.c.n + case((parts.c.idx < parts.c.amount_k % parts.c.n, 1), else_=0)
+    owed = select(
+        parts.c.member_id,
+        share.label("balance_k"),
+        case((parts.c.type == TransactionType.ROOM, share), else_=0).label("room_share_k"),
+        literal(0).label("room_paid_k"),
+        cast(null(), BigInteger).label("tx_id"),
+    )
+    paid = select(
+        Transaction.paid_by_member_id,
+        -Transaction.amount_k,
+        literal(0),
+        case((Transaction.type == TransactionType.ROOM, Transaction.amount_k), else_=0),
+        Transaction.id,
+    ).where(*tx_filter)
+    u = union_all(owed, paid).subquery()
+
+    rows = (
+        await session.execute(
+            select(
+                u.c.member_id,
+                func.sum(u.c.balance_k),
+                func.sum(u.c.room_share_k),
+                func.sum(u.c.room_paid_k),
+                func.max(u.c.tx_id),
+            ).group_by(u.c.member_id)
+        )
+    ).all()
+
+    deltas = [
+        _MemberDelta(member_id=int(mid), balance_k=int(bal), room_share_k=int(room_share), room_paid_k=int(room_paid))
+        for mid, bal, room_share, room_paid, _max_tx_id in rows
+    ]
+    max_ids = [int(x) for *_rest, x in rows if x is not None]
+    return deltas, (max(max_ids) if max_ids else None)
+
+
+async def _aggregate_delta_python(session: AsyncSession, tx_filter: list) -> tuple[list[_MemberDelta], Optional[int]]:
+    # Portable fallback for non-Postgres backends: pulls participant rows and splits in Python.
     tx_rows = (
         await session.execute(
-            select(Transaction.id, Transaction.type, Transaction.amount_k, Transaction.paid_by_member_id).where(
-                Transaction.chat_id == chat_id
-            )
+            select(Transaction.id, Transaction.type, Transaction.amount_k, Transaction.paid_by_member_id)
+            .where(*tx_filter)
+            .order_by(Transaction.id.asc())
         )
     ).all()
+    if not tx_rows:
+        return [], None
 
     participant_rows = (
         await session.execute(
             select(TransactionParticipant.transaction_id, TransactionParticipant.member_id, Member.tg_user_id)
-            .join(Member, Member.id == TransactionParticipant.member_id)
-            .join(Transaction, Transaction.id == TransactionParticipant.transaction_id)
-            .where(Transaction.chat_id == chat_id)
+            .join(Member, and_(Member.id == TransactionParticipant.member_id, Member.chat_id == TransactionParticipant.chat_id))
+            .join(Transaction, _PARTICIPANT_JOIN)
+            .where(*tx_filter)
             .order_by(TransactionParticipant.transaction_id.asc(), Member.tg_user_id.asc())
         )
     ).all()
@@ -66,26 +373,63 @@ async def compute_balances(session: AsyncSession, *, chat_id: int) -> list[Balan
     for tx_id, member_id, _tg_user_id in participant_rows:
         participants_by_tx[int(tx_id)].append(int(member_id))
 
-    for tx_id, _type, amount_k, paid_by_member_id in tx_rows:
-        tx_id_i = int(tx_id)
+    balances: dict[int, int] = defaultdict(int)
+    room_shares: dict[int, int] = defaultdict(int)
+    room_paid: dict[int, int] = defaultdict(int)
+    for tx_id, type_, amount_k, paid_by_member_id in tx_rows:
         amt = int(amount_k)
         payer = int(paid_by_member_id)
-        if payer in balances:
-            balances[payer] -= amt
+        is_room = type_ == TransactionType.ROOM
+        balances[payer] -= amt
+        if is_room:
+            room_paid[payer] += amt
 
-        parts = participants_by_tx.get(tx_id_i, [])
+        parts = participants_by_tx.get(int(tx_id), [])
         if not parts:
             continue
-        n = len(parts)
-        share = amt // n
-        rem = amt % n
-        for i, mid in enumerate(parts):
-            balances[mid] += share + (1 if i < rem else 0)
+        for mid, share in zip(parts, split_amount_k(amt, len(parts))):
+            balances[mid] += share
+            if is_room:
+                room_shares[mid] += share
 
-    entries = [BalanceEntry(member_id=mid, balance_k=bal) for (mid, bal) in balances.items()]
-    # positive first (owes most), then negative (is owed most), then zeros.
-    entries.sort(key=lambda e: (0, -e.balance_k) if e.balance_k > 0 else (1, e.balance_k) if e.balance_k < 0 else (2, 0))
-    return entries
+    deltas = [
+        _MemberDelta(member_id=mid, balance_k=bal, room_share_k=room_shares.get(mid, 0), room_paid_k=room_paid.get(mid, 0))
+        for mid, bal in balances.items()
+    ]
+    return deltas, int(tx_rows[-1][0])
+
+
+async def rebuild_member_balances(session: AsyncSession, *, chat_id: int, from_checkpoint: bool = False) -> int:
+    """
+    Regenerate member_balances for one chat from the raw ledger, or from the newest
+    checkpoint plus the delta after it when from_checkpoint is set.
+
+    Every member row is created and locked first, so concurrent create_transaction
+    calls either finish before the replay sees them or apply their delta after commit.
+    The chat's ledger_version is bumped so cached views drop the old balances.
+    Returns the number of members written.
+    """
+
+    await session.execute(
+        insert(MemberBalance)
+        .from_select(
+            ["member_id", "chat_id"],
+            select(Member.id, Member.chat_id).where(Member.chat_id == chat_id),
+        )
+        .on_conflict_do_nothing(index_elements=[MemberBalance.member_id])
+    )
+    await session.execute(
+        select(MemberBalance.member_id).where(MemberBalance.chat_id == chat_id).with_for_update()
+    )
+
+    balances = (await replay_ledger(session, chat_id=chat_id, use_checkpoint=from_checkpoint)).balances
+    if balances:
+        await session.execute(
+            update(MemberBalance),
+            [{"member_id": mid, "balance_k": bal} for mid, bal in sorted(balances.items())],
+        )
+    await bump_ledger_version(session, chat_id=chat_id)
+    return len(balances)
 
 
 def compute_settlement(entries: list[BalanceEntry]) -> list[Transfer]:
@@ -121,44 +465,54 @@ def compute_settlement(entries: list[BalanceEntry]) -> list[Transfer]:
     return out
 
 
+def _room_breakdown(room_shares: dict[int, int]) -> list[RoomBreakdownEntry]:
+    out = [RoomBreakdownEntry(member_id=mid, total_share_k=tot) for mid, tot in room_shares.items() if tot]
+    out.sort(key=lambda e: (-e.total_share_k, e.member_id))
+    return out
+
+
 async def compute_room_breakdown(session: AsyncSession, *, chat_id: int) -> list[RoomBreakdownEntry]:
     # Computes how much each participant was assigned in ROOM transactions (sum of shares).
-    tx_rows = (
-        await session.execute(
-            select(Transaction.id, Transaction.amount_k).where(
-                Transaction.chat_id == chat_id,
-                Transaction.type == TransactionType.ROOM,
-            )
-        )
-    ).all()
+    state = await replay_ledger(session, chat_id=chat_id)
+    return _room_breakdown(state.room_shares)
 
-    participant_rows = (
+
+async def compute_ledger_summary(session: AsyncSession, *, chat_id: int) -> LedgerSummary:
+    """
+    Everything the dashboard and /report show, in three round trips: members joined with
+    member_balances, the newest checkpoint, and one aggregated scan of the ROOM delta.
+    """
+
+    rows = (
         await session.execute(
-            select(TransactionParticipant.transaction_id, TransactionParticipant.member_id, Member.tg_user_id)
-            .join(Member, Member.id == TransactionParticipant.member_id)
-            .join(Transaction, Transaction.id == TransactionParticipant.transaction_id)
-            .where(Transaction.chat_id == chat_id, Transaction.type == TransactionType.ROOM)
-            .order_by(TransactionParticipant.transaction_id.asc(), Member.tg_user_id.asc())
+            select(Member, func.coalesce(MemberBalance.balance_k, 0))
+            .outerjoin(MemberBalance, MemberBalance.member_id == Member.id)
+            .where(Member.chat_id == chat_id)
+            .order_by(Member.tg_user_id.asc())
         )
     ).all()
+    members = [m for m, _bal in rows]
+    balances = _sorted_entries({m.id: int(bal) for m, bal in rows})
 
-    parts_by_tx: dict[int, list[int]] = defaultdict(list)
-    for tx_id, member_id, _tg_user_id in participant_rows:
-        parts_by_tx[int(tx_id)].append(int(member_id))
-
-    totals: dict[int, int] = defaultdict(int)
-    for tx_id, amount_k in tx_rows:
-        parts = parts_by_tx.get(int(tx_id), [])
-        if not parts:
-            continue
-        amt = int(amount_k)
-        n = len(parts)
-        share = amt // n
-        rem = amt % n
-        for i, mid in enumerate(parts):
-            totals[mid] += share + (1 if i < rem else 0)
-
-    out = [RoomBreakdownEntry(member_id=mid, total_share_k=tot) for mid, tot in totals.items()]
-    out.sort(key=lambda e: (-e.total_share_k, e.member_id))
-    return out
+    room = LedgerState(upto_transaction_id=0, balances={}, room_shares=defaultdict(int), room_total_k=0)
+    await _load_checkpoint_into(session, room, chat_id=chat_id)
+    tx_filter = [
+        Transaction.chat_id == chat_id,
+        Transaction.id > room.upto_transaction_id,
+        Transaction.type == TransactionType.ROOM,
+    ]
+    aggregate = _aggregate_delta_sql if _is_postgres(session) else _aggregate_delta_python
+    deltas, _max_tx_id = await aggregate(session, tx_filter)
+    for d in deltas:
+        if d.room_share_k:
+            room.room_shares[d.member_id] += d.room_share_k
+        room.room_total_k += d.room_paid_k
 
+    return LedgerSummary(
+        members=members,
+        residents=[m for m in members if m.is_resident],
+        room_total_k=room.room_total_k,
+        room_breakdown=_room_breakdown(room.room_shares),
+        balances=balances,
+        transfers=compute_settlement(balances),
+    )
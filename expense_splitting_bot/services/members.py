@@ -8,8 +8,10 @@ from aiogram.types import User as TgUser
 from sqlalchemy import select
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
 from expense_splitting_bot.db.models import Chat, Member
+from expense_splitting_bot.services.ledger import bump_ledger_version
 
 
 async def ensure_chat(session: AsyncSession, *, tg_chat: TgChat) -> Chat:
@@ -28,10 +30,19 @@ async def ensure_chat(session: AsyncSession, *, tg_chat: TgChat) -> Chat:
     return res.scalar_one()
 
 
+def _member_labels(user: TgUser) -> tuple[Optional[str], Optional[str]]:
+    return (user.username.lower() if user.username else None, user.first_name if user.first_name else None)
+
+
 async def upsert_member(session: AsyncSession, *, chat: Chat, user: TgUser) -> Member:
-    username = user.username.lower() if user.username else None
-    first_name = user.first_name if user.first_name else None
+    username, first_name = _member_labels(user)
 
+    # Pre-statement snapshot of the row, so we can tell whether the labels changed.
+    old = (
+        select(Member.username, Member.first_name)
+        .where(Member.chat_id == chat.id, Member.tg_user_id == user.id)
+        .cte("old_member")
+    )
     insert_stmt = insert(Member).values(
         chat_id=chat.id,
         tg_user_id=user.id,
@@ -46,10 +57,80 @@ async def upsert_member(session: AsyncSession, *, chat: Chat, user: TgUser) -> M
                 "first_name": insert_stmt.excluded.first_name,
             },
         )
-        .returning(Member)
+        .returning(
+            Member,
+            sa.exists(select(old.c.username)),
+            select(old.c.username).scalar_subquery(),
+            select(old.c.first_name).scalar_subquery(),
+        )
+        .add_cte(old)
     )
     res = await session.execute(stmt)
-    return res.scalar_one()
+    member, existed, old_username, old_first_name = res.one()
+    if not existed or old_username != username or old_first_name != first_name:
+        # New member or new label: cached ledger views must be re-rendered.
+        await bump_ledger_version(session, chat_id=chat.id)
+    return member
+
+
+async def upsert_chat_member(session: AsyncSession, *, tg_chat: TgChat, user: TgUser) -> tuple[Chat, Member]:
+    """ensure_chat + upsert_member as one data-modifying CTE statement (one round trip)."""
+    username, first_name = _member_labels(user)
+
+    chat_insert = insert(Chat).values(tg_chat_id=tg_chat.id, title=tg_chat.title)
+    upserted_chat = (
+        chat_insert.on_conflict_do_update(
+            index_elements=[Chat.tg_chat_id],
+            set_={"title": sa.func.coalesce(chat_insert.excluded.title, Chat.title)},
+        )
+        .returning(*Chat.__table__.c)
+        .cte("upserted_chat")
+    )
+    # Every CTE sees the pre-statement snapshot, so this is the member row before the upsert.
+    old = (
+        select(Member.username, Member.first_name)
+        .join(upserted_chat, Member.chat_id == upserted_chat.c.id)
+        .where(Member.tg_user_id == user.id)
+        .cte("old_member")
+    )
+    member_insert = insert(Member).from_select(
+        ["chat_id", "tg_user_id", "username", "first_name"],
+        select(
+            upserted_chat.c.id,
+            sa.literal(user.id, sa.BigInteger),
+            sa.literal(username, sa.String),
+            sa.literal(first_name, sa.String),
+        ),
+    )
+    upserted_member = (
+        member_insert.on_conflict_do_update(
+            index_elements=[Member.chat_id, Member.tg_user_id],
+            set_={
+                "username": member_insert.excluded.username,
+                "first_name": member_insert.excluded.first_name,
+            },
+        )
+        .returning(*Member.__table__.c)
+        .cte("upserted_member")
+    )
+    chat_row = aliased(Chat, upserted_chat)
+    member_row = aliased(Member, upserted_member)
+    stmt = (
+        select(
+            chat_row,
+            member_row,
+            sa.exists(select(old.c.username)),
+            select(old.c.username).scalar_subquery(),
+            select(old.c.first_name).scalar_subquery(),
+        )
+        .join_from(chat_row, member_row, member_row.chat_id == chat_row.id)
+        .add_cte(upserted_chat, old, upserted_member)
+    )
+    chat, member, existed, old_username, old_first_name = (await session.execute(stmt)).one()
+    if not existed or old_username != username or old_first_name != first_name:
+        # New member or new label: cached ledger views must be re-rendered.
+        await bump_ledger_version(session, chat_id=chat.id)
+    return chat, member
 
 
 async def list_members(session: AsyncSession, *, chat_id: int) -> list[Member]:
@@ -80,5 +161,6 @@ async def toggle_resident(session: AsyncSession, *, chat_id: int, member_id: int
         return None
     m.is_resident = not bool(m.is_resident)
     await session.flush()
+    await bump_ledger_version(session, chat_id=chat_id)
     return m
 
@@ -1,11 +1,21 @@
 from __future__ import annotations
 
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, Select, String, cast, func, literal, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, selectinload
 
 from expense_splitting_bot.db.models import Member, Transaction, TransactionParticipant, TransactionType
+from expense_splitting_bot.services.ledger import (
+    apply_balance_deltas,
+    bump_ledger_version,
+    lock_ledger_for_write,
+    split_amount_k,
+)
 
 
 async def create_transaction(
@@ -26,11 +36,16 @@ async def create_transaction(
 
     involved = set(participant_member_ids) | {int(paid_by_member_id)}
     existing = (
-        await session.scalars(select(Member.id).where(Member.chat_id == chat_id, Member.id.in_(involved)))
+        await session.execute(
+            select(Member.id, Member.tg_user_id)
+            .where(Member.chat_id == chat_id, Member.id.in_(involved))
+            .order_by(Member.tg_user_id.asc())
+        )
     ).all()
     if len(existing) != len(involved):
         raise ValueError("Tanlangan a'zolarning barchasi shu guruhda bo'lishi kerak.")
 
+    await lock_ledger_for_write(session, chat_id=chat_id)
     tx = Transaction(
         chat_id=chat_id,
         type=type,
@@ -41,17 +56,171 @@ async def create_transaction(
     session.add(tx)
     await session.flush()
 
-    session.add_all([TransactionParticipant(transaction_id=tx.id, member_id=mid) for mid in participant_member_ids])
+    session.add_all([TransactionParticipant(transaction_id=tx.id, member_id=mid, chat_id=chat_id) for mid in participant_member_ids])
     await session.flush()
+
+    # Keep member_balances in step with the ledger (same split order as services.ledger).
+    participant_set = set(participant_member_ids)
+    split_order = [int(mid) for mid, _tg_user_id in existing if int(mid) in participant_set]
+    deltas: dict[int, int] = defaultdict(int)
+    deltas[int(paid_by_member_id)] -= int(amount_k)
+    for mid, share in zip(split_order, split_amount_k(int(amount_k), len(split_order))):
+        deltas[mid] += share
+    await apply_balance_deltas(session, chat_id=chat_id, deltas=deltas)
+    await bump_ledger_version(session, chat_id=chat_id)
     return tx
 
 
 async def get_last_transactions(session: AsyncSession, *, chat_id: int, limit: int = 5) -> list[Transaction]:
+    """ORM objects with payer and participants loaded (3 queries for any limit); see list_transactions for DTOs."""
     res = await session.scalars(
         select(Transaction)
         .where(Transaction.chat_id == chat_id)
         .order_by(Transaction.created_at.desc(), Transaction.id.desc())
         .limit(limit)
+        .options(selectinload(Transaction.paid_by_member), selectinload(Transaction.participant_members))
     )
     return list(res)
 
+
+# Same rule as bot.text.member_label, evaluated in SQL: @username, else first name, else the Telegram id.
+def _label_expr(member: type[Member]) -> ColumnElement[str]:
+    return func.coalesce(
+        literal("@") + func.nullif(member.username, ""),
+        func.nullif(member.first_name, ""),
+        cast(member.tg_user_id, String),
+    )
+
+
+@dataclass(frozen=True)
+class TransactionCursor:
+    """Position of a transaction in the (created_at, id) history order."""
+
+    created_at: datetime
+    id: int
+
+
+@dataclass(frozen=True)
+class TransactionRow:
+    id: int
+    type: TransactionType
+    amount_k: int
+    paid_by_member_id: int
+    paid_by_label: str
+    participant_member_ids: tuple[int, ...]
+    note: Optional[str]
+    created_at: datetime
+
+    @property
+    def cursor(self) -> TransactionCursor:
+        return TransactionCursor(created_at=self.created_at, id=self.id)
+
+
+@dataclass(frozen=True)
+class TransactionPage:
+    rows: list[TransactionRow]  # newest first
+    has_newer: bool
+    has_older: bool
+
+
+def _row_select() -> Select:
+    payer = aliased(Member)
+    return select(
+        Transaction.id,
+        Transaction.type,
+        Transaction.amount_k,
+        Transaction.paid_by_member_id,
+        _label_expr(payer),
+        Transaction.note,
+        Transaction.created_at,
+    ).join(payer, payer.id == Transaction.paid_by_member_id)
+
+
+async def _load_rows(session: AsyncSession, stmt: Select, *, chat_id: int) -> list[TransactionRow]:
+    """Runs a _row_select() statement over one chat, then loads the participants of all its rows in one query."""
+    rows = (await session.execute(stmt)).all()
+    participants: dict[int, list[int]] = defaultdict(list)
+    if rows:
+        res = await session.execute(
+            select(TransactionParticipant.transaction_id, TransactionParticipant.member_id)
+            .where(
+                TransactionParticipant.chat_id == chat_id,
+                TransactionParticipant.transaction_id.in_([r[0] for r in rows]),
+            )
+            .order_by(TransactionParticipant.transaction_id, TransactionParticipant.member_id)
+        )
+        for tx_id, member_id in res.all():
+            participants[int(tx_id)].append(int(member_id))
+    return [
+        TransactionRow(
+            id=int(tx_id),
+            type=type_,
+            amount_k=int(amount_k),
+            paid_by_member_id=int(paid_by),
+            paid_by_label=label,
+            participant_member_ids=tuple(participants[int(tx_id)]),
+            note=note,
+            created_at=created_at,
+        )
+        for tx_id, type_, amount_k, paid_by, label, note, created_at in rows
+    ]
+
+
+async def list_transactions(session: AsyncSession, *, chat_id: int, limit: int = 5) -> list[TransactionRow]:
+    """
+    The newest transactions as plain rows, newest first.
+
+    Always two queries whatever the limit: transaction columns with the payer's label
+    (joined), then the participant ids of all rows. Nothing is lazy-loaded afterwards.
+    """
+
+    stmt = (
+        _row_select()
+        .where(Transaction.chat_id == chat_id)
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc())
+        .limit(limit)
+    )
+    return await _load_rows(session, stmt, chat_id=chat_id)
+
+
+async def get_transaction_page(
+    session: AsyncSession,
+    *,
+    chat_id: int,
+    limit: int = 10,
+    older_than: Optional[TransactionCursor] = None,
+    newer_than: Optional[TransactionCursor] = None,
+) -> TransactionPage:
+    """
+    One page of a chat's history, newest first: the newest rows, or those right before
+    older_than / after newer_than.
+
+    Keyset pagination on (created_at, id) walks ix_transactions_chat_created_at from the
+    cursor, so a deep page costs the same as the first one (no OFFSET).
+    """
+
+    if older_than is not None and newer_than is not None:
+        raise ValueError("Pass at most one of older_than / newer_than.")
+
+    position = tuple_(Transaction.created_at, Transaction.id)
+    stmt = _row_select().where(Transaction.chat_id == chat_id)
+    if newer_than is not None:
+        stmt = stmt.where(position > tuple_(newer_than.created_at, newer_than.id)).order_by(
+            Transaction.created_at.asc(), Transaction.id.asc()
+        )
+    else:
+        if older_than is not None:
+            stmt = stmt.where(position < tuple_(older_than.created_at, older_than.id))
+        stmt = stmt.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+    # One extra row tells whether there is a page beyond this one.
+    rows = await _load_rows(session, stmt.limit(limit + 1), chat_id=chat_id)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if newer_than is not None:
+        rows.reverse()
+
+    return TransactionPage(
+        rows=rows,
+        has_newer=has_more if newer_than is not None else older_than is not None,
+        has_older=has_more if newer_than is None else True,
+    )
@@ -0,0 +1,69 @@
+"""
+The tests run against a scratch Postgres database named by TEST_DATABASE_URL
+(postgresql+asyncpg://...), migrated to head once per session. Without it every test
+that needs the database is skipped.
+
+Tests are plain functions that drive their coroutine with asyncio.run, so no asyncio
+pytest plugin is needed.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import pytest
+from alembic.config import main as alembic_main
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from expense_splitting_bot.db.models import Chat, Member
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_alembic(database_url: str, *argv: str) -> None:
+    """Runs the alembic CLI (alembic/env.py reads DATABASE_URL) against the test database."""
+    previous = os.environ.get("DATABASE_URL")
+    cwd = os.getcwd()
+    os.environ["DATABASE_URL"] = database_url
+    os.chdir(ROOT)  # script_location in alembic.ini is relative
+    try:
+        alembic_main(argv=list(argv))
+    finally:
+        os.chdir(cwd)
+        if previous is None:
+            del os.environ["DATABASE_URL"]
+        else:
+            os.environ["DATABASE_URL"] = previous
+
+
+@pytest.fixture(scope="session")
+def database_url() -> str:
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    run_alembic(url, "upgrade", "head")
+    return url
+
+
+SeedChat = Callable[..., Awaitable[tuple[int, list[int]]]]
+
+
+@pytest.fixture
+def seed_chat() -> SeedChat:
+    """Async factory: creates a chat with `members` members; returns (chat id, member ids)."""
+
+    async def seed(session: AsyncSession, *, members: int = 3) -> tuple[int, list[int]]:
+        tg_chat_id = -random.randrange(10**12, 2 * 10**12)
+        chat = Chat(tg_chat_id=tg_chat_id, title="test")
+        session.add(chat)
+        await session.flush()
+        rows = [Member(chat_id=chat.id, tg_user_id=1000 + i, first_name=f"m{i}") for i in range(members)]
+        session.add_all(rows)
+        await session.flush()
+        await session.commit()
+        return chat.id, [m.id for m in rows]
+
+    return seed
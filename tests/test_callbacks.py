@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+import pytest
+
+from expense_splitting_bot.bot.callbacks import NumActionCb, PageCb, decode
+
+
+def test_payload_round_trips():
+    cb = PageCb(initiator=123456789, flow="split_participants", page=2)
+    assert cb.pack() == "g:21i3v9:3:2"
+    assert decode(cb.pack()) == cb
+
+
+@pytest.mark.parametrize("action", ["-1", "+1", "4", "z", " 1", "0_1", ""])
+def test_vocab_index_out_of_range_is_rejected(action):
+    with pytest.raises(ValueError):
+        NumActionCb.unpack(f"n:1:0:{action}")
+    assert decode(f"n:1:0:{action}") is None
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from expense_splitting_bot.db.models import (
+    Chat,
+    LedgerCheckpointEntry,
+    Transaction,
+    TransactionParticipant,
+    TransactionType,
+)
+from expense_splitting_bot.services.checkpoints import write_checkpoint
+from expense_splitting_bot.services.ledger import (
+    apply_balance_deltas,
+    bump_ledger_version,
+    compute_balances,
+    lock_ledger_for_write,
+    rebuild_member_balances,
+    replay_ledger,
+)
+from expense_splitting_bot.services.transactions import create_transaction
+
+
+def test_checkpoint_skips_a_chat_with_an_open_writer(database_url, seed_chat):
+    async def scenario() -> None:
+        engine = create_async_engine(database_url)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            async with sessionmaker() as session:
+                chat_id, (a, b, c) = await seed_chat(session, members=3)
+
+            # First half of create_transaction: the row has its id, the DB transaction stays
+            # open (as when a handler is still waiting on the Bot API before it commits).
+            late = sessionmaker()
+            await lock_ledger_for_write(late, chat_id=chat_id)
+            late_tx = Transaction(chat_id=chat_id, type=TransactionType.SPLIT, amount_k=30, paid_by_member_id=a)
+            late.add(late_tx)
+            await late.flush()
+
+            async with sessionmaker() as session:
+                early_tx = await create_transaction(
+                    session,
+                    chat_id=chat_id,
+                    type=TransactionType.SPLIT,
+                    amount_k=12,
+                    paid_by_member_id=b,
+                    participant_member_ids=[b, c],
+                )
+                await session.commit()
+            assert late_tx.id < early_tx.id
+
+            async def checkpoint():
+                async with sessionmaker() as session:
+                    cp = await write_checkpoint(session, chat_id=chat_id)
+                    await session.commit()
+                    return cp
+
+            # The open writer makes the compactor skip the chat instead of queueing on its lock.
+            assert await asyncio.wait_for(checkpoint(), timeout=2) is None
+
+            late.add_all(
+                [TransactionParticipant(transaction_id=late_tx.id, member_id=m, chat_id=chat_id) for m in (a, b, c)]
+            )
+            await apply_balance_deltas(late, chat_id=chat_id, deltas={a: -20, b: 10, c: 10})
+            await bump_ledger_version(late, chat_id=chat_id)
+            await late.commit()
+            await late.close()
+
+            cp = await checkpoint()
+            assert cp is not None
+            assert cp.upto_transaction_id == early_tx.id
+
+            async with sessionmaker() as session:
+                full = await replay_ledger(session, chat_id=chat_id, use_checkpoint=False)
+                from_checkpoint = await replay_ledger(session, chat_id=chat_id)
+            assert full.balances == {a: -20, b: 4, c: 16}
+            assert from_checkpoint.balances == full.balances
+            assert from_checkpoint.upto_transaction_id == early_tx.id
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_checkpoint_skips_nothing_when_no_writer_is_open(database_url, seed_chat):
+    async def scenario() -> None:
+        engine = create_async_engine(database_url)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            async with sessionmaker() as session:
+                chat_id, (a, b) = await seed_chat(session, members=2)
+                tx = await create_transaction(
+                    session,
+                    chat_id=chat_id,
+                    type=TransactionType.TRANSFER,
+                    amount_k=5,
+                    paid_by_member_id=a,
+                    participant_member_ids=[b],
+                )
+                await session.commit()
+
+            async with sessionmaker() as session:
+                cp = await write_checkpoint(session, chat_id=chat_id)
+                await session.commit()
+                # Nothing new since the checkpoint.
+                assert await write_checkpoint(session, chat_id=chat_id) is None
+            assert cp is not None and cp.upto_transaction_id == tx.id
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_replays_the_raw_ledger_unless_asked_to_trust_checkpoints(database_url, seed_chat):
+    async def scenario() -> None:
+        engine = create_async_engine(database_url)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            async with sessionmaker() as session:
+                chat_id, (a, b) = await seed_chat(session, members=2)
+                await create_transaction(
+                    session,
+                    chat_id=chat_id,
+                    type=TransactionType.TRANSFER,
+                    amount_k=7,
+                    paid_by_member_id=a,
+                    participant_member_ids=[b],
+                )
+                await session.commit()
+                cp = await write_checkpoint(session, chat_id=chat_id)
+                await session.commit()
+                # A bad checkpoint.
+                await session.execute(
+                    update(LedgerCheckpointEntry)
+                    .where(LedgerCheckpointEntry.checkpoint_id == cp.id)
+                    .values(balance_k=LedgerCheckpointEntry.balance_k * 2)
+                )
+                await session.commit()
+
+            async def rebuilt(**kwargs) -> dict[int, int]:
+                async with sessionmaker() as session:
+                    await rebuild_member_balances(session, chat_id=chat_id, **kwargs)
+                    await session.commit()
+                    return {e.member_id: e.balance_k for e in await compute_balances(session, chat_id=chat_id)}
+
+            assert await rebuilt(from_checkpoint=True) == {a: -14, b: 14}
+            async with sessionmaker() as session:
+                version = await session.scalar(select(Chat.ledger_version).where(Chat.id == chat_id))
+            assert await rebuilt() == {a: -7, b: 7}
+            async with sessionmaker() as session:
+                # Cached ledger views are keyed by the version; the rebuild must invalidate them.
+                assert await session.scalar(select(Chat.ledger_version).where(Chat.id == chat_id)) == version + 1
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
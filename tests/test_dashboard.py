@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import EditMessageText
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from expense_splitting_bot.bot.dashboard import DashboardManager
+from expense_splitting_bot.bot.dashboard_sync import PgDashboardCoordinator
+from expense_splitting_bot.bot.ledger_cache import LedgerCache
+from expense_splitting_bot.db.jobs import JobQueue
+from expense_splitting_bot.db.models import Chat, Job
+
+
+class _FakeBot:
+    """Bot API stub: the dashboard message was deleted, so every edit fails."""
+
+    def __init__(self) -> None:
+        self.sent: list[int] = []
+        self.fail_sends = 0
+
+    async def edit_message_text(self, **kwargs):
+        raise TelegramBadRequest(EditMessageText(**kwargs), "Bad Request: message to edit not found")
+
+    async def send_message(self, **kwargs):
+        if self.fail_sends:
+            self.fail_sends -= 1
+            raise RuntimeError("network down")
+        self.sent.append(kwargs["chat_id"])
+        return SimpleNamespace(message_id=500 + len(self.sent))
+
+    async def pin_chat_message(self, **kwargs):
+        return True
+
+    async def unpin_chat_message(self, **kwargs):
+        return True
+
+
+def test_deleted_dashboard_is_recreated(database_url, seed_chat):
+    async def scenario() -> None:
+        engine = create_async_engine(database_url)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        bot = _FakeBot()
+        dashboard = DashboardManager(
+            bot=bot, sessionmaker=sessionmaker, debounce_seconds=1.0, ledger_cache=LedgerCache()
+        )
+        try:
+            async with sessionmaker() as session:
+                chat_id, _ = await seed_chat(session)
+                chat = await session.get(Chat, chat_id)
+                tg_chat_id = chat.tg_chat_id
+            await dashboard.update_now(tg_chat_id)
+            assert bot.sent == [tg_chat_id]
+
+            # Unchanged content: a plain refresh trusts the stored hash and sends nothing.
+            await dashboard.update_now(tg_chat_id)
+            assert len(bot.sent) == 1
+
+            # /dashboard forces the edit, which finds the message gone; the send fails as well.
+            bot.fail_sends = 1
+            try:
+                await dashboard.update_now(tg_chat_id, force=True)
+            except RuntimeError:
+                pass
+            async with sessionmaker() as session:
+                chat = await session.get(Chat, chat_id)
+                assert chat.dashboard_message_id is None and chat.dashboard_content_hash is None
+
+            # So the next ordinary refresh sends a new dashboard instead of skipping on the hash.
+            await dashboard.update_now(tg_chat_id)
+            assert len(bot.sent) == 2
+            async with sessionmaker() as session:
+                chat = await session.get(Chat, chat_id)
+                assert chat.dashboard_message_id == 502
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_refresh_job_commits_with_the_handler_transaction(database_url):
+    async def scenario() -> None:
+        engine = create_async_engine(database_url)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        dedup_key = "dashboard:-42"
+        count = select(func.count()).select_from(Job).where(Job.dedup_key == dedup_key)
+        try:
+            dashboard = DashboardManager(
+                bot=None,
+                sessionmaker=sessionmaker,
+                debounce_seconds=1.0,
+                ledger_cache=LedgerCache(),
+                job_queue=JobQueue(sessionmaker=sessionmaker),
+            )
+            async with sessionmaker() as session:
+                await session.execute(delete(Job).where(Job.dedup_key == dedup_key))
+                await session.commit()
+
+            async with sessionmaker() as handler:
+                await dashboard.schedule(-42, session=handler)
+                async with sessionmaker() as other:
+                    assert await other.scalar(count) == 0, "queued before the handler committed"
+                await handler.rollback()
+            async with sessionmaker() as other:
+                assert await other.scalar(count) == 0, "a rolled back handler must not leave a job"
+
+            async with sessionmaker() as handler:
+                await dashboard.schedule(-42, session=handler)
+                await handler.commit()
+            async with sessionmaker() as other:
+                assert await other.scalar(count) == 1
+                await other.execute(delete(Job).where(Job.dedup_key == dedup_key))
+                await other.commit()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_notify_goes_out_when_the_handler_commits(database_url):
+    async def scenario() -> None:
+        engine = create_async_engine(database_url)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        coordinator = PgDashboardCoordinator(engine=engine, channel="test_dashboard_refresh")
+        heard: list[int] = []
+        try:
+            await coordinator.start(on_notify=heard.append, on_reconnect=lambda: None)
+            async with sessionmaker() as handler:
+                await coordinator.publish(handler, -7)
+                await asyncio.sleep(0.3)
+                assert heard == [], "notified before the handler committed"
+                await handler.rollback()
+            async with sessionmaker() as handler:
+                await coordinator.publish(handler, -8)
+                await handler.commit()
+            for _ in range(50):
+                if heard:
+                    break
+                await asyncio.sleep(0.05)
+            assert heard == [-8]
+        finally:
+            await coordinator.stop()
+            await engine.dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import DeleteMessage, DeleteMessages
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from expense_splitting_bot.bot.deletion_scheduler import DeletionScheduler
+from expense_splitting_bot.db.models import ScheduledDeletion
+
+CHAT_ID = -99
+
+
+class _FlakyBot:
+    """Bot API stub: the first call touching a message fails with a network error."""
+
+    def __init__(self) -> None:
+        self.failed: set[int] = set()
+        self.deleted: list[int] = []
+
+    async def delete_message(self, *, chat_id: int, message_id: int) -> bool:
+        if message_id not in self.failed:
+            self.failed.add(message_id)
+            raise TelegramNetworkError(DeleteMessage(chat_id=chat_id, message_id=message_id), "connection reset")
+        self.deleted.append(message_id)
+        return True
+
+    async def delete_messages(self, *, chat_id: int, message_ids: list[int]) -> bool:
+        if not self.failed.issuperset(message_ids):
+            self.failed.update(message_ids)
+            raise TelegramNetworkError(DeleteMessages(chat_id=chat_id, message_ids=message_ids), "connection reset")
+        self.deleted.extend(message_ids)
+        return True
+
+
+def test_failed_deletions_are_retried(database_url):
+    async def scenario() -> None:
+        engine = create_async_engine(database_url)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        bot = _FlakyBot()
+        scheduler = DeletionScheduler(
+            bot=bot,
+            sessionmaker=sessionmaker,
+            tick_seconds=0.05,
+            sweep_interval_seconds=0.1,
+            orphan_grace_seconds=0,
+            lease_seconds=0.3,
+        )
+        rows = select(ScheduledDeletion.message_id).where(ScheduledDeletion.tg_chat_id == CHAT_ID)
+        try:
+            async with sessionmaker() as session:
+                await session.execute(delete(ScheduledDeletion).where(ScheduledDeletion.tg_chat_id == CHAT_ID))
+                # Left by a previous run: claimed by the sweep.
+                session.add(
+                    ScheduledDeletion(
+                        tg_chat_id=CHAT_ID, message_id=1, due_at=datetime.now(timezone.utc) - timedelta(seconds=1)
+                    )
+                )
+                await session.commit()
+            # Fires from the wheel before its row is written.
+            scheduler.schedule(chat_id=CHAT_ID, message_id=2, delay_seconds=0)
+            await scheduler.start()
+
+            for _ in range(100):
+                await asyncio.sleep(0.05)
+                async with sessionmaker() as session:
+                    left = (await session.scalars(rows)).all()
+                if sorted(bot.deleted) == [1, 2] and not left:
+                    break
+            assert bot.failed == {1, 2}
+            assert sorted(bot.deleted) == [1, 2]
+            assert left == []
+            assert scheduler.stats().failed >= 2
+        finally:
+            await scheduler.close()
+            await engine.dispose()
+
+    asyncio.run(scenario())
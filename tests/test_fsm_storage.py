@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from expense_splitting_bot.bot.fsm_storage import PgFsmStorage
+from expense_splitting_bot.db.models import FsmRecord
+
+KEY = StorageKey(bot_id=1, chat_id=-77, user_id=5)
+
+
+def test_replicas_do_not_overwrite_each_others_wizard_data(database_url):
+    async def scenario() -> None:
+        engine = create_async_engine(database_url)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        replicas = [PgFsmStorage(sessionmaker=sessionmaker, shared=True) for _ in range(2)]
+        a, b = replicas
+        try:
+            async with sessionmaker() as session:
+                await session.execute(delete(FsmRecord))
+                await session.commit()
+
+            await a.set_state(KEY, "SplitStates:amount")
+            await a.update_data(KEY, {"split_amount_k_str": "1"})
+            # b read the wizard before a's next tap; it must not write that view back.
+            assert await b.get_data(KEY) == {"split_amount_k_str": "1"}
+            await a.update_data(KEY, {"split_paid_by_member_id": 3})
+            assert await b.update_data(KEY, {"split_amount_k_str": "12"}) == {
+                "split_amount_k_str": "12",
+                "split_paid_by_member_id": 3,
+            }
+
+            # Taps racing on both replicas keep every key.
+            await asyncio.gather(*(replicas[i % 2].update_data(KEY, {f"k{i}": i}) for i in range(20)))
+            data = await a.get_data(KEY)
+            assert all(data[f"k{i}"] == i for i in range(20))
+            assert data["split_paid_by_member_id"] == 3
+            assert await b.get_state(KEY) == "SplitStates:amount"
+
+            await b.set_state(KEY, None)
+            await a.set_data(KEY, {})
+            async with sessionmaker() as session:
+                assert await session.scalar(select(func.count()).select_from(FsmRecord)) == 0
+        finally:
+            for storage in replicas:
+                await storage.close()
+            await engine.dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from expense_splitting_bot.services.ledger import compute_ledger_summary, replay_ledger
+from expense_splitting_bot.services.transactions import get_transaction_page
+
+LARGE_CHAT = 2_000  # transactions in the chat under test
+NOISE_CHATS, NOISE_CHAT_SIZE = 200, 200  # so that chat is a small slice of the tables, as in production
+
+
+def _index_names(plan: dict) -> set[str]:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", ()):
+        names |= _index_names(child)
+    return names
+
+
+async def _seed(session: AsyncSession) -> int:
+    """Inserts the chats (20 members, 3 participants per transaction); returns the large chat's id."""
+    base = -random.randrange(10**12, 2 * 10**12)
+    chat_ids = (
+        await session.scalars(
+            text(
+                "INSERT INTO chats (tg_chat_id, title) "
+                "SELECT CAST(:base AS bigint) - g, 'idx ' || g FROM generate_series(0, CAST(:chats AS int)) g "
+                "ORDER BY g RETURNING id"
+            ),
+            {"base": base, "chats": NOISE_CHATS},
+        )
+    ).all()
+    large = min(chat_ids)
+    await session.execute(
+        text(
+            "INSERT INTO members (chat_id, tg_user_id, first_name) "
+            "SELECT c, m, 'm' || m FROM unnest(CAST(:ids AS bigint[])) c, generate_series(1, 20) m"
+        ),
+        {"ids": chat_ids},
+    )
+    await session.execute(
+        text(
+            "INSERT INTO transactions (chat_id, type, amount_k, paid_by_member_id, created_at) "
+            "SELECT m.chat_id, (ARRAY['ROOM', 'SPLIT', 'TRANSFER'])[1 + g % 3]::transaction_type, 10 + g % 400, "
+            "       m.ids[1 + g % 20], now() - make_interval(secs => g) "
+            "FROM (SELECT chat_id, array_agg(id ORDER BY id) AS ids FROM members "
+            "      WHERE chat_id = ANY(CAST(:ids AS bigint[])) GROUP BY chat_id) m "
+            "CROSS JOIN LATERAL generate_series(1, CASE WHEN m.chat_id = :large THEN CAST(:big AS int) ELSE CAST(:small AS int) END) g"
+        ),
+        {"ids": chat_ids, "large": large, "big": LARGE_CHAT, "small": NOISE_CHAT_SIZE},
+    )
+    await session.execute(
+        text(
+            "INSERT INTO transaction_participants (transaction_id, member_id, chat_id) "
+            "SELECT t.id, m.ids[1 + (t.id + i) % 20], t.chat_id FROM transactions t "
+            "JOIN (SELECT chat_id, array_agg(id ORDER BY id) AS ids FROM members "
+            "      WHERE chat_id = ANY(CAST(:ids AS bigint[])) GROUP BY chat_id) m ON m.chat_id = t.chat_id "
+            "CROSS JOIN generate_series(0, 2) i"
+        ),
+        {"ids": chat_ids},
+    )
+    for table in ("chats", "members", "transactions", "transaction_participants"):
+        await session.execute(text(f"ANALYZE {table}"))
+    return large
+
+
+def test_ledger_and_history_queries_use_the_member_indexes(database_url):
+    async def scenario() -> None:
+        engine = create_async_engine(database_url)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        statements: list[tuple[str, object]] = []
+
+        def record(conn, cursor, statement, parameters, context, executemany) -> None:
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append((statement, parameters))
+
+        try:
+            async with sessionmaker() as session:
+                chat_id = await _seed(session)
+                # The statements the services really run, planned against the seeded data.
+                event.listen(engine.sync_engine, "before_cursor_execute", record)
+                try:
+                    await replay_ledger(session, chat_id=chat_id, use_checkpoint=False)
+                    await compute_ledger_summary(session, chat_id=chat_id)
+                    await get_transaction_page(session, chat_id=chat_id)
+                finally:
+                    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+                conn = await session.connection()
+                used: set[str] = set()
+                for statement, parameters in statements:
+                    raw = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)).scalar()
+                    used |= _index_names((json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"])
+                await session.rollback()
+
+            for index in ("ix_tx_participants_member_tx", "ix_transactions_chat_paid_by", "ix_transactions_chat_created_at"):
+                assert index in used, f"{index} not used: {sorted(used)}"
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
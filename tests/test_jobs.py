@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import asyncio
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from expense_splitting_bot.bot.middlewares import commit_session
+from expense_splitting_bot.db.jobs import JobQueue
+from expense_splitting_bot.db.models import Job
+
+
+def test_job_enqueued_in_a_handler_runs_as_soon_as_it_commits(database_url):
+    async def scenario() -> None:
+        engine = create_async_engine(database_url)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        # Long enough that only the wake-up can explain a prompt run.
+        queue = JobQueue(sessionmaker=sessionmaker, workers=1, poll_interval_seconds=30, metrics_interval_seconds=0)
+        ran = asyncio.Event()
+
+        async def handler(payload: dict) -> None:
+            ran.set()
+
+        queue.register("test_wake", handler)
+        try:
+            async with sessionmaker() as session:
+                await session.execute(delete(Job).where(Job.kind == "test_wake"))
+                await session.commit()
+            await queue.start()
+            await asyncio.sleep(0.2)  # the worker finds nothing and goes idle
+
+            async with sessionmaker() as session:
+                await queue.enqueue("test_wake", session=session)
+                await asyncio.sleep(0.2)
+                assert not ran.is_set()
+                await commit_session(session)
+            await asyncio.wait_for(ran.wait(), timeout=5)
+        finally:
+            await queue.close(grace_seconds=1)
+            await engine.dispose()
+
+    asyncio.run(scenario())
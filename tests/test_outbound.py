@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from aiogram.methods import DeleteMessage, EditMessageText, SendMessage
+
+from expense_splitting_bot.bot.outbound import OutboundScheduler
+
+
+def test_chat_limit_applies_to_new_messages_only():
+    async def scenario() -> None:
+        scheduler = OutboundScheduler(global_per_second=1000.0, group_per_minute=1.0)
+        sent: list[str] = []
+
+        async def make_request(bot, method):
+            sent.append(method.__api_method__)
+            return True
+
+        try:
+            await scheduler(make_request, None, SendMessage(chat_id=-1, text="a"))
+            started = time.monotonic()
+            for i in range(5):
+                await scheduler(make_request, None, EditMessageText(chat_id=-1, message_id=i, text="b"))
+                await scheduler(make_request, None, DeleteMessage(chat_id=-1, message_id=i))
+            assert time.monotonic() - started < 0.5, "edits and deletions waited for the chat's bucket"
+
+            # The group's one message per minute is spent: the next send has to wait.
+            second = asyncio.create_task(scheduler(make_request, None, SendMessage(chat_id=-1, text="c")))
+            await asyncio.sleep(0.2)
+            assert not second.done()
+            second.cancel()
+        finally:
+            await scheduler.close()
+        assert sent.count("sendMessage") == 1 and len(sent) == 11
+
+    asyncio.run(scenario())
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from expense_splitting_bot.db.models import TransactionType
+from expense_splitting_bot.services.ledger import replay_ledger
+from expense_splitting_bot.services.transactions import create_transaction, get_transaction_page
+
+from conftest import run_alembic
+
+BEFORE_0012 = "0011_tx_participants_chat_id"
+
+
+def _relations(plan: dict) -> set[str]:
+    names = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", ()):
+        names |= _relations(child)
+    return names
+
+
+async def _seed(database_url: str, seed_chat) -> tuple[int, list[int], dict[int, int]]:
+    engine = create_async_engine(database_url)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        async with sessionmaker() as session:
+            chat_id, members = await seed_chat(session, members=3)
+            for i in range(12):
+                await create_transaction(
+                    session,
+                    chat_id=chat_id,
+                    type=TransactionType.SPLIT if i % 2 else TransactionType.TRANSFER,
+                    amount_k=10 + i,
+                    paid_by_member_id=members[i % 3],
+                    participant_member_ids=members if i % 2 else [members[(i + 1) % 3]],
+                )
+            await session.commit()
+            state = await replay_ledger(session, chat_id=chat_id, use_checkpoint=False)
+        return chat_id, members, state.balances
+    finally:
+        await engine.dispose()
+
+
+async def _check_partitioned(database_url: str, chat_id: int, members: list[int], balances: dict[int, int]) -> None:
+    engine = create_async_engine(database_url)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    statements: list[tuple[str, tuple]] = []
+
+    def record(conn, cursor, statement, parameters, *args) -> None:
+        statements.append((statement, parameters))
+
+    try:
+        async with sessionmaker() as session:
+            partitioned = (
+                await session.execute(
+                    text(
+                        "SELECT c.relname, count(i.inhrelid) FROM pg_partitioned_table p "
+                        "JOIN pg_class c ON c.oid = p.partrelid LEFT JOIN pg_inherits i ON i.inhparent = c.oid "
+                        "GROUP BY c.relname"
+                    )
+                )
+            ).all()
+            assert dict(partitioned) == {"transactions": 4, "transaction_participants": 4}
+
+            # The rows were copied over, and new writes land in the partitioned tables.
+            assert (await replay_ledger(session, chat_id=chat_id, use_checkpoint=False)).balances == balances
+            await create_transaction(
+                session,
+                chat_id=chat_id,
+                type=TransactionType.SPLIT,
+                amount_k=3,
+                paid_by_member_id=members[0],
+                participant_member_ids=members,
+            )
+            await session.commit()
+
+            event.listen(engine.sync_engine, "before_cursor_execute", record)
+            await replay_ledger(session, chat_id=chat_id, use_checkpoint=False)
+            await get_transaction_page(session, chat_id=chat_id)
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+            ledger = [s for s in statements if "transaction_participants" in s[0]]
+            assert ledger
+            for statement, parameters in ledger:
+                conn = await session.connection()
+                raw = (await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)).scalar()
+                plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+                touched = {name for name in _relations(plan) if name.startswith("transaction")}
+                suffixes = {name.rsplit("_", 1)[1] for name in touched}
+                # One partition of each table, and the same remainder for both.
+                assert len(suffixes) == 1 and len(touched) <= 2, f"{sorted(touched)} for {statement}"
+            await session.rollback()
+    finally:
+        await engine.dispose()
+
+
+def test_partitioning_opt_in_prunes_to_one_partition(database_url, seed_chat):
+    chat_id, members, balances = asyncio.run(_seed(database_url, seed_chat))
+    run_alembic(database_url, "downgrade", BEFORE_0012)
+    try:
+        run_alembic(database_url, "-x", "transaction_partitions=4", "upgrade", "head")
+        asyncio.run(_check_partitioned(database_url, chat_id, members, balances))
+    finally:
+        # Back to plain tables for the other tests.
+        run_alembic(database_url, "downgrade", BEFORE_0012)
+        run_alembic(database_url, "-x", "transaction_partitions=0", "upgrade", "head")
+
+    async def plain() -> None:
+        engine = create_async_engine(database_url)
+        try:
+            async with engine.connect() as conn:
+                assert not await conn.scalar(select(text("count(*) FROM pg_partitioned_table")))
+        finally:
+            await engine.dispose()
+
+    asyncio.run(plain())
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from expense_splitting_bot.db.models import TransactionType
+from expense_splitting_bot.services.transactions import create_transaction, get_transaction_page, list_transactions
+
+
+def test_history_queries_do_not_grow_with_the_page(database_url, seed_chat):
+    async def scenario() -> None:
+        engine = create_async_engine(database_url)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        statements: list[str] = []
+        try:
+            async with sessionmaker() as session:
+                chat_id, members = await seed_chat(session, members=4)
+                for i in range(30):
+                    await create_transaction(
+                        session,
+                        chat_id=chat_id,
+                        type=TransactionType.SPLIT,
+                        amount_k=4 + i,
+                        paid_by_member_id=members[i % 4],
+                        participant_member_ids=members[: 2 + i % 3],
+                    )
+                await session.commit()
+
+            def record(conn, cursor, statement, *args) -> None:
+                statements.append(statement)
+
+            event.listen(engine.sync_engine, "before_cursor_execute", record)
+
+            async def counted(load):
+                # A fresh session: anything touched afterwards would have to be loaded by a query.
+                async with sessionmaker() as session:
+                    statements.clear()
+                    result = await load(session)
+                    assert not session.identity_map, "history must not load ORM objects"
+                    return result, len(statements)
+
+            for limit in (1, 5, 30, 100):
+                rows, queries = await counted(lambda s: list_transactions(s, chat_id=chat_id, limit=limit))
+                assert len(rows) == min(limit, 30)
+                assert queries == 2, statements
+                assert all(r.paid_by_label and r.participant_member_ids for r in rows)
+
+            first, queries = await counted(lambda s: get_transaction_page(s, chat_id=chat_id, limit=10))
+            assert queries == 2
+            older, queries = await counted(
+                lambda s: get_transaction_page(s, chat_id=chat_id, limit=10, older_than=first.rows[-1].cursor)
+            )
+            assert queries == 2
+            newer, queries = await counted(
+                lambda s: get_transaction_page(s, chat_id=chat_id, limit=10, newer_than=older.rows[0].cursor)
+            )
+            assert queries == 2
+            assert [r.id for r in newer.rows] == [r.id for r in first.rows]
+
+            empty, queries = await counted(lambda s: list_transactions(s, chat_id=-1, limit=5))
+            assert empty == [] and queries == 1
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())